@@ -6,7 +6,7 @@
 
 from knack.commands import CommandGroup
 
-from .transformers import performance_benchmark_data_transformer
+from .transformers import performance_benchmark_data_transformer, performance_compare_data_transformer
 
 
 def load_command_table(self, _):
@@ -21,6 +21,10 @@ def load_command_table(self, _):
     with CommandGroup(self, '', operation_group('testtool')) as g:
         g.command('test', 'run_tests')
 
+    with CommandGroup(self, 'test-daemon', operation_group('testtool')) as g:
+        g.command('start', 'start_test_daemon', is_preview=True)
+        g.command('stop', 'stop_test_daemon', is_preview=True)
+
     with CommandGroup(self, '', operation_group('style')) as g:
         g.command('style', 'check_style')
 
@@ -57,6 +61,8 @@ def load_command_table(self, _):
     with CommandGroup(self, 'perf', operation_group('performance')) as g:
         g.command('load-times', 'check_load_time')
         g.command('benchmark', 'benchmark', is_preview=True, table_transformer=performance_benchmark_data_transformer)
+        g.command('compare', 'compare_benchmarks', is_preview=True,
+                  table_transformer=performance_compare_data_transformer)
 
     with CommandGroup(self, 'extension', operation_group('extensions')) as g:
         g.command('add', 'add_extension')
@@ -125,6 +125,33 @@ helps['test'] = """
 
         - name: Run tests for only those modules which have changed based on a git diff.
           text: azdev test --repo azure-cli --tgt upstream/master --src upstream/dev
+
+        - name: Run the second of four parts of the CLI tests, e.g. on the second of four CI agents.
+          text: azdev test CLI --shard 2/4
+
+        - name: Split the CLI tests into parts of similar duration, using the results of an earlier CI run.
+          text: azdev test CLI --shard 2/4 --durations previous_results.xml
+
+        - name: Re-run a test quickly while working on it, in a test daemon with the heavy imports done.
+          text: azdev test test_vm_create --daemon
+"""
+
+
+helps['test-daemon'] = """
+    short-summary: Manage the background process that `azdev test --daemon` runs tests in.
+    long-summary: >
+        The daemon imports pytest, the CLI core, the testsdk and the SDKs used by the tests once, and forks a process
+        for every run. It restarts when a file it imported changes and exits after an hour without runs.
+"""
+
+
+helps['test-daemon start'] = """
+    short-summary: Start the test daemon, so that the first `azdev test --daemon` doesn't wait for it.
+"""
+
+
+helps['test-daemon stop'] = """
+    short-summary: Stop the test daemon.
 """
 
 
@@ -133,6 +160,8 @@ helps['linter'] = """
     examples:
         - name: Check linter rules for only those modules which have changed based on a git diff.
           text: azdev linter --repo azure-cli --tgt upstream/master --src upstream/dev
+        - name: Check linter rules for all modules, using one process per CPU.
+          text: azdev linter CLI --jobs 0
 """
 
 helps['statistics'] = """
@@ -180,13 +209,43 @@ helps['perf'] = """
 
 helps['perf load-times'] = """
     short-summary: Verify that all modules load within an acceptable timeframe.
+    long-summary: >
+        Besides the fixed thresholds, the load times of every module are compared with those of earlier passing runs,
+        kept under the azdev config directory. A module fails when a Mann-Whitney U test shows it loads significantly
+        slower than before. The comparison is made at a fixed schedule of runs up to --max-runs, and the check stops
+        at the first conclusive one. Use --update-baseline to accept a deliberate slowdown.
+    examples:
+        - name: Accept the load times of a deliberate slowdown as the new baseline.
+          text: azdev perf load-times --update-baseline
+
+        - name: Show the import time of every command module with its heaviest imports, and write a flame graph input.
+          text: azdev perf load-times --import-time --output-dir ./perf
 """
 
 helps['perf benchmark'] = """
     short-summary: Display benchmark staticstic of Azure CLI (Extensions) commands via execute it with "python -m azure.cli {COMMAND}" in a separate process.
+    long-summary: >
+        All runs of all commands are scheduled on one pool of worker processes, each pinned to a CPU of its own.
+        Every command is run once untimed before it is measured. The result contains the raw samples of every command
+        next to their percentiles.
     examples:
         - name: Run benchmark on "network application-gateway" and "storage account"
           text: azdev perf benchmark "network application-gateway -h" "storage account" "version" "group list"
+        - name: Show the 5 hottest functions of "version" per category and save the merged profile of 10 runs.
+          text: azdev perf benchmark "version" --runs 10 --profile --hotspots 5 --output-dir ./perf
+        - name: Save the results to compare them with another build later.
+          text: azdev perf benchmark "version" "group list" --save before-upgrade
+"""
+
+helps['perf compare'] = """
+    short-summary: Compare two benchmarks saved with `azdev perf benchmark --save` and fail on significant regressions.
+    long-summary: >
+        For every command in both benchmarks, the medians are compared and a one-sided Mann-Whitney U test checks
+        whether the candidate's samples are significantly slower. Commands slower by more than --threshold percent with
+        p < 0.01 are regressions, which make the command fail.
+    examples:
+        - name: Fail when a command got more than 5% slower after an upgrade.
+          text: azdev perf compare before-upgrade after-upgrade --threshold 5
 """
 
 helps['extension'] = """
@@ -6,7 +6,6 @@
 
 import os
 import time
-import requests
 import yaml
 
 from knack.log import get_logger
@@ -14,20 +13,12 @@ from knack.util import CLIError
 from azdev.utilities import (
     heading, display, get_path_table, require_azure_cli, filter_by_git_diff)
 from azdev.utilities.path import get_cli_repo_path, get_ext_repo_paths
+from azdev.operations.cmdcov_config import get_cmdcov_config
+from azdev.operations.snapshot import load_command_table_snapshot
 from .cmdcov import CmdcovManager
 
 logger = get_logger(__name__)
 
-try:
-    with open(os.path.join(get_cli_repo_path(), 'scripts', 'ci', 'cmdcov.yml'), 'r') as file:
-        config = yaml.safe_load(file)
-# pylint: disable=broad-exception-caught
-except Exception:
-    url = "https://raw.githubusercontent.com/Azure/azure-cli/dev/scripts/ci/cmdcov.yml"
-    response = requests.get(url)
-    config = yaml.safe_load(response.text)
-EXCLUDE_MODULES = config['EXCLUDE_MODULES']
-
 
 # pylint:disable=too-many-locals, too-many-statements, too-many-branches, duplicate-code
 def run_cmdcov(modules=None, git_source=None, git_target=None, git_repo=None, level='command'):
@@ -40,8 +31,6 @@ def run_cmdcov(modules=None, git_source=None, git_target=None, git_repo=None, le
     """
     require_azure_cli()
     from azure.cli.core import get_default_cli  # pylint: disable=import-error
-    from azure.cli.core.file_util import (  # pylint: disable=import-error
-        get_all_help, create_invoker_and_load_cmds_and_args)
 
     heading('CLI Command Test Coverage')
 
@@ -109,9 +98,10 @@ def run_cmdcov(modules=None, git_source=None, git_target=None, git_repo=None, le
 
     _map_extension_module(selected_modules)
 
-    if EXCLUDE_MODULES:
-        selected_modules['mod'] = {k: v for k, v in selected_modules['mod'].items() if k not in EXCLUDE_MODULES}
-        selected_modules['ext'] = {k: v for k, v in selected_modules['ext'].items() if k not in EXCLUDE_MODULES}
+    exclude_modules = get_cmdcov_config()['EXCLUDE_MODULES']
+    if exclude_modules:
+        selected_modules['mod'] = {k: v for k, v in selected_modules['mod'].items() if k not in exclude_modules}
+        selected_modules['ext'] = {k: v for k, v in selected_modules['ext'].items() if k not in exclude_modules}
 
     if cli_only and not both_cli_ext:
         selected_mod_names = list(selected_modules['mod'].keys())
@@ -131,14 +121,14 @@ def run_cmdcov(modules=None, git_source=None, git_target=None, git_repo=None, le
     az_cli = get_default_cli()
 
     # load commands, args, and help
-    create_invoker_and_load_cmds_and_args(az_cli)
-    loaded_help = get_all_help(az_cli)
+    # only load the changed modules when checking a git diff
+    snapshot = load_command_table_snapshot(az_cli, selected_modules=selected_modules if git_target else None)
 
     stop = time.time()
     logger.info('Commands and help loaded in %i sec', stop - start)
 
     # format loaded help
-    loaded_help = {data.command: data for data in loaded_help if data.command}
+    loaded_help = {data.command: data for data in snapshot.loaded_help if data.command}
 
     linter_exclusions = {}
 
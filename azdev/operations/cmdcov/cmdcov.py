@@ -8,43 +8,17 @@ import os
 import shutil
 import sys
 import time
-import requests
-import yaml
 
 from jinja2 import FileSystemLoader, Environment
 from knack.log import get_logger
 from tqdm import tqdm
-from azdev.operations.regex import get_all_tested_commands_from_regex
-from azdev.utilities.path import get_azdev_repo_path, get_cli_repo_path, find_files
+from azdev.operations.cmdcov_config import get_cmdcov_config
+from azdev.utilities.path import get_azdev_repo_path, find_files
+from .coverage_index import CoverageIndex, parse_coverage_command
+from .scanner import RECORDING_FILE, TEST_FILE, scan_tested_commands
 
 logger = get_logger(__name__)
 
-try:
-    with open(os.path.join(get_cli_repo_path(), 'scripts', 'ci', 'cmdcov.yml'), 'r') as file:
-        config = yaml.safe_load(file)
-# pylint: disable=broad-exception-caught
-except Exception:
-    url = "https://raw.githubusercontent.com/Azure/azure-cli/dev/scripts/ci/cmdcov.yml"
-    response = requests.get(url)
-    config = yaml.safe_load(response.text)
-ENCODING = config['ENCODING']
-GLOBAL_PARAMETERS = config['GLOBAL_PARAMETERS']
-GENERIC_UPDATE_PARAMETERS = config['GENERIC_UPDATE_PARAMETERS']
-WAIT_CONDITION_PARAMETERS = config['WAIT_CONDITION_PARAMETERS']
-OTHER_PARAMETERS = config['OTHER_PARAMETERS']
-RED = config['RED']
-ORANGE = config['ORANGE']
-GREEN = config['GREEN']
-BLUE = config['BLUE']
-GOLD = config['GOLD']
-RED_PCT = config['RED_PCT']
-ORANGE_PCT = config['ORANGE_PCT']
-GREEN_PCT = config['GREEN_PCT']
-BLUE_PCT = config['BLUE_PCT']
-CLI_OWN_MODULES = config['CLI_OWN_MODULES']
-EXCLUDE_COMMANDS = config['EXCLUDE_COMMANDS']
-GLOBAL_EXCLUDE_COMMANDS = config['GLOBAL_EXCLUDE_COMMANDS']
-
 
 # pylint: disable=too-many-instance-attributes
 class CmdcovManager:
@@ -65,6 +39,7 @@ class CmdcovManager:
         self.report_date = '-'.join(self.date.replace(':', '-').split())
         self.cmdcov_path = os.path.dirname(__file__)
         self.exclusions = exclusions
+        self.config = get_cmdcov_config()
         self.width = 60
         self.fillchar = '-'
 
@@ -77,7 +52,8 @@ class CmdcovManager:
         self._run_command_test_coverage_enhance()
         html_file = self._render_html()
         if self.enable_cli_own:
-            command_test_coverage = {k: v for k, v in self.command_test_coverage.items() if k in CLI_OWN_MODULES}
+            command_test_coverage = {k: v for k, v in self.command_test_coverage.items()
+                                     if k in self.config['CLI_OWN_MODULES']}
             total_tested = 0
             total_untested = 0
             command_test_coverage['Total'] = [0, 0, 0]
@@ -100,8 +76,8 @@ class CmdcovManager:
         get all commands from loaded_help
         """
         exclude_parameters = []
-        exclude_parameters += GLOBAL_PARAMETERS + GENERIC_UPDATE_PARAMETERS + WAIT_CONDITION_PARAMETERS + \
-            OTHER_PARAMETERS
+        exclude_parameters += self.config['GLOBAL_PARAMETERS'] + self.config['GENERIC_UPDATE_PARAMETERS'] + \
+            self.config['WAIT_CONDITION_PARAMETERS'] + self.config['OTHER_PARAMETERS']
         exclude_parameters = [sorted(i) for i in exclude_parameters]
 
         # some module like vm have multiple command like vm vmss disk snapshot ...
@@ -128,8 +104,8 @@ class CmdcovManager:
             else:
                 continue
             if (not y.deprecate_info) and module:
-                if y.command.split()[-1] not in GLOBAL_EXCLUDE_COMMANDS and \
-                        y.command not in EXCLUDE_COMMANDS.get(module, []) and \
+                if y.command.split()[-1] not in self.config['GLOBAL_EXCLUDE_COMMANDS'] and \
+                        y.command not in self.config['EXCLUDE_COMMANDS'].get(module, []) and \
                         y.command not in exclusions_comands:
                     if self.level == 'argument':
                         for parameter in y.parameters:
@@ -145,23 +121,9 @@ class CmdcovManager:
         """
         get all tested commands from test_*.py
         """
-        # pylint: disable=too-many-nested-blocks
         print("\033[31m" + "Get tested commands from regex".center(self.width, self.fillchar) + "\033[0m")
         time.sleep(0.1)
-        for idx, path in enumerate(tqdm(self.selected_mod_paths)):
-            if 'azure-cli-extensions' in path:
-                for dirname in os.listdir(path):
-                    if dirname.startswith('azext'):
-                        test_dir = os.path.join(path, dirname, 'tests')
-                        break
-            else:
-                test_dir = os.path.join(path, 'tests')
-            files = find_files(test_dir, '*.py')
-            for f in files:
-                with open(os.path.join(test_dir, f), 'r', encoding=ENCODING) as f:
-                    lines = f.readlines()
-                ref = get_all_tested_commands_from_regex(lines)
-                self.all_tested_commands[self.selected_mod_names[idx]] += ref
+        self._scan_test_files(TEST_FILE, '*.py')
 
     def _get_all_tested_commands_from_record(self):
         """
@@ -169,6 +131,11 @@ class CmdcovManager:
         """
         print("\033[31m" + "Get tested commands from recording files".center(self.width, self.fillchar) + "\033[0m")
         time.sleep(0.1)
+        self._scan_test_files(RECORDING_FILE, 'test*.yaml')
+
+    def _scan_test_files(self, kind, file_pattern):
+        files = []
+        modules = []
         for idx, path in enumerate(tqdm(self.selected_mod_paths)):
             if 'azure-cli-extensions' in path:
                 for dirname in os.listdir(path):
@@ -177,19 +144,12 @@ class CmdcovManager:
                         break
             else:
                 test_dir = os.path.join(path, 'tests')
-            files = find_files(test_dir, 'test*.yaml')
-            for f in files:
-                with open(os.path.join(test_dir, f)) as f:
-                    # safe_load can not determine a constructor for the tag: !!python/unicode
-                    records = yaml.load(f, Loader=yaml.Loader) or {}
-                    for record in records['interactions']:
-                        # ['acr agentpool create']
-                        command = record['request']['headers'].get('CommandName', [''])[0]
-                        # ['-n -r']
-                        argument = record['request']['headers'].get('ParameterSetName', [''])[0]
-                        if command or argument:
-                            cmd = command + ' ' + argument
-                            self.all_tested_commands[self.selected_mod_names[idx]].append(cmd)
+            for f in find_files(test_dir, file_pattern):
+                files.append((kind, os.path.join(test_dir, f)))
+                modules.append(self.selected_mod_names[idx])
+        # test files and recordings are scanned in parallel and cached between runs
+        for module, commands in zip(modules, scan_tested_commands(files, encoding=self.config['ENCODING'])):
+            self.all_tested_commands[module] += commands
 
     def _get_all_tested_commands_from_live(self):
         with open(os.path.join(self.cmdcov_path, 'tested_command.txt'), 'r') as f:
@@ -203,37 +163,21 @@ class CmdcovManager:
         module: vm
         pct: xx.xxx%
         """
-        import ast
         for module in self.all_commands.keys():
             self.command_test_coverage[module] = []
             self.all_untested_commands[module] = []
-        # pylint: disable=too-many-nested-blocks
         for module in self.all_commands.keys():
-            count = 0
+            entries = []
             for command in self.all_commands[module]:
-                exist_flag = False
-                prefix = command.rsplit('[', maxsplit=1)[0]
-                opt_list = ast.literal_eval('[' + command.rsplit('[', maxsplit=1)[1]) if self.level == 'argument' \
-                    else []
-                for cmd in self.all_tested_commands[module]:
-                    if prefix in cmd or \
-                            module == 'rdbms' and prefix.split(maxsplit=1)[1] in cmd:
-                        if self.level == 'argument':
-                            for opt in opt_list:
-                                if opt in cmd:
-                                    count += 1
-                                    exist_flag = True
-                                    if exist_flag:
-                                        break
-                        else:
-                            count += 1
-                            exist_flag = True
-                            if exist_flag:
-                                break
-                    if exist_flag:
-                        break
-                else:
-                    self.all_untested_commands[module].append(command)
+                prefix, opt_list = parse_coverage_command(command, self.level)
+                prefixes = [prefix]
+                if module == 'rdbms':
+                    prefixes.append(prefix.split(maxsplit=1)[1])
+                entries.append((prefixes, opt_list))
+            covered = CoverageIndex(entries).covered(self.all_tested_commands[module])
+            count = sum(covered)
+            self.all_untested_commands[module] = [command for command, is_covered in
+                                                  zip(self.all_commands[module], covered) if not is_covered]
             try:
                 self.command_test_coverage[module] = [count, len(self.all_untested_commands[module]),
                                                       f'{count / len(self.all_commands[module]):.3%}']
@@ -255,34 +199,26 @@ class CmdcovManager:
         module: vm
         percentage: xx.xxx%
         """
-        import ast
+        entries = []
+        for untested_commands in self.all_untested_commands.values():
+            for command in untested_commands:
+                prefix, opt_list = parse_coverage_command(command, self.level)
+                entries.append(([prefix], opt_list))
+        covered = iter(CoverageIndex(entries).covered(self.all_live_commands))
         total_tested = 0
         total_untested = 0
-        # pylint: disable=too-many-nested-blocks
         for module, untested_commands in self.all_untested_commands.items():
-            for cmd_idx, command in enumerate(untested_commands):
-                exist_flag = False
-                prefix = command.rsplit('[', maxsplit=1)[0]
-                opt_list = ast.literal_eval('[' + command.rsplit('[', maxsplit=1)[1]) if self.level == 'argument' \
-                    else []
-                for cmd in self.all_live_commands:
-                    if prefix in cmd:
-                        if self.level == 'argument':
-                            for opt in opt_list:
-                                if opt in cmd:
-                                    self.command_test_coverage[module][0] += 1
-                                    untested_commands.pop(cmd_idx)
-                                    exist_flag = True
-                                    if exist_flag:
-                                        break
-                        else:
-                            self.command_test_coverage[module][0] += 1
-                            untested_commands.pop(cmd_idx)
-                            exist_flag = True
-                            if exist_flag:
-                                break
-                    if exist_flag:
-                        break
+            # removing a covered command used to skip the command right after it, keep doing so
+            remaining = []
+            skip_next = False
+            for command, is_covered in zip(list(untested_commands), covered):
+                if is_covered and not skip_next:
+                    self.command_test_coverage[module][0] += 1
+                    skip_next = True
+                else:
+                    remaining.append(command)
+                    skip_next = False
+            untested_commands[:] = remaining
             try:
                 self.command_test_coverage[module][1] = len(untested_commands)
                 self.command_test_coverage[module][2] = f'''{self.command_test_coverage[module][0] /
@@ -317,7 +253,7 @@ class CmdcovManager:
                                  Total=total,
                                  command_test_coverage=self.command_test_coverage)
         index_html = os.path.join(html_path, 'index.html')
-        with open(index_html, 'w', encoding=ENCODING) as f:
+        with open(index_html, 'w', encoding=self.config['ENCODING']) as f:
             f.write(content)
 
         # render child html
@@ -361,7 +297,7 @@ class CmdcovManager:
                                  Total=total,
                                  command_test_coverage=command_test_coverage)
         index_html = os.path.join(html_path, 'index2.html')
-        with open(index_html, 'w', encoding=ENCODING) as f:
+        with open(index_html, 'w', encoding=self.config['ENCODING']) as f:
             f.write(content)
 
     def _render_child_html(self, module, coverage, untested_commands):
@@ -377,29 +313,28 @@ class CmdcovManager:
                                  date=self.date,
                                  coverage=coverage,
                                  untested_commands=untested_commands)
-        with open(f'{html_path}/{module}.html', 'w', encoding=ENCODING) as f:
+        with open(f'{html_path}/{module}.html', 'w', encoding=self.config['ENCODING']) as f:
             f.write(content)
 
-    @staticmethod
-    def _get_color(coverage):
+    def _get_color(self, coverage):
         """
         :param coverage:
         :return: color and percentage
         """
-
+        config = self.config
         percentage = int(round(float(coverage[2][:-1]), 0)) if coverage[2] != 'N/A' else coverage[2]
         if percentage == 'N/A':
             color = 'N/A'
-        elif percentage < RED_PCT:
-            color = RED
-        elif percentage < ORANGE_PCT:
-            color = ORANGE
-        elif percentage < GREEN_PCT:
-            color = GREEN
-        elif percentage < BLUE_PCT:
-            color = BLUE
+        elif percentage < config['RED_PCT']:
+            color = config['RED']
+        elif percentage < config['ORANGE_PCT']:
+            color = config['ORANGE']
+        elif percentage < config['GREEN_PCT']:
+            color = config['GREEN']
+        elif percentage < config['BLUE_PCT']:
+            color = config['BLUE']
         else:
-            color = GOLD
+            color = config['GOLD']
 
         return color, percentage
 
@@ -0,0 +1,109 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+# -----------------------------------------------------------------------------
+
+import ast
+from collections import defaultdict, deque
+
+
+def parse_coverage_command(command, level):
+    """ Splits a coverage entry (`'vm create'` or `"vm create ['--name', '-n']"`) into its prefix and options.
+
+    :returns: (prefix, options). Options are None at the command level.
+    """
+    prefix = command.rsplit('[', maxsplit=1)[0]
+    if level != 'argument':
+        return prefix, None
+    return prefix, ast.literal_eval('[' + command.rsplit('[', maxsplit=1)[1])
+
+
+class SubstringMatcher:
+    """ Aho-Corasick automaton that finds which of a set of patterns occur as substrings of a text. """
+
+    def __init__(self, patterns):
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+        self._always = []
+        for pattern_id, pattern in enumerate(patterns):
+            if not pattern:
+                self._always.append(pattern_id)
+                continue
+            state = 0
+            for char in pattern:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][char] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                state = next_state
+            self._out[state].append(pattern_id)
+
+        # breadth first, so that the fail state of every node is final before its children are visited
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                fail = self._goto[fail].get(char, 0)
+                self._fail[next_state] = fail
+                self._out[next_state] = self._out[next_state] + self._out[fail]
+
+    def search(self, text):
+        """ Returns the set of ids of the patterns found in the text. """
+        goto, fail, out = self._goto, self._fail, self._out
+        found = set(self._always)
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if out[state]:
+                found.update(out[state])
+        return found
+
+
+class CoverageIndex:
+    """ Decides which commands are covered by a list of tested command strings.
+
+    An entry is covered when one tested command contains any of its prefixes and, at the argument level, any of its
+    options too. This matches checking every entry against every tested command with `in`, but scans each tested
+    command only once.
+
+    :param entries: list of (prefixes, options) tuples. Options are None at the command level.
+    """
+
+    def __init__(self, entries):
+        pattern_ids = {}
+        self._entries = []
+        for prefixes, options in entries:
+            prefix_ids = tuple(pattern_ids.setdefault(prefix, len(pattern_ids)) for prefix in prefixes)
+            option_ids = None if options is None else \
+                tuple(pattern_ids.setdefault(option, len(pattern_ids)) for option in options)
+            self._entries.append((prefix_ids, option_ids))
+        self._prefix_ids = {pattern_id for prefix_ids, _ in self._entries for pattern_id in prefix_ids}
+        self._matcher = SubstringMatcher(list(pattern_ids))
+
+    def covered(self, tested_commands):
+        """ Returns a list with a bool for each entry, telling whether any of the tested commands covers it. """
+        matches = [self._matcher.search(text) for text in set(tested_commands)]
+        texts_by_prefix = defaultdict(list)
+        for text_id, found in enumerate(matches):
+            for pattern_id in found & self._prefix_ids:
+                texts_by_prefix[pattern_id].append(text_id)
+
+        results = []
+        for prefix_ids, option_ids in self._entries:
+            text_ids = [text_id for prefix_id in prefix_ids for text_id in texts_by_prefix.get(prefix_id, [])]
+            if option_ids is None:
+                results.append(bool(text_ids))
+            else:
+                results.append(any(option_id in matches[text_id] for text_id in text_ids for option_id in option_ids))
+        return results
@@ -0,0 +1,73 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+# -----------------------------------------------------------------------------
+
+import multiprocessing
+import os
+
+from knack.log import get_logger
+
+from azdev.operations.cmdcov_config import get_cmdcov_patterns_digest
+from azdev.operations.recording import get_recording_commands
+from azdev.operations.regex import get_all_tested_commands_from_regex
+from azdev.utilities import FileCache, get_azdev_config_dir, get_file_stamp
+
+logger = get_logger(__name__)
+
+SCAN_CACHE_VERSION = 1
+SCAN_CACHE_FILE = 'cmdcov_scan.bin'
+# below this many files to scan a pool costs more than it saves
+_MIN_POOL_FILES = 16
+
+TEST_FILE = 'test'
+RECORDING_FILE = 'recording'
+
+
+def scan_tested_commands(files, encoding='utf-8', jobs=None):
+    """ Returns the tested commands found in test files and recordings, as a list per file.
+
+    Files are scanned in a process pool and the results are cached by (path, mtime, size), so a repeated run only
+    rescans the files that changed. Results of test files are also cached by the cmdcov patterns and the encoding
+    they were scanned with.
+
+    :param files: list of (kind, path) tuples, kind being TEST_FILE or RECORDING_FILE.
+    :param encoding: encoding of the test files.
+    :param jobs: number of processes to scan with, defaults to the number of CPUs.
+    """
+    cache = FileCache(os.path.join(get_azdev_config_dir(), SCAN_CACHE_FILE), SCAN_CACHE_VERSION)
+    results = [None] * len(files)
+    tasks = []
+    test_file_scan = (get_cmdcov_patterns_digest(), encoding)
+    for idx, (kind, path) in enumerate(files):
+        stamp = get_file_stamp(path)
+        if stamp is None:
+            results[idx] = []
+            continue
+        key = (kind, os.path.abspath(path)) + (test_file_scan if kind == TEST_FILE else ())
+        results[idx] = cache.get(key, stamp)
+        if results[idx] is None:
+            tasks.append((idx, key, stamp, (kind, path, encoding)))
+
+    jobs = jobs or os.cpu_count() or 1
+    if jobs > 1 and len(tasks) >= _MIN_POOL_FILES:
+        logger.info('Scanning %i test files in %i processes', len(tasks), jobs)
+        with multiprocessing.Pool(jobs) as pool:
+            scanned = pool.map(_scan_file, [task for _, _, _, task in tasks], chunksize=4)
+    else:
+        scanned = [_scan_file(task) for _, _, _, task in tasks]
+    for (idx, key, stamp, _), commands in zip(tasks, scanned):
+        results[idx] = commands
+        cache.set(key, stamp, commands)
+    cache.save()
+    return results
+
+
+def _scan_file(task):
+    kind, path, encoding = task
+    if kind == TEST_FILE:
+        with open(path, 'r', encoding=encoding) as f:
+            lines = f.readlines()
+        return get_all_tested_commands_from_regex(lines)
+    return get_recording_commands(path)
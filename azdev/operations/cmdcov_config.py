@@ -0,0 +1,191 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+# -----------------------------------------------------------------------------
+
+from collections import namedtuple
+import hashlib
+import json
+import os
+import re
+import time
+
+import yaml
+from knack.log import get_logger
+from knack.util import CLIError
+
+from azdev.utilities import get_azdev_config, get_azdev_config_dir, get_cli_repo_path
+
+logger = get_logger(__name__)
+
+CMDCOV_CONFIG_URL = 'https://raw.githubusercontent.com/Azure/azure-cli/dev/scripts/ci/cmdcov.yml'
+CMDCOV_CONFIG_FILE = 'cmdcov.yml'
+CMDCOV_CONFIG_META_FILE = 'cmdcov.json'
+# hours before the cached copy is revalidated against GitHub
+DEFAULT_CONFIG_TTL = 24
+_REQUEST_TIMEOUT = 5
+
+CmdcovPatterns = namedtuple('CmdcovPatterns', ['cmd', 'quo', 'end', 'docs_end', 'not_end', 'number_sign',
+                                               'line_kinds'])
+LINE_KIND_COMMENT = -1
+# number of CMD_PATTERN entries that start a tested command, in order of precedence
+LINE_KIND_COUNT = 4
+
+_CONFIG = None
+_PATTERNS = None
+
+
+def get_cmdcov_config():
+    """ Returns the `scripts/ci/cmdcov.yml` settings, loading them on first use.
+
+    Looks in order at the local Azure CLI repo, the copy cached in the azdev config dir (revalidated with its ETag
+    once older than `[cmdcov] config_ttl` hours), and finally the copy bundled in `azdev.operations.constant`.
+    """
+    global _CONFIG  # pylint: disable=global-statement
+    if _CONFIG is None:
+        config = _get_bundled_config()
+        config.update(_load_repo_config() or _load_cached_config() or {})
+        _CONFIG = config
+    return _CONFIG
+
+
+def get_cmdcov_patterns():
+    """ Returns the compiled test command patterns of the cmdcov config. """
+    global _PATTERNS  # pylint: disable=global-statement
+    if _PATTERNS is None:
+        config = get_cmdcov_config()
+        _PATTERNS = CmdcovPatterns(
+            cmd=[re.compile(pattern) for pattern in config['CMD_PATTERN']],
+            quo=re.compile(config['QUO_PATTERN']),
+            end=re.compile(config['END_PATTERN']),
+            docs_end=re.compile(config['DOCS_END_PATTERN']),
+            not_end=re.compile(config['NOT_END_PATTERN']),
+            number_sign=re.compile(config['NUMBER_SIGN_PATTERN']),
+            line_kinds=_compile_line_kinds(config['NUMBER_SIGN_PATTERN'], config['CMD_PATTERN'][:LINE_KIND_COUNT]))
+    return _PATTERNS
+
+
+def get_cmdcov_patterns_digest():
+    """ Returns a digest of the test command patterns of the cmdcov config, which scan results depend on. """
+    config = get_cmdcov_config()
+    patterns = [config[name] for name in ('CMD_PATTERN', 'QUO_PATTERN', 'END_PATTERN', 'DOCS_END_PATTERN',
+                                          'NOT_END_PATTERN', 'NUMBER_SIGN_PATTERN')]
+    return hashlib.sha1(json.dumps(patterns).encode('utf-8')).hexdigest()
+
+
+def _compile_line_kinds(number_sign_pattern, cmd_patterns):
+    """ Returns (kind, literals, pattern) for every pattern that classifies a line, in order of precedence.
+
+    Kind is LINE_KIND_COMMENT or the index of the command pattern. A line can only match a pattern if it contains all
+    of its literals, which is much cheaper to check than the pattern itself.
+    """
+    line_kinds = [(LINE_KIND_COMMENT, number_sign_pattern)] + list(enumerate(cmd_patterns))
+    return [(kind, _get_required_literals(pattern), re.compile(pattern)) for kind, pattern in line_kinds]
+
+
+def _get_required_literals(pattern):
+    """ Returns the literal substrings that every match of a pattern contains, as far as they are easy to tell. """
+    try:
+        from re import _parser as sre_parse  # pylint: disable=no-name-in-module
+    except ImportError:
+        import sre_parse  # pylint: disable=deprecated-module
+    try:
+        parsed = sre_parse.parse(pattern)
+    except re.error:
+        return ()
+    if parsed.state.flags & re.IGNORECASE:
+        return ()
+    literals = []
+    run = []
+    # only the top level items are matched unconditionally, in sequence
+    for op, av in list(parsed) + [(None, None)]:
+        if op == sre_parse.LITERAL:
+            run.append(chr(av))
+            continue
+        if run:
+            literals.append(''.join(run))
+            run = []
+    return tuple(literals)
+
+
+def _get_bundled_config():
+    from azdev.operations import constant
+    return {name: value for name, value in vars(constant).items() if name.isupper()}
+
+
+def _load_repo_config():
+    try:
+        path = os.path.join(get_cli_repo_path(), 'scripts', 'ci', CMDCOV_CONFIG_FILE)
+    except CLIError:
+        return None
+    if not os.path.isfile(path):
+        return None
+    try:
+        with open(path, 'r') as f:
+            return yaml.safe_load(f)
+    except (OSError, yaml.YAMLError) as ex:
+        logger.warning('Unable to read %s: %s', path, ex)
+        return None
+
+
+def _get_config_ttl():
+    try:
+        return float(get_azdev_config().get('cmdcov', 'config_ttl', fallback=DEFAULT_CONFIG_TTL)) * 3600
+    except ValueError:
+        return DEFAULT_CONFIG_TTL * 3600
+
+
+def _load_cached_config():
+    config_dir = get_azdev_config_dir()
+    config_path = os.path.join(config_dir, CMDCOV_CONFIG_FILE)
+    meta_path = os.path.join(config_dir, CMDCOV_CONFIG_META_FILE)
+    try:
+        with open(meta_path, 'r') as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        meta = {}
+    try:
+        with open(config_path, 'r') as f:
+            text = f.read()
+    except OSError:
+        text = None
+
+    # a failed attempt waits as long as a successful one, so that offline runs don't wait for the timeout every time
+    last_attempt = max(meta.get('fetched', 0), meta.get('failed', 0))
+    if time.time() - last_attempt > _get_config_ttl():
+        text = _refresh_cached_config(config_path, meta_path, text, meta.get('etag'), meta.get('fetched', 0))
+    if text is None:
+        return None
+    try:
+        return yaml.safe_load(text)
+    except yaml.YAMLError as ex:
+        logger.warning('Ignoring unreadable cmdcov config %s: %s', config_path, ex)
+        return None
+
+
+def _refresh_cached_config(config_path, meta_path, text, etag, fetched):
+    """ Fetches cmdcov.yml from GitHub unless the cached copy is still current. Returns the config text. """
+    import requests
+    headers = {'If-None-Match': etag} if text is not None and etag else {}
+    os.makedirs(os.path.dirname(config_path), exist_ok=True)
+    try:
+        response = requests.get(CMDCOV_CONFIG_URL, headers=headers, timeout=_REQUEST_TIMEOUT)
+        if response.status_code != 304:
+            response.raise_for_status()
+            text = response.text
+            etag = response.headers.get('ETag')
+    except requests.RequestException as ex:
+        if text is None:
+            logger.warning('Unable to fetch %s, using the bundled cmdcov config: %s', CMDCOV_CONFIG_URL, ex)
+        else:
+            logger.warning('Unable to refresh %s, using the cached copy: %s', CMDCOV_CONFIG_URL, ex)
+        with open(meta_path, 'w') as f:
+            json.dump({'etag': etag, 'fetched': fetched, 'failed': time.time()}, f)
+        return text
+
+    with open(config_path, 'w') as f:
+        f.write(text)
+    with open(meta_path, 'w') as f:
+        json.dump({'etag': etag, 'fetched': time.time()}, f)
+    return text
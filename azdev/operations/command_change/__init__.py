@@ -13,8 +13,8 @@ import azure_cli_diff_tool
 from azdev.utilities import display, require_azure_cli, heading, get_path_table, filter_by_git_diff
 from .custom import DiffExportFormat, get_commands_meta
 from .util import export_commands_meta
-from ..statistics import _create_invoker_and_load_cmds, _get_command_source, \
-    _command_codegen_info  # pylint: disable=protected-access
+from ..snapshot import load_command_table_snapshot
+from ..statistics import _get_command_source
 from ..statistics.util import filter_modules
 
 
@@ -64,13 +64,13 @@ def export_command_meta(modules=None, git_source=None, git_target=None, git_repo
     from azure.cli.core import get_default_cli  # pylint: disable=import-error
     az_cli = get_default_cli()
 
-    # load commands, args, and help
-    _create_invoker_and_load_cmds(az_cli)
+    # load commands and args
+    snapshot = load_command_table_snapshot(az_cli, with_help=False, with_codegen_info=True)
 
     stop = time.time()
     logger.info('Commands loaded in %i sec', stop - start)
     display('Commands loaded in {} sec'.format(stop - start))
-    command_loader = az_cli.invocation.commands_loader
+    command_loader = snapshot.command_loader
 
     # trim command table to selected_modules
     command_loader = filter_modules(command_loader, modules=selected_mod_names)
@@ -92,16 +92,12 @@ def export_command_meta(modules=None, git_source=None, git_target=None, git_repo
             "supports_no_wait": command.supports_no_wait,
             "is_preview": command.command_kwargs.get("is_preview", False)
         }
-        module_loader = command_loader.cmd_to_loader_map[command_name]
-        for loader in module_loader:
-            loader.skip_applicability = True
-        codegen_info = _command_codegen_info(command_name, command, module_loader)
+        codegen_info = snapshot.codegen_info.get(command_name)
         if codegen_info:
             command_info['codegen_version'] = codegen_info['version']
             command_info['codegen_type'] = codegen_info['type']
             if codegen_info['version'] == "v2":
                 command_info['is_aaz'] = True
-        command_loader.load_arguments(command_name)
 
         if command.arguments is None:
             logger.warning('No arguments generated from %i.', command_name)
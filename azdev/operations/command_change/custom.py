@@ -19,6 +19,10 @@ class DiffExportFormat(Enum):
 
 
 def process_aaz_argument(az_arguments_schema, argument_settings, para):
+    if isinstance(az_arguments_schema, dict):
+        # already processed when the command table snapshot was taken
+        para.update(az_arguments_schema.get(argument_settings["dest"], {}))
+        return
     from azure.cli.core.aaz import has_value  # pylint: disable=import-error
     _fields = az_arguments_schema._fields  # pylint: disable=protected-access
     aaz_type = _fields.get(argument_settings["dest"], None)
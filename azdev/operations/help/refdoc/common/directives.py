@@ -22,6 +22,8 @@ from azure.cli.core.commands import AzCliCommandInvoker  # pylint: disable=impor
 from azure.cli.core.parser import AzCliCommandParser  # pylint: disable=import-error
 from azure.cli.core._help import AzCliHelp, CliCommandHelpFile, ArgumentGroupRegistry  # pylint: disable=import-error
 
+from azdev.utilities import cached_help_loading
+
 _USER_HOME = expanduser('~')
 
 _CLI_FIELD_TYPES = [
@@ -103,7 +105,7 @@ class AbstractHelpGenDirective(Directive):
                        parser_cls=AzCliCommandParser,
                        help_cls=AzCliHelp)
 
-        with patch('getpass.getuser', return_value='your_system_user_login_name'):
+        with patch('getpass.getuser', return_value='your_system_user_login_name'), cached_help_loading():
             help_files = self._get_help_files(az_cli)
 
         doc_source_map = self._load_doc_source_map()
@@ -0,0 +1,69 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+# -----------------------------------------------------------------------------
+
+"""
+Hot functions of Azure CLI commands from the cProfile output of several runs.
+"""
+
+import os
+import pstats
+import re
+
+CORE = 'core'
+MODULE = 'module'
+OTHER = 'other'
+CATEGORIES = (CORE, MODULE, OTHER)
+
+# the CLI core covers parsing, command loading and help
+_CORE_PATTERN = re.compile(r'[\\/](?:azure[\\/]cli[\\/]core|knack)[\\/]')
+_MODULE_PATTERN = re.compile(r'[\\/](?:azure[\\/]cli[\\/]command_modules|azext_\w+)[\\/]')
+_SITE_PACKAGES = re.compile(r'^.*[\\/](?:site|dist)-packages[\\/]')
+
+
+def load_profiles(paths):
+    """ Returns the pstats.Stats of all the given profile files that exist, and their number. """
+    paths = [path for path in paths if os.path.isfile(path)]
+    if not paths:
+        return None, 0
+    return pstats.Stats(*paths), len(paths)
+
+
+def get_function_category(filename):
+    if _CORE_PATTERN.search(filename):
+        return CORE
+    if _MODULE_PATTERN.search(filename):
+        return MODULE
+    return OTHER
+
+
+def get_hotspots(stats, runs, top=10):
+    """ Returns the `top` functions with the most self time in each category, slowest first.
+
+    :param stats: pstats.Stats of `runs` profiled runs.
+    :returns: list of dicts with the mean calls and times in s per run.
+    """
+    by_category = {category: [] for category in CATEGORIES}
+    for (filename, lineno, funcname), (_, calls, tottime, cumtime, _) in stats.stats.items():
+        by_category[get_function_category(filename)].append((tottime, cumtime, calls, filename, lineno, funcname))
+
+    hotspots = []
+    for category in CATEGORIES:
+        for tottime, cumtime, calls, filename, lineno, funcname in sorted(by_category[category], reverse=True)[:top]:
+            hotspots.append({
+                "Category": category,
+                "Function": _get_function_label(filename, lineno, funcname),
+                "Calls": round(calls / runs, 1),
+                "Self": round(tottime / runs, 4),
+                "Cumulative": round(cumtime / runs, 4),
+            })
+    return hotspots
+
+
+def _get_function_label(filename, lineno, funcname):
+    if filename == '~':
+        # built-in functions
+        return funcname
+    return '{} ({}:{})'.format(funcname, _SITE_PACKAGES.sub('', filename), lineno)
@@ -0,0 +1,145 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+# -----------------------------------------------------------------------------
+
+"""
+Import tree of the Azure CLI built from the `python -X importtime` report.
+
+The interpreter prints one line per imported module to STDERR, after all modules it imported in turn, indented by
+two spaces per nesting level:
+
+    import time: self [us] | cumulative | imported package
+    import time:        78 |         78 |     _codecs
+    import time:       560 |        638 |   codecs
+    import time:      1242 |       2584 | encodings
+"""
+
+import re
+
+IMPORT_TIME_PREFIX = 'import time:'
+# transitive imports that usually dominate the load time of a command module
+HEAVY_IMPORT_PREFIXES = ('azure.mgmt', 'msrestazure', 'azure.multiapi')
+
+_COMMAND_MODULE_PATTERN = re.compile(r'^(?:azure\.cli\.command_modules\.(?P<mod>\w+)|(?P<ext>azext_\w+))$')
+
+
+class ImportNode:
+    """ A module in the import tree, with its own import time and that of everything it imported first. """
+
+    __slots__ = ('name', 'self_us', 'cumulative_us', 'children')
+
+    def __init__(self, name, self_us=0.0, cumulative_us=0.0, children=None):
+        self.name = name
+        self.self_us = self_us
+        self.cumulative_us = cumulative_us
+        self.children = children or []
+
+    def walk(self, path=()):
+        """ Yields (path, node) for every node below this one, parents before their children. """
+        for child in self.children:
+            child_path = path + (child.name,)
+            yield child_path, child
+            yield from child.walk(child_path)
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'self_ms': round(self.self_us / 1000, 3),
+            'cumulative_ms': round(self.cumulative_us / 1000, 3),
+            'children': [child.to_dict() for child in self.children]
+        }
+
+
+def parse_import_time(lines):
+    """ Returns the root ImportNode of an `-X importtime` report. Lines that are not part of the report are skipped.
+
+    :param lines: iterable of STDERR lines.
+    """
+    # nodes whose parent has not been printed yet, by level
+    pending = {}
+    for line in lines:
+        if not line.startswith(IMPORT_TIME_PREFIX):
+            continue
+        parts = line[len(IMPORT_TIME_PREFIX):].split('|')
+        if len(parts) != 3:
+            continue
+        try:
+            self_us, cumulative_us = float(parts[0]), float(parts[1])
+        except ValueError:
+            # the header line
+            continue
+        name = parts[2].rstrip()
+        level = (len(name) - len(name.lstrip()) - 1) // 2
+        node = ImportNode(name.strip(), self_us, cumulative_us, pending.pop(level + 1, None))
+        pending.setdefault(level, []).append(node)
+
+    root = ImportNode('')
+    # anything still pending belongs to a parent that was cut off
+    for level in sorted(pending):
+        root.children.extend(pending[level])
+    root.cumulative_us = sum(child.cumulative_us for child in root.children)
+    return root
+
+
+def merge_import_trees(roots):
+    """ Returns a tree with the mean times of the same import paths across several runs. """
+    merged = ImportNode('')
+    runs = len(roots)
+
+    def _merge(target, nodes):
+        by_name = {}
+        for node in nodes:
+            for child in node.children:
+                by_name.setdefault(child.name, []).append(child)
+        for name, children in by_name.items():
+            child = ImportNode(name, sum(c.self_us for c in children) / runs,
+                               sum(c.cumulative_us for c in children) / runs)
+            target.children.append(child)
+            _merge(child, children)
+
+    _merge(merged, roots)
+    merged.cumulative_us = sum(child.cumulative_us for child in merged.children)
+    return merged
+
+
+def get_command_module_imports(root, heavy_prefixes=HEAVY_IMPORT_PREFIXES, top=5):
+    """ Returns the import times of every command module and extension, and its heaviest transitive imports.
+
+    :returns: dict of module name to a dict with `self_ms`, `cumulative_ms` and `heavy_imports`, a list of
+        (name, cumulative_ms) tuples of at most `top` imports matching `heavy_prefixes`, slowest first.
+    """
+    modules = {}
+    for _, node in root.walk():
+        match = _COMMAND_MODULE_PATTERN.match(node.name)
+        if not match:
+            continue
+        mod = match.group('mod') or match.group('ext')
+        if mod in modules:
+            continue
+        heavy = [(child.name, child.cumulative_us) for child in _find_heavy_imports(node, heavy_prefixes)]
+        heavy.sort(key=lambda item: item[1], reverse=True)
+        modules[mod] = {
+            'self_ms': round(node.self_us / 1000, 3),
+            'cumulative_ms': round(node.cumulative_us / 1000, 3),
+            'heavy_imports': [(name, round(cumulative_us / 1000, 3)) for name, cumulative_us in heavy[:top]]
+        }
+    return modules
+
+
+def _find_heavy_imports(node, heavy_prefixes):
+    """ Yields the outermost imports below a node matching one of the prefixes. """
+    for child in node.children:
+        if any(child.name == prefix or child.name.startswith(prefix + '.') for prefix in heavy_prefixes):
+            yield child
+        else:
+            yield from _find_heavy_imports(child, heavy_prefixes)
+
+
+def write_collapsed_stacks(root, stream):
+    """ Writes the tree in the collapsed stack format of flamegraph.pl and speedscope, weighted by self time in us. """
+    for path, node in root.walk():
+        weight = int(round(node.self_us))
+        if weight > 0:
+            stream.write('{} {}\n'.format(';'.join(path), weight))
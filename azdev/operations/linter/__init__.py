@@ -14,8 +14,9 @@ from knack.log import get_logger
 from knack.util import CLIError
 
 from azdev.utilities import (
-    heading, subheading, display, get_path_table, require_azure_cli, filter_by_git_diff)
+    heading, subheading, display, get_path_table, require_azure_cli, filter_by_git_diff, load_help_entries)
 from azdev.utilities.path import get_cli_repo_path, get_ext_repo_paths
+from azdev.operations.snapshot import load_command_table_snapshot
 from azdev.operations.style import run_pylint
 
 from .linter import LinterManager, LinterScope, RuleError, LinterSeverity
@@ -29,13 +30,11 @@ CHECKERS_PATH = 'azdev.operations.linter.pylint_checkers'
 # pylint:disable=too-many-locals, too-many-statements, too-many-branches
 def run_linter(modules=None, rule_types=None, rules=None, ci_exclusions=None,
                git_source=None, git_target=None, git_repo=None, include_whl_extensions=False,
-               min_severity=None, save_global_exclusion=False):
+               min_severity=None, save_global_exclusion=False, jobs=1):
 
     require_azure_cli()
 
     from azure.cli.core import get_default_cli  # pylint: disable=import-error
-    from azure.cli.core.file_util import (  # pylint: disable=import-error
-        get_all_help, create_invoker_and_load_cmds_and_args)
 
     heading('CLI Linter')
 
@@ -54,6 +53,9 @@ def run_linter(modules=None, rule_types=None, rules=None, ci_exclusions=None,
             raise CLIError("Please specify a valid linter severity. It should be one of: {}"
                            .format(", ".join(valid_choices)))
 
+    if jobs < 0:
+        raise CLIError('usage error: --jobs must be 0 or greater.')
+
     # needed to remove helps from azdev
     azdev_helps = helps.copy()
     exclusions = {}
@@ -117,25 +119,21 @@ def run_linter(modules=None, rule_types=None, rules=None, ci_exclusions=None,
     az_cli = get_default_cli()
 
     # load commands, args, and help
-    create_invoker_and_load_cmds_and_args(az_cli)
-    loaded_help = get_all_help(az_cli)
+    # only load the changed modules when linting a git diff
+    snapshot = load_command_table_snapshot(az_cli, selected_modules=selected_modules if git_target else None)
 
     stop = time.time()
     logger.info('Commands and help loaded in %i sec', stop - start)
-    command_loader = az_cli.invocation.commands_loader
+    command_loader = snapshot.command_loader
 
     # format loaded help
-    loaded_help = {data.command: data for data in loaded_help if data.command}
-
-    # load yaml help
-    help_file_entries = {}
-    for entry_name, help_yaml in helps.items():
-        # ignore help entries from azdev itself, unless it also coincides
-        # with a CLI or extension command name.
-        if entry_name in azdev_helps and entry_name not in command_loader.command_table:
-            continue
-        help_entry = yaml.safe_load(help_yaml)
-        help_file_entries[entry_name] = help_entry
+    loaded_help = {data.command: data for data in snapshot.loaded_help if data.command}
+
+    # load yaml help, ignoring help entries from azdev itself, unless it also coincides
+    # with a CLI or extension command name.
+    help_file_entries = load_help_entries(snapshot.helps, [
+        entry_name for entry_name in snapshot.helps
+        if entry_name not in azdev_helps or entry_name in command_loader.command_table])
 
     # trim command table and help to just selected_modules
     command_loader, help_file_entries = filter_modules(
@@ -155,7 +153,8 @@ def run_linter(modules=None, rule_types=None, rules=None, ci_exclusions=None,
                                    update_global_exclusion=update_global_exclusion,
                                    git_source=git_source,
                                    git_target=git_target,
-                                   git_repo=git_repo)
+                                   git_repo=git_repo,
+                                   jobs=jobs)
 
     subheading('Results')
     logger.info('Running linter: %i commands, %i help entries',
@@ -4,29 +4,38 @@
 # license information.
 # -----------------------------------------------------------------------------
 
-from difflib import context_diff
+from difflib import unified_diff
 from enum import Enum
 from importlib import import_module
 import inspect
+import multiprocessing
 import os
 import re
 from pkgutil import iter_modules
 import yaml
 from knack.log import get_logger
 
+from azdev.operations.recording import get_recording_commands
 from azdev.operations.regex import (
     get_all_tested_commands_from_regex,
     search_argument,
     search_argument_context,
     search_command,
     search_command_group)
-from azdev.utilities import diff_branches_detail
+from azdev.utilities import diff_branches_detail, parse_unified_diff
 from azdev.utilities.path import get_cli_repo_path, get_ext_repo_paths
-from .util import share_element, exclude_commands, LinterError
+from .util import exclude_commands, LinterError
 
 PACKAGE_NAME = 'azdev.operations.linter'
 _logger = get_logger(__name__)
 
+# rule groups whose rules can be split into shards of entities and run in worker processes
+_PARALLEL_RULE_TYPES = ['help_file_entries', 'command_groups', 'commands', 'params']
+# shards per worker, so that a few slow shards do not leave the other workers idle
+_SHARDS_PER_JOB = 4
+# set in the parent right before the pool is forked, so that workers share the loaded command table
+_WORKER_LINTER_MANAGER = None
+
 
 class LinterSeverity(Enum):
     HIGH = 2
@@ -45,6 +54,31 @@ class LinterSeverity(Enum):
         return sorted(LinterSeverity, key=lambda sev: sev.value)
 
 
+class _ParameterMetadata:  # pylint: disable=too-few-public-methods
+    """ Flattened metadata of a single command argument, as needed by the parameter rules. """
+    __slots__ = ('settings', 'options', 'deprecate_info', 'deprecated_options', 'help')
+
+    def __init__(self, settings, option_helps):
+        from knack.deprecation import Deprecated
+        self.settings = settings
+        self.options = settings.get('options_list')
+        self.deprecate_info = settings.get('deprecate_info', None)
+        self.deprecated_options = [opt for opt in self.options or [] if isinstance(opt, Deprecated)]
+        self.help = self._find_help(option_helps)
+
+    def _find_help(self, option_helps):
+        if option_helps is None:
+            # the command has no loaded help
+            return None
+        # the first parameter help, in help order, that shares an option with this argument
+        matches = [option_helps[opt] for opt in self.options or [] if isinstance(opt, str) and opt in option_helps]
+        if not matches:
+            # workaround for --ids which is not does not generate doc help (BUG)
+            return self.settings.get('help')
+        _, param_help = min(matches, key=lambda match: match[0])
+        return param_help.short_summary or param_help.long_summary
+
+
 class Linter:  # pylint: disable=too-many-public-methods, too-many-instance-attributes
     def __init__(self, command_loader=None, help_file_entries=None, loaded_help=None, git_source=None, git_target=None,
                  git_repo=None, exclusions=None):
@@ -52,17 +86,24 @@ class Linter:  # pylint: disable=too-many-public-methods, too-many-instance-attr
         self._loaded_help = loaded_help
         self._command_loader = command_loader
         self._parameters = {}
+        self._parameter_metadata = {}
         self._help_file_entries = set(help_file_entries.keys())
-        self._command_parser = command_loader.cli_ctx.invocation.parser
+        self._command_parser = None
         self._command_groups = []
         for command_name, command in self._command_loader.command_table.items():
             self._parameters[command_name] = set()
-            for name in command.arguments:
+            option_helps = self._get_option_helps(command_name)
+            for name, argument in command.arguments.items():
                 self._parameters[command_name].add(name)
+                self._parameter_metadata[(command_name, name)] = _ParameterMetadata(argument.type.settings,
+                                                                                    option_helps)
         self.git_source = git_source
         self.git_target = git_target
         self.git_repo = git_repo
         self.exclusions = exclusions
+        self._test_coverage_changes = None
+        self._blob_lines = {}
+        self._file_lines = {}
 
     @property
     def commands(self):
@@ -89,6 +130,9 @@ class Linter:  # pylint: disable=too-many-public-methods, too-many-instance-attr
 
     @property
     def command_parser(self):
+        # only a few rules need the parser, which is expensive to build for a command table restored from snapshot
+        if self._command_parser is None:
+            self._command_parser = self._command_loader.cli_ctx.invocation.parser
         return self._command_parser
 
     @property
@@ -130,25 +174,13 @@ class Linter:  # pylint: disable=too-many-public-methods, too-many-instance-attr
         return self._get_loaded_help_description(command_group_name)
 
     def get_parameter_options(self, command_name, parameter_name):
-        return self.get_command_metadata(command_name).arguments.get(parameter_name).type.settings.get('options_list')
+        return self._parameter_metadata[(command_name, parameter_name)].options
 
     def get_parameter_help(self, command_name, parameter_name):
-        options = self.get_parameter_options(command_name, parameter_name)
-        command_help = self._loaded_help.get(command_name, None)
-
-        if not command_help:
-            return None
-
-        parameter_helps = command_help.parameters
-        param_help = next((param for param in parameter_helps if share_element(options, param.name.split())), None)
-        # workaround for --ids which is not does not generate doc help (BUG)
-        if not param_help:
-            command_args = self._command_loader.command_table.get(command_name).arguments
-            return command_args.get(parameter_name).type.settings.get('help')
-        return param_help.short_summary or param_help.long_summary
+        return self._parameter_metadata[(command_name, parameter_name)].help
 
     def get_parameter_settings(self, command_name, parameter_name):
-        return self.get_command_metadata(command_name).arguments.get(parameter_name).type.settings
+        return self._parameter_metadata[(command_name, parameter_name)].settings
 
     def command_expired(self, command_name):
         deprecate_info = self._command_loader.command_table[command_name].deprecate_info
@@ -171,21 +203,25 @@ class Linter:  # pylint: disable=too-many-public-methods, too-many-instance-attr
         return False
 
     def parameter_expired(self, command_name, parameter_name):
-        parameter = self._command_loader.command_table[command_name].arguments[parameter_name].type.settings
-        deprecate_info = parameter.get('deprecate_info', None)
+        deprecate_info = self._parameter_metadata[(command_name, parameter_name)].deprecate_info
         if deprecate_info:
             return deprecate_info.expired()
         return False
 
     def option_expired(self, command_name, parameter_name):
-        from knack.deprecation import Deprecated
-        parameter = self._command_loader.command_table[command_name].arguments[parameter_name].type.settings
-        options_list = parameter.get('options_list', [])
-        expired_options_list = []
-        for opt in options_list:
-            if isinstance(opt, Deprecated) and opt.expired():
-                expired_options_list.append(opt.target)
-        return expired_options_list
+        deprecated_options = self._parameter_metadata[(command_name, parameter_name)].deprecated_options
+        return [opt.target for opt in deprecated_options if opt.expired()]
+
+    def _get_option_helps(self, command_name):
+        """ Returns {option: (position, parameter help)} for the loaded help of a command, or None without help. """
+        command_help = self._loaded_help.get(command_name, None) if self._loaded_help else None
+        if not command_help:
+            return None
+        option_helps = {}
+        for position, param_help in enumerate(getattr(command_help, 'parameters', None) or []):
+            for option in param_help.name.split():
+                option_helps.setdefault(option, (position, param_help))
+        return option_helps
 
     def _get_loaded_help_description(self, entry):
         help_entry = self._loaded_help.get(entry, None)
@@ -194,17 +230,38 @@ class Linter:  # pylint: disable=too-many-public-methods, too-many-instance-attr
         return help_entry
 
     def get_command_test_coverage(self):
-        diff_index = diff_branches_detail(repo=self.git_repo, target=self.git_target, source=self.git_source)
-        commands, _ = self._detect_new_command(diff_index)
-        all_tested_command = self._detect_tested_command(diff_index)
+        commands, _, all_tested_command = self._get_test_coverage_changes()
         return self._run_command_test_coverage(commands, all_tested_command)
 
     def get_parameter_test_coverage(self):
-        diff_index = diff_branches_detail(repo=self.git_repo, target=self.git_target, source=self.git_source)
-        _, parameters = self._detect_new_command(diff_index)
-        all_tested_command = self._detect_tested_command(diff_index)
+        _, parameters, all_tested_command = self._get_test_coverage_changes()
         return self._run_parameter_test_coverage(parameters, all_tested_command)
 
+    def _get_test_coverage_changes(self):
+        """ Returns the new commands, new parameters and tested commands of the git diff.
+
+        They are computed once per linter and shared by the command and parameter test coverage rules.
+        """
+        if self._test_coverage_changes is None:
+            diff_index = diff_branches_detail(repo=self.git_repo, target=self.git_target, source=self.git_source)
+            commands, parameters = self._detect_new_command(diff_index)
+            all_tested_command = self._detect_tested_command(diff_index)
+            self._test_coverage_changes = commands, parameters, all_tested_command
+        return self._test_coverage_changes
+
+    def _read_blob_lines(self, blob):
+        if blob is None:
+            return []
+        if blob.hexsha not in self._blob_lines:
+            self._blob_lines[blob.hexsha] = blob.data_stream.read().decode("utf-8").splitlines(True)
+        return self._blob_lines[blob.hexsha]
+
+    def _read_file_lines(self, path):
+        if path not in self._file_lines:
+            with open(path, encoding='utf-8') as f:
+                self._file_lines[path] = f.readlines()
+        return self._file_lines[path]
+
     # pylint: disable=too-many-locals, too-many-nested-blocks, too-many-branches, too-many-statements
     def _detect_new_command(self, diff_index):
         """
@@ -216,7 +273,6 @@ class Linter:  # pylint: disable=too-many-public-methods, too-many-instance-attr
         YELLOW = '\x1b[33m'
         parameters = []
         commands = []
-        lines = []
         exclude_comands = []
         exclude_parameters = []
         for c, v in self.exclusions.items():
@@ -232,28 +288,18 @@ class Linter:  # pylint: disable=too-many-public-methods, too-many-instance-attr
 
         for diff in diff_index:
             filename = diff.a_path.split('/')[-1]
-            if 'params' in filename or 'commands' in filename:
-                lines = list(
-                    context_diff(diff.a_blob.data_stream.read().decode("utf-8").splitlines(True) if diff.a_blob else [],
-                                 diff.b_blob.data_stream.read().decode("utf-8").splitlines(True) if diff.b_blob else [],
-                                 'Original', 'Current'))
-            for row_num, line in enumerate(lines):
+            if 'params.py' not in filename and 'commands.py' not in filename:
+                continue
+            hunks = parse_unified_diff(unified_diff(self._read_blob_lines(diff.a_blob),
+                                                    self._read_blob_lines(diff.b_blob), 'Original', 'Current'))
+            # only inserted lines count as new, changed lines do not
+            added_lines = [(new_line, '+' + text) for hunk in hunks for new_line, text in hunk.added_lines(False)]
+            for new_line, line in added_lines:
                 if 'params.py' in filename:
                     params, param_name = search_argument(line)
                     if params:
-                        offset = -1
-                        while row_num > 0:
-                            row_num -= 1
-                            # Match row num '--- 156,163 ----'
-                            sub_pattern = r'--- (\d{0,}),(?:\d{0,}) ----'
-                            idx = re.findall(sub_pattern, lines[row_num])
-                            offset += 1
-                            if idx:
-                                idx = int(idx[0]) + offset
-                                break
-                        with open(os.path.join(get_cli_repo_path(), diff.a_path), encoding='utf-8') as f:
-                            param_lines = f.readlines()
-                        cmds = search_argument_context(idx, param_lines)
+                        param_lines = self._read_file_lines(os.path.join(get_cli_repo_path(), diff.a_path))
+                        cmds = search_argument_context(new_line, param_lines)
                         for cmd in cmds:
                             if cmd not in exclude_comands and \
                                     not list(filter(lambda x, c=cmd, p=param_name: c in x[0] and p in x[1], exclude_parameters)):  # pylint: disable=line-too-long
@@ -265,19 +311,8 @@ class Linter:  # pylint: disable=too-many-public-methods, too-many-instance-attr
                 if 'commands.py' in filename:
                     command = search_command(line)
                     if command:
-                        offset = -1
-                        while row_num > 0:
-                            row_num -= 1
-                            # Match row num '--- 156,163 ----'
-                            sub_pattern = r'--- (\d{0,}),(?:\d{0,}) ----'
-                            idx = re.findall(sub_pattern, lines[row_num])
-                            offset += 1
-                            if idx:
-                                idx = int(idx[0]) + offset
-                                break
-                        with open(os.path.join(get_cli_repo_path(), diff.a_path), encoding='utf-8') as f:
-                            cmd_lines = f.readlines()
-                        cmd = search_command_group(idx, cmd_lines, command)
+                        cmd_lines = self._read_file_lines(os.path.join(get_cli_repo_path(), diff.a_path))
+                        cmd = search_command_group(new_line, cmd_lines, command)
                         if cmd:
                             if cmd in exclude_comands:
                                 print('%sCommand %s not test and exclude in linter_exclusions.yml' % (YELLOW, cmd))
@@ -299,15 +334,7 @@ class Linter:  # pylint: disable=too-many-public-methods, too-many-instance-attr
                 all_tested_command += ref
             # get tested command by recording file
             if re.findall(r'test_.*.yaml', filename) and os.path.exists(os.path.join(get_cli_repo_path(), diff.a_path)):
-                with open(os.path.join(self.git_repo, diff.a_path)) as f:
-                    records = yaml.load(f, Loader=yaml.Loader) or {}
-                    for record in records['interactions']:
-                        # parse command ['acr agentpool create']
-                        command = record['request']['headers'].get('CommandName', [''])[0]
-                        # parse argument ['-n -r']
-                        argument = record['request']['headers'].get('ParameterSetName', [''])[0]
-                        if command or argument:
-                            all_tested_command.append(command + ' ' + argument)
+                all_tested_command += get_recording_commands(os.path.join(self.git_repo, diff.a_path))
         _logger.debug('All tested command: %s', all_tested_command)
         return all_tested_command
 
@@ -359,7 +386,7 @@ class LinterManager:
 
     def __init__(self, command_loader=None, help_file_entries=None, loaded_help=None, exclusions=None,
                  rule_inclusions=None, use_ci_exclusions=None, min_severity=None, update_global_exclusion=None,
-                 git_source=None, git_target=None, git_repo=None):
+                 git_source=None, git_target=None, git_repo=None, jobs=1):
         # default to running only rules of the highest severity
         self.min_severity = min_severity or LinterSeverity.get_ordered_members()[-1]
         self._exclusions = exclusions or {}
@@ -376,6 +403,8 @@ class LinterManager:
         self._ci = use_ci_exclusions if use_ci_exclusions is not None else os.environ.get('CI', False)
         self._violiations = {}
         self._update_global_exclusion = update_global_exclusion
+        self._rule_linters = {}
+        self._jobs = jobs or multiprocessing.cpu_count()
 
     def add_rule(self, rule_type, rule_name, rule_callable, rule_severity):
         include_rule = not self._rule_inclusions or rule_name in self._rule_inclusions
@@ -384,13 +413,16 @@ class LinterManager:
                 # if a rule has exclusions return a linter that factors in those exclusions
                 # otherwise return the main linter.
                 if rule_name in self._ci_exclusions and self._ci:
-                    mod_exclusions = self._ci_exclusions[rule_name]
-                    command_loader, help_file_entries = exclude_commands(
-                        self._command_loader,
-                        self._help_file_entries,
-                        mod_exclusions)
-                    return Linter(command_loader=command_loader, help_file_entries=help_file_entries,
-                                  loaded_help=self._loaded_help)
+                    if rule_name not in self._rule_linters:
+                        mod_exclusions = self._ci_exclusions[rule_name]
+                        command_loader, help_file_entries = exclude_commands(
+                            self._command_loader,
+                            self._help_file_entries,
+                            mod_exclusions)
+                        self._rule_linters[rule_name] = Linter(command_loader=command_loader,
+                                                               help_file_entries=help_file_entries,
+                                                               loaded_help=self._loaded_help)
+                    return self._rule_linters[rule_name]
                 return self.linter
 
             self._rules[rule_type][rule_name] = rule_callable, get_linter, rule_severity
@@ -428,23 +460,17 @@ class LinterManager:
                     found_rules.add(rule_name)
                     add_to_linter_func(self)
 
-        # run all rule-checks
-        if run_help_files_entries and self._rules.get('help_file_entries'):
-            # print('help_file_entries')
-            self._run_rules('help_file_entries')
+        rule_groups = [rule_group for rule_group, run_group in [('help_file_entries', run_help_files_entries),
+                                                                  ('command_groups', run_command_groups),
+                                                                  ('commands', run_commands),
+                                                                  ('params', run_params),
+                                                                  ('command_test_coverage', run_command_test_coverage)]
+                       if run_group and self._rules.get(rule_group)]
 
-        if run_command_groups and self._rules.get('command_groups'):
-            # print('command_groups')
-            self._run_rules('command_groups')
-
-        if run_commands and self._rules.get('commands'):
-            self._run_rules('commands')
-
-        if run_params and self._rules.get('params'):
-            self._run_rules('params')
-
-        if run_command_test_coverage and self._rules.get('command_test_coverage'):
-            self._run_rules('command_test_coverage')
+        # run all rule-checks, the results are always reported in the same order
+        shard_results = self._run_rule_shards(rule_groups) if self._jobs > 1 else {}
+        for rule_group in rule_groups:
+            self._run_rules(rule_group, shard_results.get(rule_group))
 
         if not self.exit_code:
             print(os.linesep + 'No violations found for linter rules.')
@@ -469,13 +495,93 @@ class LinterManager:
 
         return self.exit_code
 
-    def _run_rules(self, rule_group):
+    def _get_rule_entities(self, rule_group):
+        linter = self.linter
+        if rule_group == 'params':
+            return [(command_name, parameter_name) for command_name in linter.commands
+                    for parameter_name in sorted(linter.get_command_parameters(command_name))]
+        return sorted(getattr(linter, rule_group))
+
+    def _get_rule_batches(self, rule_group):
+        """ Groups the applicable rules of a rule group into batches that are checked in one pass over the entities.
+
+        All rules that use the main linter are fused into one batch. A rule with CI exclusions has a linter of its own
+        and therefore gets a batch of its own.
+        """
+        fused_rules = []
+        batches = []
+        for rule_name, (_, linter_callable, rule_severity) in self._rules[rule_group].items():
+            if self.min_severity.value > rule_severity.value:
+                continue
+            if linter_callable() is self.linter:
+                fused_rules.append(rule_name)
+            else:
+                batches.append((rule_name,))
+        if fused_rules:
+            batches.insert(0, tuple(fused_rules))
+        return batches
+
+    def _check_rules(self, rule_group, rule_names, entities=None):
+        """ Checks a batch of rules. Returns {rule_name: [violations]}. """
+        from .rule_decorators import run_fused_rules
+
+        rules = [(rule_name, self._rules[rule_group][rule_name][0], self._rules[rule_group][rule_name][2])
+                 for rule_name in rule_names]
+        with LinterScope(self, self._rules[rule_group][rule_names[0]][1]):
+            return run_fused_rules(self, rule_group, rules, entities)
+
+    def _run_rule_shards(self, rule_groups):
+        """ Runs the rules of the given groups in a pool of forked workers.
+
+        Every batch of rules splits its entities into shards. Workers return the violations of a shard, which are
+        merged back per rule. Returns {rule_group: {rule_name: [violations]}}.
+        """
+        global _WORKER_LINTER_MANAGER  # pylint: disable=global-statement
+
+        if 'fork' not in multiprocessing.get_all_start_methods():
+            _logger.warning('Running linter rules in a single process: the platform does not support fork.')
+            return {}
+
+        tasks = []
+        for rule_group in rule_groups:
+            if rule_group not in _PARALLEL_RULE_TYPES:
+                continue
+            for rule_names in self._get_rule_batches(rule_group):
+                with LinterScope(self, self._rules[rule_group][rule_names[0]][1]):
+                    entities = self._get_rule_entities(rule_group)
+                shard_size = max(1, -(-len(entities) // (self._jobs * _SHARDS_PER_JOB)))
+                for start in range(0, len(entities), shard_size):
+                    tasks.append((rule_group, rule_names, entities[start:start + shard_size]))
+        if not tasks:
+            return {}
+
+        _logger.info('Running %i linter rule shards in %i processes', len(tasks), self._jobs)
+        _WORKER_LINTER_MANAGER = self
+        try:
+            with multiprocessing.get_context('fork').Pool(self._jobs, _linter_worker_init) as pool:
+                results = pool.map(_run_rule_shard, tasks, chunksize=1)
+        finally:
+            _WORKER_LINTER_MANAGER = None
+
+        shard_results = {}
+        for (rule_group, _, _), violations in zip(tasks, results):
+            group_results = shard_results.setdefault(rule_group, {})
+            for rule_name, rule_violations in violations.items():
+                group_results.setdefault(rule_name, []).extend(rule_violations)
+        return shard_results
+
+    def _run_rules(self, rule_group, rule_results=None):
         # https://docs.microsoft.com/en-us/windows/console/console-virtual-terminal-sequences#text-formatting
         RED = '\x1b[31m'
         GREEN = '\x1b[32m'
         YELLOW = '\x1b[33m'
         CYAN = '\x1b[36m'
         RESET = '\x1b[39m'
+        if rule_results is None and rule_group in _PARALLEL_RULE_TYPES:
+            # check all rules of the group in as few passes over the entities as possible
+            rule_results = {}
+            for rule_names in self._get_rule_batches(rule_group):
+                rule_results.update(self._check_rules(rule_group, rule_names))
         # print('enter _run_rules')
         for rule_name, (rule_func, linter_callable, rule_severity) in self._rules.get(rule_group).items():
             # print('enter_items')
@@ -486,7 +592,12 @@ class LinterManager:
                 # if the rule's severity is lower than the linter's severity skip it.
                 if self._linter_severity_is_applicable(rule_severity, rule_name):
                     # print('enter violations', rule_func)
-                    violations = sorted(rule_func()) or []
+                    if rule_results is not None:
+                        violations = sorted(rule_results.get(rule_name, []))
+                        if violations:
+                            self.mark_rule_failure(rule_severity)
+                    else:
+                        violations = sorted(rule_func()) or []
                     # print('enter to find')
                     if violations:
                         if rule_severity == LinterSeverity.HIGH:
@@ -526,6 +637,16 @@ class LinterManager:
                 'rule_exclusions', []).append(rule_name)
 
 
+def _linter_worker_init():
+    import signal
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def _run_rule_shard(task):
+    rule_group, rule_names, entities = task
+    return _WORKER_LINTER_MANAGER._check_rules(rule_group, rule_names, entities)  # pylint: disable=protected-access
+
+
 class RuleError(Exception):
     """
     Exception thrown by rule violation
@@ -43,63 +43,92 @@ class CommandCoverageRule(BaseRule):
 class HelpFileEntryRule(BaseRule):
 
     def __call__(self, func):
-        return _get_decorator(func, 'help_file_entries', 'Help-Entry: `{}`', self.severity)
+        return _get_decorator(func, 'help_file_entries', self.severity)
 
 
 # command_rule
 class CommandRule(BaseRule):
 
     def __call__(self, func):
-        return _get_decorator(func, 'commands', 'Command: `{}`', self.severity)
+        return _get_decorator(func, 'commands', self.severity)
 
 
 # command_group_rule
 class CommandGroupRule(BaseRule):
 
     def __call__(self, func):
-        return _get_decorator(func, 'command_groups', 'Command-Group: `{}`', self.severity)
+        return _get_decorator(func, 'command_groups', self.severity)
 
 
 # parameter_rule
 class ParameterRule(BaseRule):
 
     def __call__(self, func):
-        def add_to_linter(linter_manager):
-            def wrapper():
-                linter = linter_manager.linter
-
-                for command_name in linter.commands:
-                    for parameter_name in linter.get_command_parameters(command_name):
-                        exclusion_parameters = linter_manager.exclusions.get(command_name, {}).get('parameters', {})
-                        exclusions = exclusion_parameters.get(parameter_name, {}).get('rule_exclusions', [])
-                        if func.__name__ not in exclusions:
-                            try:
-                                func(linter, command_name, parameter_name)
-                            except RuleError as ex:
-                                linter_manager.mark_rule_failure(self.severity)
-                                yield (_create_violation_msg(ex, 'Parameter: {}, `{}`', command_name, parameter_name),
-                                       (command_name, parameter_name),
-                                       func.__name__)
-
-            linter_manager.add_rule('params', func.__name__, wrapper, self.severity)
-        add_to_linter.linter_rule = True
-        return add_to_linter
-
-
-def _get_decorator(func, rule_group, print_format, severity):
+        return _get_decorator(func, 'params', self.severity)
+
+
+_VIOLATION_FORMATS = {
+    'help_file_entries': 'Help-Entry: `{}`',
+    'commands': 'Command: `{}`',
+    'command_groups': 'Command-Group: `{}`',
+    'params': 'Parameter: {}, `{}`',
+}
+
+
+def run_fused_rules(linter_manager, rule_group, rules, entities=None):
+    """ Checks several rules of one rule group in a single pass over the entities of the current linter.
+
+    :param linter_manager: The LinterManager whose linter and exclusions are used.
+    :param rule_group: One of 'help_file_entries', 'commands', 'command_groups' or 'params'.
+    :param rules: [(rule_name, rule_callable, severity)] of rules registered through the decorators of this module.
+    :param entities: Entities to check, defaults to all entities of the rule group.
+    :returns: {rule_name: [(violation_msg, entity, rule_name)]}
+    """
+    linter = linter_manager.linter
+    checks = [(rule_name, rule_callable.rule_check, severity) for rule_name, rule_callable, severity in rules]
+    violations = {rule_name: [] for rule_name, _, _ in checks}
+    exclusions = _get_exclusion_sets(linter_manager.exclusions, rule_group)
+    print_format = _VIOLATION_FORMATS[rule_group]
+    is_param = rule_group == 'params'
+
+    if entities is None:
+        if is_param:
+            entities = ((command_name, parameter_name) for command_name in linter.commands
+                        for parameter_name in linter.get_command_parameters(command_name))
+        else:
+            entities = getattr(linter, rule_group)
+
+    for entity in entities:
+        excluded = exclusions.get(entity, ())
+        entity_args = entity if is_param else (entity,)
+        for rule_name, check, severity in checks:
+            if rule_name in excluded:
+                continue
+            try:
+                check(linter, *entity_args)
+            except RuleError as ex:
+                linter_manager.mark_rule_failure(severity)
+                violations[rule_name].append((_create_violation_msg(ex, print_format, *entity_args), entity, rule_name))
+    return violations
+
+
+def _get_exclusion_sets(exclusions, rule_group):
+    """ Returns {entity: set of excluded rule names} for the entities of a rule group. """
+    if rule_group == 'params':
+        return {(command_name, parameter_name): set((parameter or {}).get('rule_exclusions', []))
+                for command_name, command in exclusions.items()
+                for parameter_name, parameter in ((command or {}).get('parameters') or {}).items()}
+    return {entity: set((entity_exclusions or {}).get('rule_exclusions', []))
+            for entity, entity_exclusions in exclusions.items()}
+
+
+def _get_decorator(func, rule_group, severity):
     def add_to_linter(linter_manager):
-        def wrapper():
-            linter = linter_manager.linter
-            # print('enter add to linter', len(getattr(linter, rule_group)))
-            for iter_entity in getattr(linter, rule_group):
-                exclusions = linter_manager.exclusions.get(iter_entity, {}).get('rule_exclusions', [])
-                if func.__name__ not in exclusions:
-                    try:
-                        func(linter, iter_entity)
-                    except RuleError as ex:
-                        linter_manager.mark_rule_failure(severity)
-                        yield (_create_violation_msg(ex, print_format, iter_entity), iter_entity, func.__name__)
+        def wrapper(entities=None):
+            yield from run_fused_rules(linter_manager, rule_group, [(func.__name__, wrapper, severity)],
+                                       entities)[func.__name__]
 
+        wrapper.rule_check = func
         linter_manager.add_rule(rule_group, func.__name__, wrapper, severity)
     add_to_linter.linter_rule = True
     return add_to_linter
@@ -0,0 +1,102 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+# -----------------------------------------------------------------------------
+
+"""
+Local store of performance measurements under `<azdev config dir>/perf`, used to compare a run against earlier ones.
+"""
+
+import json
+import os
+import re
+import time
+
+from knack.log import get_logger
+from knack.util import CLIError
+
+from azdev.utilities import get_azdev_config_dir
+
+logger = get_logger(__name__)
+
+PERF_STORE_DIR = 'perf'
+LOAD_TIME_BASELINE_FILE = 'load_times.json'
+LOAD_TIME_BASELINE_VERSION = 1
+# samples kept per module, the oldest are dropped first
+MAX_BASELINE_SAMPLES = 100
+BENCHMARK_DIR = 'benchmarks'
+BENCHMARK_VERSION = 1
+
+_BENCHMARK_NAME_PATTERN = re.compile(r'^[\w.-]+$')
+
+
+def get_perf_store_dir():
+    return os.path.join(get_azdev_config_dir(), PERF_STORE_DIR)
+
+
+class LoadTimeBaseline:
+    """ Module load times in ms of earlier `azdev perf load-times` runs, by module. """
+
+    def __init__(self, path=None):
+        self.path = path or os.path.join(get_perf_store_dir(), LOAD_TIME_BASELINE_FILE)
+        self.samples = {}
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+            if data.get('version') == LOAD_TIME_BASELINE_VERSION:
+                self.samples = data['modules']
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError, AttributeError) as ex:
+            logger.warning('Ignoring unreadable load time baseline %s: %s', self.path, ex)
+
+    def get(self, mod):
+        return self.samples.get(mod, [])
+
+    def add(self, mod, values):
+        self.samples[mod] = (self.samples.get(mod, []) + list(values))[-MAX_BASELINE_SAMPLES:]
+
+    def reset(self, mod, values):
+        self.samples[mod] = list(values)[-MAX_BASELINE_SAMPLES:]
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = '{}.{}.tmp'.format(self.path, os.getpid())
+        with open(tmp_path, 'w') as f:
+            json.dump({'version': LOAD_TIME_BASELINE_VERSION, 'modules': self.samples}, f)
+        os.replace(tmp_path, self.path)
+
+
+def _get_benchmark_path(name):
+    if not _BENCHMARK_NAME_PATTERN.match(name):
+        raise CLIError('usage error: benchmark name may only contain letters, digits, "_", "-" and ".": {}'.format(
+            name))
+    return os.path.join(get_perf_store_dir(), BENCHMARK_DIR, '{}.json'.format(name))
+
+
+def save_benchmark(name, results):
+    """ Stores the results of `azdev perf benchmark` under a name. Returns the path of the file. """
+    path = _get_benchmark_path(name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump({'version': BENCHMARK_VERSION, 'name': name, 'created': time.time(), 'results': results}, f,
+                  indent=2)
+    return path
+
+
+def load_benchmark(name):
+    """ Returns the stored results of `azdev perf benchmark` by name, or from a JSON file path. """
+    path = name if os.path.isfile(name) else _get_benchmark_path(name)
+    try:
+        with open(path, 'r') as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        raise CLIError('No saved benchmark "{}". Use `azdev perf benchmark --save {}` to create it.'.format(name, name))
+    except (OSError, ValueError) as ex:
+        raise CLIError('Unable to read benchmark {}: {}'.format(path, ex))
+    # plain `azdev perf benchmark -o json` output is accepted as well
+    results = data.get('results') if isinstance(data, dict) else data
+    if not isinstance(results, list):
+        raise CLIError('Unable to read benchmark {}: no results found'.format(path))
+    return results
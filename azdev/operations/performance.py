@@ -4,70 +4,101 @@
 # license information.
 # -----------------------------------------------------------------------------
 
+import os
 import re
+import shlex
+import shutil
+import subprocess
+import sys
+import tempfile
 import timeit
 
 from knack.log import get_logger
 from knack.util import CLIError
 
+from azdev.operations.perf_store import LoadTimeBaseline, load_benchmark, save_benchmark
 from azdev.utilities import (
-    display, heading, subheading, cmd, py_cmd, require_azure_cli)
+    display, heading, subheading, cmd, require_azure_cli)
 
 logger = get_logger(__name__)
 
 TOTAL = 'ALL'
 TOTAL_THRESHOLD = 300
 DEFAULT_THRESHOLD = 10
+# seconds a benchmark may take per command
+_BENCHMARK_TIMEOUT = 1000
 THRESHOLDS = {
     # threshold value: num of exceptions allowed
     50: 2,
     40: 3
 }
-
-
-# pylint: disable=too-many-statements
-def check_load_time(runs=3):
+# significance level of the one-sided test for a module loading slower than its baseline
+REGRESSION_ALPHA = 0.01
+# smallest slowdown of the median load time treated as a regression, in ms and relative to the baseline
+REGRESSION_MIN_MS = 1
+REGRESSION_MIN_RATIO = 0.1
+# baseline samples needed before a module is compared with its baseline
+MIN_BASELINE_SAMPLES = 5
+# runs before the first comparison with the baseline, which ends the check early when the answer is clear
+MIN_LOOK_RUNS = 3
+REGRESSED = 'regressed'
+UNDECIDED = 'undecided'
+
+
+# pylint: disable=too-many-statements, too-many-locals, too-many-branches
+def check_load_time(runs=3, import_time=False, output_dir=None, max_runs=None, no_baseline=False,
+                    update_baseline=False):
 
     require_azure_cli()
 
-    heading('Module Load Performance')
+    if no_baseline and update_baseline:
+        raise CLIError('usage error: --no-baseline | --update-baseline')
 
-    regex = r"[^']*'(?P<mod>[^']*)'[\D]*(?P<val>[\d\.]*)"
+    heading('Module Load Performance')
 
-    results = {TOTAL: []}
-    # Time the module loading X times
-    for i in range(0, runs + 1):
-        lines = cmd('az -h --debug', show_stderr=True).result
-        if i == 0:
-            # Ignore the first run since it can be longer due to *.pyc file compilation
+    if import_time:
+        _check_import_time(runs, output_dir)
+        return
+
+    baseline = None if no_baseline else LoadTimeBaseline()
+    max_runs = max(runs, runs * 4 if max_runs is None else max_runs)
+    looks = get_look_schedule(runs, max_runs) if baseline else [runs]
+    # the chance of finding a regression that isn't there at any of the looks stays below REGRESSION_ALPHA
+    alpha = REGRESSION_ALPHA / len(looks)
+
+    # Ignore the first run since it can be longer due to *.pyc file compilation
+    _measure_load_times()
+
+    results = {}
+    regressions = {}
+    # Time the module loading until the comparison with the baseline is conclusive at one of the looks
+    for i in range(looks[-1]):
+        for mod, val in _measure_load_times().items():
+            results.setdefault(mod, []).append(val)
+        if i + 1 not in looks:
             continue
-
-        try:
-            lines = lines.decode().splitlines()
-        except AttributeError:
-            lines = lines.splitlines()
-        total_time = 0
-        for line in lines:
-            if line.startswith('DEBUG: Loaded module'):
-                matches = re.match(regex, line)
-                mod = matches.group('mod')
-                val = float(matches.group('val')) * 1000
-                total_time = total_time + val
-                if mod in results:
-                    results[mod].append(val)
-                else:
-                    results[mod] = [val]
-        results[TOTAL].append(total_time)
+        if not baseline:
+            break
+        regressions = _test_load_time_regressions(results, baseline, alpha)
+        if not regressions and i + 1 < runs:
+            # no module has a baseline to compare with yet
+            continue
+        undecided = [mod for mod, (verdict, _, _) in regressions.items() if verdict == UNDECIDED]
+        if not undecided:
+            break
+        logger.info('Run %d: comparison with the baseline is inconclusive for %s', i + 1, ', '.join(undecided))
 
     passed_mods = {}
     failed_mods = {}
+    # threshold value: num of exceptions left
+    exceptions_left = dict(THRESHOLDS)
 
     def _claim_higher_threshold(val):
-        avail_thresholds = {k: v for k, v in THRESHOLDS.items() if v}
+        avail_thresholds = {k: v for k, v in exceptions_left.items() if v}
         new_threshold = None
         for threshold in sorted(avail_thresholds):
             if val < threshold:
-                THRESHOLDS[threshold] = THRESHOLDS[threshold] - 1
+                exceptions_left[threshold] -= 1
                 new_threshold = threshold
             break
         return new_threshold
@@ -78,13 +109,18 @@ def check_load_time(runs=3):
         mean_val = mean(val)
         stdev_val = pstdev(val)
         threshold = TOTAL_THRESHOLD if mod == TOTAL else DEFAULT_THRESHOLD
+        verdict, baseline_val, p_value = regressions.get(mod, (None, None, None))
         statistics = {
             'average': mean_val,
             'stdev': stdev_val,
             'threshold': threshold,
+            'baseline': baseline_val,
+            'p_value': p_value,
             'values': val
         }
-        if mean_val > threshold:
+        if verdict == REGRESSED:
+            failed_mods[mod] = statistics
+        elif mean_val > threshold:
             # claim a threshold exception if available
             new_threshold = _claim_higher_threshold(mean_val)
             if new_threshold:
@@ -96,6 +132,8 @@ def check_load_time(runs=3):
             passed_mods[mod] = statistics
 
     subheading('Results')
+    if baseline and (update_baseline or not failed_mods):
+        _update_baseline(baseline, results, regressions if update_baseline else {})
     if failed_mods:
         display('== PASSED MODULES ==')
         display_table(passed_mods)
@@ -104,7 +142,8 @@ def check_load_time(runs=3):
         raise CLIError("""
 FAILED: Some modules failed. If values are close to the threshold, rerun. If values
 are large, check that you do not have top-level imports like azure.mgmt or msrestazure
-in any modified files.
+in any modified files. Modules with a p-value are significantly slower than the baseline.
+Use --update-baseline to accept the load times of a deliberate slowdown.
 """)
 
     display("== PASSED MODULES ==")
@@ -116,6 +155,111 @@ in any modified files.
     )
 
 
+def _update_baseline(baseline, results, regressions):
+    """ Adds the load times of a run to the baseline. Modules that are noticeably slower than their baseline start a
+    new one, since the earlier samples would keep them regressed. """
+    for mod, val in results.items():
+        verdict = regressions.get(mod, (None, None, None))[0]
+        if verdict in (REGRESSED, UNDECIDED):
+            logger.warning('Replacing the load time baseline of %s', mod)
+            baseline.reset(mod, val)
+        else:
+            baseline.add(mod, val)
+    baseline.save()
+
+
+def _measure_load_times():
+    """ Returns the load time in ms of every module, and their TOTAL, logged by one run of `az -h --debug`. """
+    regex = r"[^']*'(?P<mod>[^']*)'[\D]*(?P<val>[\d\.]*)"
+
+    lines = cmd('az -h --debug', show_stderr=True).result
+    try:
+        lines = lines.decode().splitlines()
+    except AttributeError:
+        lines = lines.splitlines()
+    results = {TOTAL: 0}
+    for line in lines:
+        if line.startswith('DEBUG: Loaded module'):
+            matches = re.match(regex, line)
+            mod = matches.group('mod')
+            val = float(matches.group('val')) * 1000
+            results[TOTAL] += val
+            results[mod] = val
+    return results
+
+
+def get_look_schedule(runs, max_runs):
+    """ Returns the numbers of runs after which the load times are compared with the baseline: after
+    `MIN_LOOK_RUNS`, after `runs` and after every further `runs` up to `max_runs`.
+
+    The schedule is fixed in advance, so that the significance level can be split between its looks.
+    """
+    looks = {min(runs, MIN_LOOK_RUNS), max_runs}
+    looks.update(range(runs, max_runs + 1, runs))
+    return sorted(looks)
+
+
+def _test_load_time_regressions(results, baseline, alpha=REGRESSION_ALPHA):
+    """ Compares the load times of every module with its baseline.
+
+    :returns: dict of module to (verdict, baseline median, p-value). Verdict is REGRESSED when the module is
+        significantly and noticeably slower, UNDECIDED when it is noticeably slower but not yet significantly, and
+        None otherwise. Modules without enough baseline samples are left out.
+    """
+    regressions = {}
+    for mod, val in results.items():
+        history = baseline.get(mod)
+        if len(history) < MIN_BASELINE_SAMPLES:
+            continue
+        baseline_val = median(history)
+        p_value = mann_whitney_u(val, history)
+        verdict = None
+        if median(val) - baseline_val > max(REGRESSION_MIN_MS, baseline_val * REGRESSION_MIN_RATIO):
+            verdict = REGRESSED if p_value < alpha else UNDECIDED
+        regressions[mod] = (verdict, baseline_val, p_value)
+    return regressions
+
+
+def _check_import_time(runs, output_dir):
+    import json
+    from azdev.operations.importtime import (
+        get_command_module_imports, merge_import_trees, parse_import_time, write_collapsed_stacks)
+
+    python_bin = _get_python_bin()
+    roots = []
+    for i in range(0, runs + 1):
+        result = subprocess.run([python_bin, '-X', 'importtime', '-m', 'azure.cli', '-h'],
+                                stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, check=False)
+        if i == 0:
+            # Ignore the first run since it can be longer due to *.pyc file compilation
+            continue
+        roots.append(parse_import_time(result.stderr.decode('utf-8', 'replace').splitlines()))
+
+    root = merge_import_trees(roots)
+    modules = get_command_module_imports(root)
+    if not modules:
+        raise CLIError('No command module was imported by `az -h`. Check that Azure CLI is installed.')
+
+    output_dir = os.path.abspath(output_dir or os.getcwd())
+    os.makedirs(output_dir, exist_ok=True)
+    json_path = os.path.join(output_dir, 'import_time.json')
+    with open(json_path, 'w') as f:
+        json.dump({'runs': runs, 'modules': modules, 'tree': root.to_dict()}, f, indent=2)
+    collapsed_path = os.path.join(output_dir, 'import_time.collapsed')
+    with open(collapsed_path, 'w') as f:
+        write_collapsed_stacks(root, f)
+
+    subheading('Results')
+    display('{:<20} {:>12} {:>12}   {}'.format('Module', 'Self', 'Cumulative', 'Heaviest imports'))
+    for mod, val in sorted(modules.items(), key=lambda item: item[1]['cumulative_ms'], reverse=True):
+        display('{:<20} {:>12.0f} {:>12.0f}   {}'.format(
+            mod, val['self_ms'], val['cumulative_ms'],
+            ', '.join('{} ({:.0f})'.format(name, ms) for name, ms in val['heavy_imports'])))
+    display('\nAverage import time of all modules: {:.0f} ms'.format(root.cumulative_us / 1000))
+    display('Import tree written to {}\nCollapsed stacks for flame graphs written to {}'.format(
+        json_path, collapsed_path))
+
+
 def mean(data):
     """Return the sample arithmetic mean of data."""
     n = len(data)
@@ -139,91 +283,271 @@ def pstdev(data):
     return (ss / n) ** 0.5
 
 
+def median(data):
+    """Return the median of data."""
+    data = sorted(data)
+    n = len(data)
+    if n < 1:
+        raise ValueError("len < 1")
+    if n % 2:
+        return data[n // 2]
+    return (data[n // 2 - 1] + data[n // 2]) / 2
+
+
+def mann_whitney_u(data, baseline):
+    """Return the p-value of the one-sided Mann-Whitney U test that data tends to be greater than baseline.
+
+    Uses the normal approximation with tie and continuity correction.
+    """
+    from math import erfc, sqrt
+
+    n1, n2 = len(data), len(baseline)
+    if n1 < 1 or n2 < 1:
+        raise ValueError("len < 1")
+    combined = sorted([(x, True) for x in data] + [(x, False) for x in baseline])
+    n = n1 + n2
+    rank_sum = 0.0
+    tie_term = 0
+    i = 0
+    while i < n:
+        j = i
+        while j + 1 < n and combined[j + 1][0] == combined[i][0]:
+            j += 1
+        # ranks i + 1 to j + 1 share their average
+        rank = (i + j) / 2 + 1
+        rank_sum += rank * sum(1 for _, in_data in combined[i:j + 1] if in_data)
+        tie_term += (j - i + 1) ** 3 - (j - i + 1)
+        i = j + 1
+
+    u = rank_sum - n1 * (n1 + 1) / 2
+    sigma = sqrt(n1 * n2 / 12 * ((n + 1) - tie_term / (n * (n - 1)))) if n > 1 else 0
+    if not sigma:
+        return 1.0
+    z = (u - n1 * n2 / 2 - 0.5) / sigma
+    return 0.5 * erfc(z / sqrt(2))
+
+
 def display_table(data):
-    display('{:<20} {:>12} {:>12} {:>12} {:>25}'.format('Module', 'Average', 'Threshold', 'Stdev', 'Values'))
+    display('{:<20} {:>12} {:>12} {:>12} {:>12} {:>12} {:>25}'.format(
+        'Module', 'Average', 'Threshold', 'Stdev', 'Baseline', 'P-value', 'Values'))
     for key, val in data.items():
-        display('{:<20} {:>12.0f} {:>12.0f} {:>12.0f} {:>25}'.format(
-            key, val['average'], val['threshold'], val['stdev'], str(val['values'])))
+        baseline = '-' if val.get('baseline') is None else '{:.0f}'.format(val['baseline'])
+        p_value = '-' if val.get('p_value') is None else '{:.3f}'.format(val['p_value'])
+        display('{:<20} {:>12.0f} {:>12.0f} {:>12.0f} {:>12} {:>12} {:>25}'.format(
+            key, val['average'], val['threshold'], val['stdev'], baseline, p_value,
+            str([round(x) for x in val['values']])))
 
 
 # require azdev setup
-def benchmark(commands=None, runs=20):
+def benchmark(commands=None, runs=20, jobs=None, profile=False, hotspots=10, output_dir=None, save=None):
     if runs <= 0:
         raise CLIError("Number of runs must be greater than 0.")
+    if jobs is not None and jobs < 0:
+        raise CLIError("usage error: --jobs must be 0 or greater.")
+    if profile and hotspots <= 0:
+        raise CLIError("usage error: --hotspots must be greater than 0.")
 
     if not commands:
         commands = _benchmark_load_all_commands()
 
-    result = []
-
     import multiprocessing
 
-    # Measure every wanted commands
-    for raw_command in commands:
-        logger.info("Measuring %s...", raw_command)
+    cpus = _benchmark_get_cpus()
+    jobs = min(jobs or _benchmark_default_jobs(cpus), len(cpus))
+    python_bin = _get_python_bin()
 
-        # pylint: disable=consider-using-with
-        pool = multiprocessing.Pool(multiprocessing.cpu_count(), _benchmark_process_pool_init)
+    # every profiled run writes a file of its own, merged per command in the end
+    profile_dir = tempfile.mkdtemp() if profile else None
+    profile_paths = [[os.path.join(profile_dir, '{}_{}.prof'.format(idx, run)) if profile else None
+                      for run in range(runs)] for idx in range(len(commands))]
 
-        # try/except like this because of a bug of Python multiprocessing.Pool (https://bugs.python.org/issue8296)
-        # Discussion on StackOverflow:
-        # https://stackoverflow.com/questions/1408356/keyboard-interrupts-with-pythons-multiprocessing-pool/1408476
-        try:
-            time_series = pool.map_async(_benchmark_cmd_timer, [raw_command] * runs).get(1000)
-        except multiprocessing.TimeoutError:
-            pool.terminate()
-            break
-        else:
-            pool.close()
-        pool.join()
+    logger.info("Measuring %d commands %d times in %d processes...", len(commands), runs, jobs)
+
+    # pylint: disable=consider-using-with
+    pool = multiprocessing.Pool(jobs, _benchmark_process_pool_init,
+                                (cpus, jobs, multiprocessing.Value('i', 0)))
+    timeout = _BENCHMARK_TIMEOUT * len(commands)
+
+    # try/except like this because of a bug of Python multiprocessing.Pool (https://bugs.python.org/issue8296)
+    # Discussion on StackOverflow:
+    # https://stackoverflow.com/questions/1408356/keyboard-interrupts-with-pythons-multiprocessing-pool/1408476
+    try:
+        # an untimed run of every command compiles the *.pyc files, the timed runs are then interleaved so that
+        # any change of the machine's load affects all commands alike
+        pool.map_async(_benchmark_cmd_timer, [(python_bin, c, None) for c in commands], chunksize=1).get(timeout)
+        tasks = [(python_bin, c, profile_paths[idx][run]) for run in range(runs) for idx, c in enumerate(commands)]
+        time_series = pool.map_async(_benchmark_cmd_timer, tasks, chunksize=1).get(timeout)
+    except multiprocessing.TimeoutError:
+        pool.terminate()
+        if profile_dir:
+            shutil.rmtree(profile_dir, ignore_errors=True)
+        raise CLIError("Benchmark did not finish within {} seconds.".format(timeout))
+    else:
+        pool.close()
+    pool.join()
 
-        staticstic = _benchmark_cmd_staticstic(time_series)
+    result = []
+    for idx, raw_command in enumerate(commands):
+        staticstic = _benchmark_cmd_staticstic(time_series[idx::len(commands)])
         staticstic.update({
             "Command": raw_command,
             "Runs": runs,
         })
+        if profile:
+            staticstic.update(_benchmark_save_profile(raw_command, profile_paths[idx], hotspots, output_dir))
 
         logger.info(staticstic)
 
         result.append(staticstic)
 
+    if profile_dir:
+        shutil.rmtree(profile_dir, ignore_errors=True)
+    if save:
+        logger.warning('Saved benchmark "%s" to %s', save, save_benchmark(save, result))
     return result
 
 
+def compare_benchmarks(benchmarks, threshold=10.0):
+    """ Compares the commands of two saved benchmarks and fails on regressions.
+
+    A command regresses when its median is more than `threshold` percent slower in the candidate and a one-sided
+    Mann-Whitney U test of the samples is significant.
+
+    :param benchmarks: names or paths of the baseline and the candidate benchmark.
+    """
+    baseline, candidate = benchmarks
+    if threshold < 0:
+        raise CLIError("usage error: --threshold must be 0 or greater.")
+
+    baseline_results = {r["Command"]: r for r in load_benchmark(baseline)}
+    result = []
+    regressions = []
+    for r in load_benchmark(candidate):
+        base = baseline_results.get(r["Command"])
+        if not base:
+            logger.warning('Command "%s" is not part of benchmark "%s", skipped.', r["Command"], baseline)
+            continue
+
+        # results saved before samples were kept only have their median
+        base_samples, samples = base.get("Samples"), r.get("Samples")
+        base_val = median(base_samples) if base_samples else base["Media"]
+        val = median(samples) if samples else r["Media"]
+        delta = (val - base_val) / base_val * 100 if base_val else 0.0
+        p_value = mann_whitney_u(samples, base_samples) if samples and base_samples else None
+        regressed = delta > threshold and p_value is not None and p_value < REGRESSION_ALPHA
+
+        item = {
+            "Command": r["Command"],
+            "Baseline": round(base_val, 4),
+            "Candidate": round(val, 4),
+            "Delta": round(delta, 1),
+            "PValue": None if p_value is None else round(p_value, 4),
+            "Regression": regressed,
+        }
+        result.append(item)
+        if regressed:
+            regressions.append(item)
+
+    if regressions:
+        raise CLIError("{} of {} commands are significantly slower than in \"{}\":\n{}".format(
+            len(regressions), len(result), baseline, "\n".join(
+                "  {}: {:.4f}s -> {:.4f}s (+{:.1f}%, p={:.4f})".format(
+                    item["Command"], item["Baseline"], item["Candidate"], item["Delta"], item["PValue"])
+                for item in regressions)))
+    return result
+
+
+def _benchmark_save_profile(raw_command, paths, hotspots, output_dir):
+    """ Merges the profiles of all runs of a command into a .pstats file and returns its hot functions. """
+    from azdev.operations.hotspots import get_hotspots, load_profiles
+
+    stats, runs = load_profiles(paths)
+    if not stats:
+        logger.warning("No profile was written for %s", raw_command)
+        return {"Hotspots": [], "Profile": None}
+
+    output_dir = os.path.abspath(output_dir or os.getcwd())
+    os.makedirs(output_dir, exist_ok=True)
+    profile_path = os.path.join(output_dir, '{}.pstats'.format(re.sub(r'[^\w.-]+', '_', raw_command).strip('_')))
+    stats.dump_stats(profile_path)
+    return {"Hotspots": get_hotspots(stats, runs, hotspots), "Profile": profile_path}
+
+
 def _benchmark_load_all_commands():
     try:
         from azure.cli.core import get_default_cli
-        from azure.cli.core.file_util import create_invoker_and_load_cmds_and_args
     except ImportError:
         raise CLIError("Azure CLI is not installed")
 
-    az_cli = get_default_cli()
-
-    create_invoker_and_load_cmds_and_args(az_cli)
+    from azdev.operations.snapshot import load_command_names
 
-    commands = list(az_cli.invocation.commands_loader.command_table.keys())
+    commands = load_command_names(get_default_cli())
 
     commands = [cmd + " --help" for cmd in commands]
 
     return sorted(commands)
 
 
-def _benchmark_process_pool_init():
+def _benchmark_get_cpus():
+    """ Returns the CPUs the benchmark may run on. """
+    try:
+        return sorted(os.sched_getaffinity(0))
+    except AttributeError:
+        return list(range(os.cpu_count() or 1))
+
+
+def _benchmark_default_jobs(cpus):
+    """ Uses half of the CPUs, so that the timed commands do not compete with each other or the rest of the machine. """
+    return max(1, len(cpus) // 2)
+
+
+def _get_python_bin():
+    from azdev.utilities import get_env_path
+    env_path = get_env_path()
+    if not env_path:
+        return sys.executable
+    return os.path.join(env_path, 'Scripts' if sys.platform == 'win32' else 'bin', 'python')
+
+
+def _benchmark_process_pool_init(cpus, jobs, counter):
     import signal
     signal.signal(signal.SIGINT, signal.SIG_IGN)
 
+    # pin every worker, and the commands it starts, to a CPU of its own
+    with counter.get_lock():
+        cpu = cpus[counter.value * len(cpus) // jobs % len(cpus)]
+        counter.value += 1
+    if hasattr(os, 'sched_setaffinity'):
+        try:
+            os.sched_setaffinity(0, {cpu})
+        except OSError as ex:
+            logger.debug("Unable to pin benchmark worker to CPU %s: %s", cpu, ex)
+
 
-def _benchmark_cmd_timer(raw_command):
+def _benchmark_cmd_timer(task):
+    python_bin, raw_command, profile_path = task
+    args = [python_bin, '-m', 'azure.cli'] + shlex.split(raw_command)
+    if profile_path:
+        args[1:1] = ['-m', 'cProfile', '-o', profile_path]
     s = timeit.default_timer()
-    py_cmd("azure.cli {}".format(raw_command), is_module=True)
+    subprocess.run(args, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=False)
     e = timeit.default_timer()
     return round(e - s, 4)
 
 
+def _benchmark_percentile(sorted_series, percent):
+    """ Returns the percentile of sorted data, interpolating linearly between the closest ranks. """
+    pos = (len(sorted_series) - 1) * percent / 100
+    low = int(pos)
+    high = min(low + 1, len(sorted_series) - 1)
+    return sorted_series[low] + (sorted_series[high] - sorted_series[low]) * (pos - low)
+
+
 def _benchmark_cmd_staticstic(time_series: list):
     from math import sqrt
 
-    time_series.sort()
+    samples = list(time_series)
+    time_series = sorted(time_series)
 
     size = len(time_series)
 
@@ -246,4 +570,8 @@ def _benchmark_cmd_staticstic(time_series: list):
         "Media": round(mid_time, 4),
         "Avg": round(avg_time, 4),
         "Std": round(std_deviation, 4),
+        "P50": round(_benchmark_percentile(time_series, 50), 4),
+        "P90": round(_benchmark_percentile(time_series, 90), 4),
+        "P99": round(_benchmark_percentile(time_series, 99), 4),
+        "Samples": samples,
     }
@@ -0,0 +1,160 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+# -----------------------------------------------------------------------------
+
+import yaml
+
+_YAML_LOADER = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+RECORDING_HEADERS = ('CommandName', 'ParameterSetName')
+# characters that start a plain YAML scalar only when it is not plain after all
+_NON_PLAIN_STARTS = '"\'&*!|>{}[]%@`#,?:'
+
+
+class _UnexpectedLayout(Exception):
+    pass
+
+
+def get_recording_commands(path):
+    """ Returns '<CommandName> <ParameterSetName>' of every interaction in a VCR recording file.
+
+    Only the request headers are extracted, without building the recorded bodies into objects. Recordings in the
+    layout written by vcrpy are scanned line by line, so memory use does not depend on the size of the responses.
+    Anything else is read through the YAML event API.
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return _scan_recording_lines(f)
+    except (_UnexpectedLayout, UnicodeDecodeError):
+        pass
+    with open(path, 'rb') as f:
+        return parse_recording_commands(f)
+
+
+def parse_recording_commands(stream):
+    """ Returns '<CommandName> <ParameterSetName>' of every interaction in a VCR recording stream.
+
+    Walks the YAML events instead of loading the document, so response bodies are never turned into objects.
+    """
+    commands = []
+    headers = {}
+    # [is_mapping, key, expecting_key] for every open mapping and sequence
+    stack = []
+    for event in yaml.parse(stream, Loader=_YAML_LOADER):
+        if isinstance(event, (yaml.ScalarEvent, yaml.AliasEvent)):
+            value = getattr(event, 'value', None)
+            top = stack[-1] if stack else None
+            if top and top[0] and top[2]:
+                top[1], top[2] = value, False
+                continue
+            # interactions[*].request.headers.<name>[0]
+            if len(stack) == 6 and not stack[5][0] and stack[4][1] in RECORDING_HEADERS and \
+                    stack[3][1] == 'headers' and stack[2][1] == 'request' and stack[0][1] == 'interactions':
+                headers.setdefault(stack[4][1], value)
+            if top and top[0]:
+                top[2] = True
+        elif isinstance(event, (yaml.MappingStartEvent, yaml.SequenceStartEvent)):
+            stack.append([isinstance(event, yaml.MappingStartEvent), None, True])
+        elif isinstance(event, (yaml.MappingEndEvent, yaml.SequenceEndEvent)):
+            stack.pop()
+            if len(stack) == 2 and stack[0][1] == 'interactions' and isinstance(event, yaml.MappingEndEvent):
+                _add_command(commands, headers)
+                headers = {}
+            if stack and stack[-1][0]:
+                stack[-1][2] = True
+    return commands
+
+
+def _add_command(commands, headers):
+    command = headers.get('CommandName', '')
+    argument = headers.get('ParameterSetName', '')
+    if command or argument:
+        commands.append(command + ' ' + argument)
+
+
+def _scan_recording_lines(lines):
+    """ Fast path for the block layout written by vcrpy:
+
+    interactions:
+    - request:
+        headers:
+          CommandName:
+          - group create
+
+    Raises _UnexpectedLayout for anything it does not understand.
+    """
+    commands = []
+    headers = None
+    # 'request' and 'headers' while inside the request of an interaction, None elsewhere
+    section = None
+    key = None
+    items = 0
+    value_lines = None
+
+    def _finish_value():
+        if value_lines is not None and key not in headers:
+            headers[key] = _plain_value(value_lines)
+
+    lines = iter(lines)
+    if next(lines, '').rstrip('\r\n') != 'interactions:':
+        raise _UnexpectedLayout()
+    for line in lines:
+        line = line.rstrip('\r\n')
+        stripped = line.lstrip(' ')
+        if not stripped:
+            if value_lines is not None:
+                raise _UnexpectedLayout()
+            continue
+        indent = len(line) - len(stripped)
+        if section == 'headers' and indent > 6:
+            # continuation of a header value or an item after the first one
+            if value_lines is not None:
+                value_lines.append(stripped)
+            continue
+        _finish_value()
+        value_lines = None
+
+        if indent == 0:
+            if headers is not None:
+                _add_command(commands, headers)
+                headers = None
+            if line == '- request:':
+                headers, section = {}, 'request'
+            elif line.startswith('-'):
+                raise _UnexpectedLayout()
+            else:
+                section = None
+        elif section is None or indent > 6 or (indent > 4 and section == 'request'):
+            continue
+        elif indent <= 2:
+            section = None
+        elif indent <= 4:
+            if stripped.startswith('headers:') and stripped != 'headers:':
+                raise _UnexpectedLayout()
+            section = 'headers' if line == '    headers:' else 'request'
+        elif stripped.startswith('- '):
+            items += 1
+            if items == 1 and key in RECORDING_HEADERS:
+                value_lines = [stripped[2:].strip()]
+        elif stripped.endswith(':'):
+            key, items = stripped[:-1], 0
+        else:
+            raise _UnexpectedLayout()
+    _finish_value()
+    if headers is not None:
+        _add_command(commands, headers)
+    return commands
+
+
+def _plain_value(value_lines):
+    first = value_lines[0]
+    if first.startswith("'") and len(value_lines) == 1 and len(first) > 1 and first.endswith("'") and \
+            "'" not in first[1:-1].replace("''", ''):
+        return first[1:-1].replace("''", "'")
+    if not first or first[0] in _NON_PLAIN_STARTS or first == '-' or first.startswith('- '):
+        raise _UnexpectedLayout()
+    for value_line in value_lines:
+        if ': ' in value_line or ' #' in value_line or value_line.endswith(':'):
+            raise _UnexpectedLayout()
+    return ' '.join(value_lines)
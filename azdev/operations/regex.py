@@ -5,30 +5,26 @@
 # -----------------------------------------------------------------------------
 
 import json
-import os
 import re
-import requests
-import yaml
 
-from knack.log import get_logger
-from azdev.utilities.path import get_cli_repo_path
+from azdev.operations.cmdcov_config import LINE_KIND_COMMENT, get_cmdcov_patterns
 
-logger = get_logger(__name__)
-
-try:
-    with open(os.path.join(get_cli_repo_path(), 'scripts', 'ci', 'cmdcov.yml'), 'r') as file:
-        config = yaml.safe_load(file)
-# pylint: disable=broad-exception-caught
-except Exception:
-    url = "https://raw.githubusercontent.com/Azure/azure-cli/dev/scripts/ci/cmdcov.yml"
-    response = requests.get(url)
-    config = yaml.safe_load(response.text)
-CMD_PATTERN = config['CMD_PATTERN']
-QUO_PATTERN = config['QUO_PATTERN']
-END_PATTERN = config['END_PATTERN']
-DOCS_END_PATTERN = config['DOCS_END_PATTERN']
-NOT_END_PATTERN = config['NOT_END_PATTERN']
-NUMBER_SIGN_PATTERN = config['NUMBER_SIGN_PATTERN']
+# Match `with self.argument_context('') as c:`
+ARGUMENT_CONTEXT_PATTERN = re.compile(r'with self.argument_context\(\'(.*?)\'[\),]')
+# Match `with self.argument_context(scope) as c:`
+ARGUMENT_CONTEXT_SCOPE_PATTERN = re.compile(r'with self.argument_context\(scope[\),]')
+# Match `with self.argument_context(\'{} stop\'.format(scope)) as c:',
+ARGUMENT_CONTEXT_FORMAT_PATTERN = re.compile(r'with self.argument_context\(\'(.*)\'.format\(scope\)\)')
+# Match `for scope in xxx:`
+SCOPE_LOOP_PATTERN = re.compile(r'for scope in (.*):')
+# Match ` + c.argument('xxx')?`
+ARGUMENT_PATTERN = re.compile(r'\+\s+c.argument\((.*)\)?')
+# Match ` options_list=xxx, or options_list=xxx)`
+OPTIONS_LIST_PATTERN = re.compile(r'options_list=\[(.*?)\]')
+# Match `with self.command_group('local-context',` and `with self.command_group('xxx')`
+COMMAND_GROUP_PATTERN = re.compile(r'with self.command_group\(\'(.*?)\',?')
+# Match `+ g.*command(xxx)`
+COMMAND_PATTERN = re.compile(r'\+\s+g.(?:\w+)?command\((.*)\)')
 
 
 def get_all_tested_commands_from_regex(lines):
@@ -36,35 +32,28 @@ def get_all_tested_commands_from_regex(lines):
     get all tested commands from test_*.py
     """
     # pylint: disable=too-many-nested-blocks
+    patterns = get_cmdcov_patterns()
     ref = []
     total_lines = len(lines)
     row_num = 0
     count = 1
     while row_num < total_lines:
-        re_idx = None
-        if re.findall(NUMBER_SIGN_PATTERN, lines[row_num]):
+        re_idx = _get_line_kind(patterns, lines[row_num])
+        if re_idx == LINE_KIND_COMMENT:
             row_num += 1
             continue
-        if re.findall(CMD_PATTERN[0], lines[row_num]):
-            re_idx = 0
-        if re_idx is None and re.findall(CMD_PATTERN[1], lines[row_num]):
-            re_idx = 1
-        if re_idx is None and re.findall(CMD_PATTERN[2], lines[row_num]):
-            re_idx = 2
-        if re_idx is None and re.findall(CMD_PATTERN[3], lines[row_num]):
-            re_idx = 3
         if re_idx is not None:
-            command = re.findall(CMD_PATTERN[re_idx], lines[row_num])[0]
+            command = patterns.cmd[re_idx].findall(lines[row_num])[0]
             while row_num < total_lines:
-                if (re_idx in [0, 1] and not re.findall(END_PATTERN, lines[row_num])) or \
+                if (re_idx in [0, 1] and not patterns.end.search(lines[row_num])) or \
                         (re_idx == 2 and (row_num + 1) < total_lines and
-                         re.findall(NOT_END_PATTERN, lines[row_num + 1])):
+                         patterns.not_end.search(lines[row_num + 1])):
                     row_num += 1
-                    cmd = re.findall(QUO_PATTERN, lines[row_num])
+                    cmd = patterns.quo.findall(lines[row_num])
                     if cmd:
                         command += cmd[0][1]
                 elif re_idx == 3 and (row_num + 1) < total_lines \
-                        and not re.findall(DOCS_END_PATTERN, lines[row_num]):
+                        and not patterns.docs_end.search(lines[row_num]):
                     row_num += 1
                     command += lines[row_num][:-1]
                 else:
@@ -84,34 +73,38 @@ def get_all_tested_commands_from_regex(lines):
     return ref
 
 
+def _get_line_kind(patterns, line):
+    """ Returns LINE_KIND_COMMENT, the index of the first command pattern the line matches, or None. """
+    for kind, literals, pattern in patterns.line_kinds:
+        for literal in literals:
+            if literal not in line:
+                break
+        else:
+            if pattern.search(line):
+                return kind
+    return None
+
+
 def search_argument_context(row_num, lines):
     cmds = []
     while row_num > 0:
         row_num -= 1
-        # Match `with self.argument_context('') as c:`
-        sub_pattern0 = r'with self.argument_context\(\'(.*?)\'[\),]'
-        # Match `with self.argument_context(scope) as c:`
-        sub_pattern1 = r'with self.argument_context\(scope[\),]'
-        # Match `with self.argument_context(\'{} stop\'.format(scope)) as c:',
-        sub_pattern2 = r'with self.argument_context\(\'(.*)\'.format\(scope\)\)'
-        ref0 = re.findall(sub_pattern0, lines[row_num])
-        ref1 = re.findall(sub_pattern1, lines[row_num])
-        ref2 = re.findall(sub_pattern2, lines[row_num])
+        ref0 = ARGUMENT_CONTEXT_PATTERN.findall(lines[row_num])
+        ref1 = ARGUMENT_CONTEXT_SCOPE_PATTERN.findall(lines[row_num])
+        ref2 = ARGUMENT_CONTEXT_FORMAT_PATTERN.findall(lines[row_num])
         # Match `with self.argument_context('') as c:`
         if ref0:
             cmds = ref0
             break
         # Match `with self.argument_context(scope) as c:`
         if ref1:
-            sub_pattern = r'for scope in (.*):'
             cmds = json.loads(
-                re.findall(sub_pattern, lines[row_num - 1])[0].replace('\'', '"'))
+                SCOPE_LOOP_PATTERN.findall(lines[row_num - 1])[0].replace('\'', '"'))
             break
         # Match `with self.argument_context(\'{} stop\'.format(scope)) as c:',
         if ref2:
-            sub_pattern = r'for scope in (.*):'
             format_strings = json.loads(
-                re.findall(sub_pattern, lines[row_num - 1])[0].replace('\'', '"'))
+                SCOPE_LOOP_PATTERN.findall(lines[row_num - 1])[0].replace('\'', '"'))
             for c in ref2:
                 for f in format_strings:
                     cmds.append(c.replace('{}', f))
@@ -122,16 +115,12 @@ def search_argument_context(row_num, lines):
 def search_argument(line):
     params = []
     param_name = ''
-    # Match ` + c.argument('xxx')?`
-    pattern = r'\+\s+c.argument\((.*)\)?'
-    ref = re.findall(pattern, line)
+    ref = ARGUMENT_PATTERN.findall(line)
     if ref:
         # strip ' and \' and )
         param_name = ref[0].split(',')[0].strip(r"'\'\)")
         if 'options_list' in ref[0]:
-            # Match ` options_list=xxx, or options_list=xxx)`
-            sub_pattern = r'options_list=\[(.*?)\]'
-            ref2 = re.findall(sub_pattern, ref[0])
+            ref2 = OPTIONS_LIST_PATTERN.findall(ref[0])
             if ref2:
                 params = ref2[0].replace('\'', '').replace('"', '').replace(' ', '').split(',')
         else:
@@ -144,9 +133,7 @@ def search_command_group(row_num, lines, command):
     cmd = ''
     while row_num > 0:
         row_num -= 1
-        # Match `with self.command_group('local-context',` and `with self.command_group('xxx')`
-        sub_pattern = r'with self.command_group\(\'(.*?)\',?'
-        group = re.findall(sub_pattern, lines[row_num])
+        group = COMMAND_GROUP_PATTERN.findall(lines[row_num])
         if group:
             cmd = group[0] + ' ' + command
             break
@@ -155,9 +142,7 @@ def search_command_group(row_num, lines, command):
 
 def search_command(line):
     command = ''
-    # Match `+ g.*command(xxx)`
-    pattern = r'\+\s+g.(?:\w+)?command\((.*)\)'
-    ref = re.findall(pattern, line)
+    ref = COMMAND_PATTERN.findall(line)
     if ref:
         command = ref[0].split(',')[0].strip("'")
     return command
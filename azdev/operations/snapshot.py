@@ -0,0 +1,681 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+# -----------------------------------------------------------------------------
+
+"""
+On-disk snapshot of the loaded Azure CLI command table.
+
+Loading every command module, its arguments and its help is what dominates the run time of `azdev linter`,
+`azdev cmdcov`, `azdev statistics list-command-table` and `azdev command-change meta-export`. The snapshot stores a
+reduced, picklable copy of the command table, command group table, loaded help and raw help YAML under the azdev
+config directory. It is keyed by content hashes of the sources of every module that contributes commands, and by the
+versions of the installed SDKs that argument help, choices and defaults come from, so a warm run restores the table
+without importing a single command module.
+"""
+
+import argparse
+from collections import namedtuple
+import hashlib
+import json
+import os
+import pickle
+import sys
+import zlib
+
+from knack.log import get_logger
+
+from azdev.utilities import (
+    cached_help_loading, get_azdev_config, get_azdev_config_dir, get_path_table, make_dirs)
+
+logger = get_logger(__name__)
+
+SNAPSHOT_VERSION = 2
+SNAPSHOT_DIR = 'command_table'
+SNAPSHOT_FILE = 'command_table.snapshot'
+SOURCE_HASHES_FILE = 'source_hashes.json'
+COMMAND_NAMES_FILE = 'command_names.json'
+
+_SKIPPED_DIRS = {'tests', '__pycache__'}
+# installed distributions whose versions are part of the snapshot key, besides the sources of the CLI and extensions
+_KEYED_DISTRIBUTION_PREFIXES = ('azure', 'msrest', 'knack')
+_PRIMITIVE_TYPES = (str, int, float, bool, type(None))
+_BUILTIN_TYPES = (str, int, float, bool)
+_ZERO_ARG_ACTIONS = (argparse._StoreConstAction, argparse._CountAction,  # pylint: disable=protected-access
+                     argparse._HelpAction, argparse._VersionAction)  # pylint: disable=protected-access
+
+# picklable stand-ins for objects that cannot be serialized as-is
+_DeprecationData = namedtuple('_DeprecationData', ['object_type', 'target', 'redirect', 'hide', 'expiration'])
+_ExtensionSourceData = namedtuple('_ExtensionSourceData',
+                                  ['extension_name', 'overrides_command', 'preview', 'experimental'])
+_TypeData = namedtuple('_TypeData', ['name'])
+_ActionData = namedtuple('_ActionData', ['name', 'takes_value'])
+_UNSET = object()
+
+
+def snapshot_enabled():
+    """ The snapshot can be turned off with `[snapshot] enabled = False` or AZDEV_SNAPSHOT_ENABLED=False. """
+    return get_azdev_config().getboolean('snapshot', 'enabled', fallback=True)
+
+
+def get_snapshot_dir():
+    return os.path.join(get_azdev_config_dir(), SNAPSHOT_DIR)
+
+
+def load_command_table_snapshot(cli_ctx, with_arguments=True, with_help=True, with_codegen_info=False,
+                                selected_modules=None):
+    """ Returns a CommandTableSnapshot for the given CLI context.
+
+    A snapshot whose key matches the current module sources is restored from disk. Otherwise the command table is
+    loaded from the CLI and, when the snapshot is enabled, written back to disk for the next run.
+
+    :param cli_ctx: The azure.cli.core CLI context (`get_default_cli()`).
+    :param with_arguments: Whether the caller needs command arguments. Only honored when no snapshot is written.
+    :param with_help: Whether the caller needs the loaded help. Only honored when no snapshot is written.
+    :param with_codegen_info: Whether the caller needs the codegen version of every command.
+    :param selected_modules: Path table (see `get_path_table`) of the only modules the caller is interested in,
+        usually the result of `filter_by_git_diff`. Without a valid snapshot only these modules are loaded.
+    """
+    # a change to the core can affect every command, so only command modules and extensions load incrementally
+    if selected_modules is not None and selected_modules.get('core'):
+        selected_modules = None
+
+    if not snapshot_enabled():
+        logger.info('Command table snapshot is disabled.')
+        return CommandTableSnapshot.from_cli(cli_ctx, with_arguments=with_arguments, with_help=with_help,
+                                             with_codegen_info=with_codegen_info, selected_modules=selected_modules)
+
+    snapshot_dir = get_snapshot_dir()
+    make_dirs(snapshot_dir)
+    hasher = SourceHasher(os.path.join(snapshot_dir, SOURCE_HASHES_FILE))
+    key, module_digests = compute_snapshot_key(cli_ctx, hasher)
+    hasher.save()
+
+    snapshot_path = os.path.join(snapshot_dir, SNAPSHOT_FILE)
+    data = _read_snapshot(snapshot_path, key)
+    if data is not None and (data['codegen_info'] is not None or not with_codegen_info):
+        logger.info('Command table restored from snapshot: %s', snapshot_path)
+        return CommandTableSnapshot.from_data(cli_ctx, data)
+
+    if selected_modules is not None:
+        # a partial table must not replace the snapshot
+        return CommandTableSnapshot.from_cli(cli_ctx, with_arguments=with_arguments, with_help=with_help,
+                                             with_codegen_info=with_codegen_info, selected_modules=selected_modules)
+
+    snapshot = CommandTableSnapshot.from_cli(cli_ctx, with_codegen_info=with_codegen_info)
+    _write_snapshot(snapshot_path, key, module_digests, snapshot.dump())
+    logger.info('Command table snapshot updated: %s', snapshot_path)
+    return snapshot
+
+
+def load_command_names(cli_ctx):
+    """ Returns the names of all commands without loading their arguments, and usually without loading the table.
+
+    The names are cached under the snapshot key, so they are read from disk while no module source changed. On a
+    miss they are taken from a current snapshot if there is one, or else from a command table loaded without
+    arguments.
+    """
+    if not snapshot_enabled():
+        return _load_command_names_from_cli(cli_ctx)
+
+    snapshot_dir = get_snapshot_dir()
+    make_dirs(snapshot_dir)
+    hasher = SourceHasher(os.path.join(snapshot_dir, SOURCE_HASHES_FILE))
+    key, module_digests = compute_snapshot_key(cli_ctx, hasher)
+    hasher.save()
+
+    names_path = os.path.join(snapshot_dir, COMMAND_NAMES_FILE)
+    try:
+        with open(names_path, 'r') as f:
+            data = json.load(f)
+        if data.get('version') == SNAPSHOT_VERSION and data.get('key') == key:
+            logger.info('Command names restored from %s', names_path)
+            return data['commands']
+    except (OSError, ValueError, AttributeError):
+        pass
+
+    data = _read_snapshot(os.path.join(snapshot_dir, SNAPSHOT_FILE), key)
+    commands = list(data['command_table']) if data is not None else _load_command_names_from_cli(cli_ctx)
+    tmp_path = '{}.{}.tmp'.format(names_path, os.getpid())
+    with open(tmp_path, 'w') as f:
+        json.dump({'version': SNAPSHOT_VERSION, 'key': key, 'modules': module_digests, 'commands': commands}, f)
+    os.replace(tmp_path, names_path)
+    return commands
+
+
+def _load_command_names_from_cli(cli_ctx):
+    from azdev.operations.statistics import _create_invoker_and_load_cmds
+    _create_invoker_and_load_cmds(cli_ctx)
+    return list(cli_ctx.invocation.commands_loader.command_table)
+
+
+def compute_snapshot_key(cli_ctx, hasher):
+    """ Returns the snapshot key and the per-module source digests it was computed from. """
+    path_table = get_path_table(include_whl_extensions=True)
+    module_digests = {}
+    for mod_type in ['core', 'mod', 'ext']:
+        # azure-cli itself contains the command modules, which are hashed on their own
+        skip_dirs = ['command_modules'] if mod_type == 'core' else None
+        for name, path in path_table.get(mod_type, {}).items():
+            module_digests['{}/{}'.format(mod_type, name)] = hasher.hash_tree(path, skip_dirs=skip_dirs)
+
+    cloud = getattr(cli_ctx, 'cloud', None)
+    key_data = {
+        'snapshot_version': SNAPSHOT_VERSION,
+        'python_version': list(sys.version_info[:2]),
+        'cli_version': cli_ctx.get_cli_version(),
+        'profile': getattr(cloud, 'profile', None),
+        'distributions': get_distribution_versions(),
+        'modules': module_digests
+    }
+    key = hashlib.sha1(json.dumps(key_data, sort_keys=True).encode('utf-8')).hexdigest()
+    return key, module_digests
+
+
+def get_distribution_versions(paths=None):
+    """ Returns the metadata directory names, which hold the name and version, of the installed azure-*, msrest and
+    knack distributions, e.g. `azure_mgmt_compute-30.0.0.dist-info`.
+
+    The command modules take argument help, choices and defaults from the SDKs, so installing another version of one
+    changes the command table without changing any source. The names are listed from the import paths rather than
+    read from every distribution's metadata, which would cost more than restoring the snapshot.
+    """
+    versions = set()
+    for path in sys.path if paths is None else paths:
+        try:
+            names = os.listdir(path or '.')
+        except OSError:
+            continue
+        versions.update(name for name in names if name.endswith(('.dist-info', '.egg-info')) and
+                        name.lower().startswith(_KEYED_DISTRIBUTION_PREFIXES))
+    return sorted(versions)
+
+
+class SourceHasher:
+    """ Content hashes of Python sources. Hashes are memoised by (mtime, size) so unchanged files are not re-read. """
+
+    def __init__(self, memo_path):
+        self._memo_path = memo_path
+        self._memo = {}
+        self._dirty = False
+        try:
+            with open(memo_path, 'r') as f:
+                self._memo = json.load(f)
+        except (OSError, ValueError):
+            pass
+
+    def hash_file(self, path):
+        stat = os.stat(path)
+        fingerprint = [stat.st_mtime_ns, stat.st_size]
+        memo = self._memo.get(path)
+        if memo and memo[:2] == fingerprint:
+            return memo[2]
+        with open(path, 'rb') as f:
+            digest = hashlib.sha1(f.read()).hexdigest()
+        self._memo[path] = fingerprint + [digest]
+        self._dirty = True
+        return digest
+
+    def hash_tree(self, root, skip_dirs=None):
+        """ Returns one digest for all *.py files below root, ignoring tests. """
+        skip_dirs = _SKIPPED_DIRS.union(skip_dirs or [])
+        digest = hashlib.sha1()
+        for path, dirs, files in os.walk(root):
+            dirs[:] = sorted(d for d in dirs if d not in skip_dirs and not d.endswith('-info'))
+            for file_name in sorted(files):
+                if not file_name.endswith('.py'):
+                    continue
+                file_path = os.path.join(path, file_name)
+                digest.update(os.path.relpath(file_path, root).replace(os.sep, '/').encode('utf-8'))
+                digest.update(self.hash_file(file_path).encode('utf-8'))
+        return digest.hexdigest()
+
+    def save(self):
+        if not self._dirty:
+            return
+        tmp_path = '{}.{}.tmp'.format(self._memo_path, os.getpid())
+        with open(tmp_path, 'w') as f:
+            json.dump(self._memo, f)
+        os.replace(tmp_path, self._memo_path)
+        self._dirty = False
+
+
+def _read_snapshot(snapshot_path, key):
+    try:
+        with open(snapshot_path, 'rb') as f:
+            header = pickle.load(f)
+            if header.get('version') != SNAPSHOT_VERSION or header.get('key') != key:
+                logger.info('Command table snapshot is stale.')
+                return None
+            return pickle.loads(zlib.decompress(f.read()))
+    except FileNotFoundError:
+        return None
+    except Exception as ex:  # pylint: disable=broad-except
+        logger.warning('Ignoring unreadable command table snapshot %s: %s', snapshot_path, ex)
+        return None
+
+
+def _write_snapshot(snapshot_path, key, module_digests, data):
+    header = {'version': SNAPSHOT_VERSION, 'key': key, 'modules': module_digests}
+    payload = zlib.compress(pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL), 1)
+    tmp_path = '{}.{}.tmp'.format(snapshot_path, os.getpid())
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(header, f, protocol=pickle.HIGHEST_PROTOCOL)
+        f.write(payload)
+    os.replace(tmp_path, snapshot_path)
+
+
+class CommandTableSnapshot:
+    """ A command table together with its loaded help and raw help YAML.
+
+    `command_loader` and `loaded_help` are drop-in replacements for `az_cli.invocation.commands_loader` and the result
+    of `get_all_help(az_cli)`. `helps` mirrors `knack.help_files.helps` after all modules were loaded.
+    """
+
+    def __init__(self, cli_ctx, command_loader, loaded_help, helps, codegen_info=None, restored=False):
+        self.cli_ctx = cli_ctx
+        self.command_loader = command_loader
+        self.loaded_help = loaded_help
+        self.helps = helps
+        self.codegen_info = codegen_info
+        self.restored = restored
+
+    @classmethod
+    def from_cli(cls, cli_ctx, with_arguments=True, with_help=True, with_codegen_info=False,
+                 selected_modules=None):
+        """ Loads the command table from the CLI itself, optionally restricted to the selected modules. """
+        from knack.help_files import helps
+        from azure.cli.core.file_util import (  # pylint: disable=import-error
+            get_all_help, create_invoker_and_load_cmds_and_args)
+
+        if selected_modules is not None:
+            _create_invoker_and_load_selected_cmds(cli_ctx, selected_modules,
+                                                   with_arguments=with_arguments or with_help)
+        elif with_arguments or with_help:
+            create_invoker_and_load_cmds_and_args(cli_ctx)
+        else:
+            from azdev.operations.statistics import _create_invoker_and_load_cmds
+            _create_invoker_and_load_cmds(cli_ctx)
+        loaded_help = []
+        if with_help:
+            with cached_help_loading():
+                loaded_help = get_all_help(cli_ctx)
+        command_loader = cli_ctx.invocation.commands_loader
+        codegen_info = _collect_codegen_info(command_loader) if with_codegen_info else None
+        return cls(cli_ctx, command_loader, loaded_help, dict(helps), codegen_info=codegen_info)
+
+    @classmethod
+    def from_data(cls, cli_ctx, data):
+        """ Rebuilds the command table from a dump without importing any command module. """
+        command_table = {name: SnapshotCommand(cli_ctx, name, command_data)
+                         for name, command_data in data['command_table'].items()}
+        command_group_table = {name: SnapshotCommandGroup(cli_ctx, group_data) if group_data is not None else None
+                               for name, group_data in data['command_group_table'].items()}
+        command_loader = SnapshotCommandsLoader(cli_ctx, command_table, command_group_table)
+        cli_ctx.invocation = SnapshotInvocation(cli_ctx, command_loader)
+        loaded_help = [SnapshotHelpFile(cli_ctx, help_data) for help_data in data['loaded_help']]
+        return cls(cli_ctx, command_loader, loaded_help, data['helps'], codegen_info=data['codegen_info'],
+                   restored=True)
+
+    def dump(self):
+        """ Returns a picklable dump made of builtin types and the stand-ins defined in this module. """
+        command_loader = self.command_loader
+        return {
+            'command_table': {name: _dump_command(command) for name, command in command_loader.command_table.items()},
+            'command_group_table': {name: _dump_command_group(group)
+                                    for name, group in command_loader.command_group_table.items()},
+            'loaded_help': [_dump_help_file(help_file) for help_file in self.loaded_help],
+            'helps': {name: text for name, text in self.helps.items() if isinstance(text, str)},
+            'codegen_info': self.codegen_info,
+        }
+
+
+class SnapshotCommandsLoader:
+    """ Stands in for the CLI commands loader of a restored snapshot. """
+
+    def __init__(self, cli_ctx, command_table, command_group_table):
+        self.cli_ctx = cli_ctx
+        self.command_table = command_table
+        self.command_group_table = command_group_table
+        self.cmd_to_loader_map = {name: [] for name in command_table}
+        self.skip_applicability = True
+
+    def load_arguments(self, command=None):  # pylint: disable=unused-argument
+        """ Arguments are part of the snapshot, there is nothing left to load. """
+
+
+class SnapshotInvocation:
+    """ Stands in for `cli_ctx.invocation`. The parser is only built when a rule needs it. """
+
+    def __init__(self, cli_ctx, commands_loader):
+        self.cli_ctx = cli_ctx
+        self.commands_loader = commands_loader
+        self._parser = None
+
+    @property
+    def parser(self):
+        if self._parser is None:
+            from knack.parser import CLICommandParser
+            from azure.cli.core.parser import AzCliCommandParser  # pylint: disable=import-error
+
+            global_parser = AzCliCommandParser.create_global_parser(cli_ctx=self.cli_ctx)
+            parser = AzCliCommandParser(cli_ctx=self.cli_ctx, prog=self.cli_ctx.name, parents=[global_parser])
+            # azure-cli's own loader expects live command objects, the generic knack one only needs the metadata
+            CLICommandParser.load_command_table(parser, self.commands_loader)
+            self._parser = parser
+        return self._parser
+
+
+class SnapshotCommand:  # pylint: disable=too-many-instance-attributes
+    """ Stands in for an AzCliCommand of a restored snapshot. """
+
+    def __init__(self, cli_ctx, name, data):
+        self.cli_ctx = cli_ctx
+        self.name = name
+        self.handler = None
+        self.validator = None
+        self.formatter_class = None
+        self.preview_info = None
+        self.experimental_info = None
+        self.description = data['description']
+        self.help = data['help']
+        self.command_source = _restore_command_source(data['command_source'])
+        self.deprecate_info = _restore_value(cli_ctx, data['deprecate_info'])
+        self.supports_no_wait = data['supports_no_wait']
+        self.confirmation = data['confirmation']
+        self.command_kwargs = {'is_preview': data['is_preview']}
+        self.arguments = {arg_name: _restore_argument(cli_ctx, settings)
+                          for arg_name, settings in data['arguments'].items()}
+        if data['aaz_arguments'] is not None:
+            self._args_schema = data['aaz_arguments']
+
+
+class SnapshotCommandGroup:
+    """ Stands in for an AzCommandGroup of a restored snapshot. """
+
+    def __init__(self, cli_ctx, data):
+        self.group_kwargs = {'deprecate_info': _restore_value(cli_ctx, data['deprecate_info'])}
+        if data['has_help']:
+            self.help = data['help']
+
+
+class SnapshotHelpFile:
+    """ Stands in for a CliCommandHelpFile or GroupHelpFile of a restored snapshot. """
+
+    def __init__(self, cli_ctx, data):
+        self.command = data['command']
+        self.type = data['type']
+        self.short_summary = data['short_summary']
+        self.long_summary = data['long_summary']
+        self.deprecate_info = _restore_value(cli_ctx, data['deprecate_info'])
+        if 'command_source' in data:
+            self.command_source = _restore_command_source(data['command_source'])
+        if 'parameters' in data:
+            self.parameters = [SnapshotHelpParameter(param_data) for param_data in data['parameters']]
+
+
+class SnapshotHelpParameter:
+    """ Stands in for a HelpParameter of a restored snapshot. """
+
+    def __init__(self, data):
+        self.name = data['name']
+        self.name_source = data['name_source']
+        self.short_summary = data['short_summary']
+        self.long_summary = data['long_summary']
+        self.required = data['required']
+
+
+def _create_invoker_and_load_selected_cmds(cli_ctx, selected_modules, with_arguments=True):
+    """ Mirrors `create_invoker_and_load_cmds_and_args`, but only imports the loaders of the selected command modules
+    and extensions. Every other module is left out of the command table as if it was not installed. """
+    from knack.events import EVENT_INVOKER_PRE_CMD_TBL_CREATE, EVENT_INVOKER_POST_CMD_TBL_CREATE
+    # pylint: disable=import-error
+    from azure.cli.core import _load_module_command_loader, _load_extension_command_loader
+    from azure.cli.core.commands import ExtensionCommandSource, register_cache_arguments
+    from azure.cli.core.commands.arm import register_global_subscription_argument, register_ids_argument
+    from azure.cli.core.commands.events import EVENT_INVOKER_PRE_LOAD_ARGUMENTS, EVENT_INVOKER_POST_LOAD_ARGUMENTS
+    from azure.cli.core.extension import get_extensions, get_extension_modname
+
+    register_global_subscription_argument(cli_ctx)
+    register_ids_argument(cli_ctx)
+    register_cache_arguments(cli_ctx)
+
+    invoker = cli_ctx.invocation_cls(cli_ctx=cli_ctx, commands_loader_cls=cli_ctx.commands_loader_cls,
+                                     parser_cls=cli_ctx.parser_cls, help_cls=cli_ctx.help_cls)
+    cli_ctx.invocation = invoker
+    commands_loader = invoker.commands_loader
+    commands_loader.skip_applicability = True
+    cli_ctx.raise_event(EVENT_INVOKER_PRE_CMD_TBL_CREATE, args=[])
+
+    for mod_name in selected_modules.get('mod', {}):
+        command_table, command_group_table = _load_module_command_loader(commands_loader, None, mod_name)
+        for command in command_table.values():
+            command.command_source = mod_name
+        commands_loader.command_table.update(command_table)
+        commands_loader.command_group_table.update(command_group_table)
+
+    extensions = {os.path.normcase(ext.path): ext for ext in get_extensions()}
+    for ext_path in selected_modules.get('ext', {}).values():
+        ext = extensions.get(os.path.normcase(ext_path))
+        if ext is None:
+            logger.warning('Skipping extension at %s, it is not installed.', ext_path)
+            continue
+        if ext.path not in sys.path:
+            sys.path.append(ext.path)
+        ext_mod = get_extension_modname(ext.name, ext_dir=ext.path)
+        command_table, command_group_table = _load_extension_command_loader(commands_loader, None, ext_mod)
+        for command_name, command in command_table.items():
+            command.command_source = ExtensionCommandSource(
+                extension_name=ext.name, overrides_command=command_name in commands_loader.command_table,
+                preview=ext.preview, experimental=ext.experimental)
+        commands_loader.command_table.update(command_table)
+        commands_loader.command_group_table.update(command_group_table)
+
+    commands_loader.command_name = ''
+    cli_ctx.raise_event(EVENT_INVOKER_POST_CMD_TBL_CREATE, commands_loader=commands_loader)
+    if with_arguments:
+        cli_ctx.raise_event(EVENT_INVOKER_PRE_LOAD_ARGUMENTS, commands_loader=commands_loader)
+        commands_loader.load_arguments()
+        cli_ctx.raise_event(EVENT_INVOKER_POST_LOAD_ARGUMENTS, commands_loader=commands_loader)
+    invoker.parser.cli_ctx = cli_ctx
+    invoker.parser.load_command_table(commands_loader)
+    logger.info('Loaded %i commands from %i selected modules', len(commands_loader.command_table),
+                len(selected_modules.get('mod', {})) + len(selected_modules.get('ext', {})))
+
+
+def _collect_codegen_info(command_loader):
+    from azdev.operations.statistics import _command_codegen_info
+    codegen_info = {}
+    for command_name, command in command_loader.command_table.items():
+        module_loader = command_loader.cmd_to_loader_map.get(command_name)
+        codegen_info[command_name] = _command_codegen_info(command_name, command, module_loader)
+    return codegen_info
+
+
+# region dump
+def _dump_value(value):
+    """ Returns a picklable copy of value, or _UNSET if it holds anything that is not plain data. """
+    from knack.deprecation import Deprecated
+
+    if isinstance(value, _PRIMITIVE_TYPES):
+        return value
+    if isinstance(value, Deprecated):
+        return _DeprecationData(value.object_type, value.target, value.redirect, value.hide, value.expiration)
+    if isinstance(value, (list, tuple)):
+        items = [_dump_value(item) for item in value]
+        return _UNSET if any(item is _UNSET for item in items) else items
+    if isinstance(value, dict):
+        items = {key: _dump_value(item) for key, item in value.items()}
+        if any(not isinstance(key, str) or item is _UNSET for key, item in items.items()):
+            return _UNSET
+        return items
+    return _UNSET
+
+
+def _dump_or_none(value):
+    value = _dump_value(value)
+    return None if value is _UNSET else value
+
+
+def _dump_settings(settings):
+    dumped = {}
+    for key, value in settings.items():
+        if key == 'type' and value is not None:
+            dumped[key] = value if value in _BUILTIN_TYPES else _TypeData(getattr(value, '__name__', str(value)))
+        elif key == 'action' and isinstance(value, type):
+            takes_value = not issubclass(value, _ZERO_ARG_ACTIONS)
+            dumped[key] = _ActionData(value.__name__, takes_value)
+        elif key == 'choices' and value is not None:
+            choices = _dump_value(list(value))
+            dumped[key] = choices if choices is not _UNSET else [str(choice) for choice in value]
+        elif key == 'default':
+            default = _dump_value(value)
+            dumped[key] = default if default is not _UNSET else str(value)
+        else:
+            value = _dump_value(value)
+            if value is not _UNSET:
+                dumped[key] = value
+    return dumped
+
+
+def _dump_command_source(command_source):
+    if command_source is None or isinstance(command_source, str):
+        return command_source
+    if hasattr(command_source, 'extension_name'):
+        return _ExtensionSourceData(command_source.extension_name,
+                                    getattr(command_source, 'overrides_command', False),
+                                    getattr(command_source, 'preview', False),
+                                    getattr(command_source, 'experimental', False))
+    return str(command_source)
+
+
+def _dump_aaz_arguments(command):
+    try:
+        args_schema = command._args_schema  # pylint: disable=protected-access
+    except AttributeError:
+        return None
+    if args_schema is None:
+        return None
+
+    from azdev.operations.command_change.custom import process_aaz_argument
+    aaz_arguments = {}
+    for argument in (command.arguments or {}).values():
+        settings = argument.type.settings
+        if 'dest' not in settings:
+            continue
+        para = {}
+        process_aaz_argument(args_schema, settings, para)
+        aaz_arguments[settings['dest']] = _dump_or_none(para) or {}
+    return aaz_arguments
+
+
+def _dump_command(command):
+    command_kwargs = getattr(command, 'command_kwargs', None) or {}
+    description = getattr(command, 'description', None)
+    return {
+        'description': description if isinstance(description, str) else None,
+        'help': _dump_or_none(getattr(command, 'help', None)),
+        'command_source': _dump_command_source(getattr(command, 'command_source', None)),
+        'deprecate_info': _dump_or_none(getattr(command, 'deprecate_info', None)),
+        'supports_no_wait': getattr(command, 'supports_no_wait', False),
+        'confirmation': getattr(command, 'confirmation', None) is True,
+        'is_preview': command_kwargs.get('is_preview', False),
+        'arguments': {name: _dump_settings(argument.type.settings)
+                      for name, argument in (command.arguments or {}).items()},
+        'aaz_arguments': _dump_aaz_arguments(command),
+    }
+
+
+def _dump_command_group(group):
+    if group is None:
+        return None
+    group_kwargs = getattr(group, 'group_kwargs', None) or {}
+    return {
+        'deprecate_info': _dump_or_none(group_kwargs.get('deprecate_info', None)),
+        # groups without help have no help attribute at all, which command-change relies on
+        'has_help': hasattr(group, 'help'),
+        'help': _dump_or_none(getattr(group, 'help', None)),
+    }
+
+
+def _dump_help_file(help_file):
+    data = {
+        'command': help_file.command,
+        'type': getattr(help_file, 'type', None),
+        'short_summary': _dump_or_none(getattr(help_file, 'short_summary', None)),
+        'long_summary': _dump_or_none(getattr(help_file, 'long_summary', None)),
+        'deprecate_info': _dump_or_none(getattr(help_file, 'deprecate_info', None)),
+    }
+    if hasattr(help_file, 'command_source'):
+        data['command_source'] = _dump_command_source(help_file.command_source)
+    if hasattr(help_file, 'parameters'):
+        data['parameters'] = [{
+            'name': param.name,
+            'name_source': list(getattr(param, 'name_source', None) or []),
+            'short_summary': _dump_or_none(getattr(param, 'short_summary', None)),
+            'long_summary': _dump_or_none(getattr(param, 'long_summary', None)),
+            'required': _dump_or_none(getattr(param, 'required', None)),
+        } for param in help_file.parameters]
+    return data
+# endregion
+
+
+# region restore
+class _SnapshotAction(argparse.Action):
+    """ Stands in for a custom argparse action, which cannot be serialized. """
+
+    def __call__(self, parser, namespace, values, option_string=None):
+        setattr(namespace, self.dest, values)
+
+
+def _restore_type(name):
+    def _identity(value):
+        return value
+    _identity.__name__ = name
+    return _identity
+
+
+def _restore_value(cli_ctx, value):
+    from knack.deprecation import Deprecated
+
+    if isinstance(value, _DeprecationData):
+        return Deprecated(cli_ctx, object_type=value.object_type, target=value.target, redirect=value.redirect,
+                          hide=value.hide, expiration=value.expiration)
+    if isinstance(value, list):
+        return [_restore_value(cli_ctx, item) for item in value]
+    if isinstance(value, dict):
+        return {key: _restore_value(cli_ctx, item) for key, item in value.items()}
+    return value
+
+
+def _restore_argument(cli_ctx, settings):
+    from knack.arguments import CLICommandArgument, CLIArgumentType
+
+    restored = {}
+    for key, value in settings.items():
+        if isinstance(value, _TypeData):
+            restored[key] = _restore_type(value.name)
+        elif isinstance(value, _ActionData):
+            restored[key] = type(value.name, (_SnapshotAction,), {})
+            if not value.takes_value:
+                restored.setdefault('nargs', 0)
+        else:
+            restored[key] = _restore_value(cli_ctx, value)
+
+    # bypass CLICommandArgument.__init__, which would fill in defaults the live argument may not have
+    argument = CLICommandArgument.__new__(CLICommandArgument)
+    argument.type = CLIArgumentType()
+    argument.type.settings = restored
+    return argument
+
+
+def _restore_command_source(command_source):
+    if isinstance(command_source, _ExtensionSourceData):
+        from azure.cli.core.commands import ExtensionCommandSource  # pylint: disable=import-error
+        return ExtensionCommandSource(overrides_command=command_source.overrides_command,
+                                      extension_name=command_source.extension_name,
+                                      preview=command_source.preview,
+                                      experimental=command_source.experimental)
+    return command_source
+# endregion
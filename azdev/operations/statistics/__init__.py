@@ -16,6 +16,7 @@ from pathlib import Path
 from knack.log import get_logger
 from azdev.utilities import (
     heading, display, get_path_table, require_azure_cli, filter_by_git_diff)
+from azdev.operations.snapshot import load_command_table_snapshot
 
 from .util import filter_modules
 
@@ -63,12 +64,14 @@ def list_command_table(modules=None, git_source=None, git_target=None, git_repo=
     display('Initializing with command table and help files...')
     az_cli = get_default_cli()
 
-    # load commands, args, and help
-    _create_invoker_and_load_cmds(az_cli)
+    # load commands
+    # only load the changed modules when listing a git diff
+    snapshot = load_command_table_snapshot(az_cli, with_arguments=False, with_help=False, with_codegen_info=True,
+                                           selected_modules=selected_modules if git_target else None)
 
     stop = time.time()
     logger.info('Commands and help loaded in %i sec', stop - start)
-    command_loader = az_cli.invocation.commands_loader
+    command_loader = snapshot.command_loader
 
     # trim command table and help to just selected_modules
     command_loader = filter_modules(
@@ -86,8 +89,7 @@ def list_command_table(modules=None, git_source=None, git_target=None, git_repo=
             "name": command_name,
             "source": _get_command_source(command_name, command)
         }
-        module_loader = command_loader.cmd_to_loader_map[command_name]
-        codegen_info = _command_codegen_info(command_name, command, module_loader)
+        codegen_info = snapshot.codegen_info.get(command_name)
         if codegen_info:
             command_info['codegen_version'] = codegen_info['version']
             command_info['codegen_type'] = codegen_info['type']
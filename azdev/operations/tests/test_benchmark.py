@@ -4,16 +4,24 @@
 # license information.
 # -----------------------------------------------------------------------------
 
+import cProfile
+import os
 import random
+import shutil
+import tempfile
 from unittest import mock, TestCase
 from math import sqrt
 
 from knack.util import CLIError
 
+from azdev.transformers import performance_benchmark_data_transformer
+from ..hotspots import CORE, MODULE, OTHER, get_function_category
+from ..perf_store import save_benchmark
 from ..performance import (
     _benchmark_cmd_staticstic,
     _benchmark_load_all_commands,
     benchmark,
+    compare_benchmarks,
 )
 
 
@@ -61,6 +69,17 @@ class TestBenchmarkStatistics(TestCase):
         odd_stats = _benchmark_cmd_staticstic(odd_length_data)
         self.assertEqual(odd_stats["Std"], odd_std)
 
+    def test_statistic_percentiles(self):
+        samples = [float(i) for i in range(101, 0, -1)]
+
+        stats = _benchmark_cmd_staticstic(samples)
+
+        self.assertEqual(stats["P50"], 51)
+        self.assertEqual(stats["P90"], 91)
+        self.assertEqual(stats["P99"], 100)
+        self.assertEqual(stats["Samples"], [float(i) for i in range(101, 0, -1)])
+        self.assertEqual(_benchmark_cmd_staticstic([1.0, 2.0])["P90"], 1.9)
+
     def test_benchmark_wrong_data(self):
         with self.assertRaises(IndexError):
             _benchmark_cmd_staticstic([])
@@ -200,6 +219,70 @@ class TestBenchmark(TestCase):
             for r in result:
                 self.assertEqual(r["Runs"], 5)
 
+    def test_benchmark_samples_per_command(self):
+        def mocked_timer(task):
+            _, raw_command, _ = task
+            return len(raw_command)
+
+        with mock.patch(
+            "azdev.operations.performance._benchmark_cmd_timer",
+            side_effect=mocked_timer,
+        ) as timer, mock.patch(
+            "multiprocessing.pool.Pool.map_async",
+            lambda self, func, iterable, chunksize=None, callback=None, error_callback=None: _MockedPoolMapResult(
+                func, iterable
+            ),
+        ):
+            result = benchmark(commands=["version", "group list"], runs=3, jobs=1)
+
+        # one warm-up run per command
+        self.assertEqual(timer.call_count, 8)
+        self.assertEqual(result[0]["Samples"], [7, 7, 7])
+        self.assertEqual(result[1]["Samples"], [10, 10, 10])
+
+    def test_benchmark_with_negative_jobs(self):
+        with self.assertRaisesRegex(CLIError, "--jobs must be 0 or greater"):
+            benchmark(["version"], jobs=-1)
+
+    def test_benchmark_profile(self):
+        def mocked_timer(task):
+            _, _, profile_path = task
+            if profile_path:
+                profiler = cProfile.Profile()
+                profiler.runcall(sorted, range(1000))
+                profiler.dump_stats(profile_path)
+            return 1
+
+        output_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, output_dir)
+        with mock.patch(
+            "azdev.operations.performance._benchmark_cmd_timer",
+            side_effect=mocked_timer,
+        ), mock.patch(
+            "multiprocessing.pool.Pool.map_async",
+            lambda self, func, iterable, chunksize=None, callback=None, error_callback=None: _MockedPoolMapResult(
+                func, iterable
+            ),
+        ):
+            result = benchmark(commands=["group list -g {rg}"], runs=3, profile=True, hotspots=2,
+                               output_dir=output_dir)
+
+        self.assertEqual(result[0]["Profile"], os.path.join(output_dir, "group_list_-g_rg.pstats"))
+        self.assertTrue(os.path.isfile(result[0]["Profile"]))
+        self.assertIn("<built-in method builtins.sorted>", [hotspot["Function"] for hotspot in result[0]["Hotspots"]])
+        self.assertEqual({hotspot["Calls"] for hotspot in result[0]["Hotspots"]}, {1})
+
+        rows = performance_benchmark_data_transformer(result)
+        self.assertEqual(len(rows), len(result[0]["Hotspots"]))
+        self.assertEqual(rows[0]["Command"], "group list -g {rg}")
+
+    def test_function_category(self):
+        self.assertEqual(get_function_category("/env/lib/site-packages/azure/cli/core/parser.py"), CORE)
+        self.assertEqual(get_function_category("/env/lib/site-packages/knack/help.py"), CORE)
+        self.assertEqual(get_function_category("/src/azure/cli/command_modules/vm/custom.py"), MODULE)
+        self.assertEqual(get_function_category("/ext/src/azext_sample/custom.py"), MODULE)
+        self.assertEqual(get_function_category("/env/lib/site-packages/azure/mgmt/compute/models.py"), OTHER)
+
     # def test_benchmark_timeout(self):
     #     import time
 
@@ -218,3 +301,57 @@ class TestBenchmark(TestCase):
     #         commands = ["version"]
 
     #         benchmark(commands=commands)
+
+
+class TestCompareBenchmarks(TestCase):
+    def setUp(self):
+        config_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, config_dir)
+        patch = mock.patch("azdev.operations.perf_store.get_azdev_config_dir", return_value=config_dir)
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def _save(self, name, samples):
+        results = []
+        for command, time_series in samples.items():
+            stats = _benchmark_cmd_staticstic(time_series)
+            stats.update({"Command": command, "Runs": len(time_series)})
+            results.append(stats)
+        save_benchmark(name, results)
+
+    def test_benchmark_save(self):
+        with mock.patch(
+            "azdev.operations.performance._benchmark_cmd_timer",
+            return_value=1,
+        ), mock.patch(
+            "multiprocessing.pool.Pool.map_async",
+            lambda self, func, iterable, chunksize=None, callback=None, error_callback=None: _MockedPoolMapResult(
+                func, iterable
+            ),
+        ):
+            benchmark(commands=["version"], runs=3, save="before")
+
+        result = compare_benchmarks(["before", "before"])
+        self.assertEqual(result, [{"Command": "version", "Baseline": 1, "Candidate": 1, "Delta": 0.0,
+                                   "PValue": 1.0, "Regression": False}])
+
+    def test_compare_regression(self):
+        before = [1.0 + i / 100 for i in range(20)]
+        self._save("before", {"version": before, "group list": before})
+        self._save("after", {"version": [t * 1.3 for t in before], "group list": [t * 1.01 for t in before],
+                             "group show": before})
+
+        with self.assertRaisesRegex(CLIError, r"1 of 2 commands .*\n  version: "):
+            compare_benchmarks(["before", "after"])
+
+        result = compare_benchmarks(["before", "after"], threshold=50)
+        self.assertEqual([r["Command"] for r in result], ["version", "group list"])
+        self.assertEqual(result[0]["Delta"], 30.0)
+        self.assertLess(result[0]["PValue"], 0.01)
+        self.assertFalse(result[1]["Regression"])
+
+    def test_compare_missing_benchmark(self):
+        with self.assertRaisesRegex(CLIError, 'No saved benchmark "missing"'):
+            compare_benchmarks(["missing", "missing"])
+        with self.assertRaisesRegex(CLIError, "usage error"):
+            compare_benchmarks(["../missing", "missing"])
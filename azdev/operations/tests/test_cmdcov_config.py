@@ -0,0 +1,137 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+# -----------------------------------------------------------------------------
+
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+import requests
+from knack.util import CLIError
+
+from azdev.operations import cmdcov_config
+from azdev.operations.constant import CMD_PATTERN, ENCODING, NUMBER_SIGN_PATTERN
+
+CONFIG_TEXT = "ENCODING: 'latin-1'\nEXCLUDE_MODULES: ['sample']\n"
+
+
+def _response(status_code, text='', etag=None):
+    response = SimpleNamespace(status_code=status_code, text=text, headers={'ETag': etag} if etag else {})
+    response.raise_for_status = lambda: None
+    return response
+
+
+class TestCmdcovConfig(unittest.TestCase):
+
+    def setUp(self):
+        self.config_dir = tempfile.mkdtemp()
+        patches = [
+            mock.patch.object(cmdcov_config, '_CONFIG', None),
+            mock.patch.object(cmdcov_config, '_PATTERNS', None),
+            mock.patch.object(cmdcov_config, 'get_azdev_config_dir', return_value=self.config_dir),
+            mock.patch.object(cmdcov_config, 'get_cli_repo_path', side_effect=CLIError('no repo')),
+            # the developer's own azdev config may set [cmdcov] config_ttl
+            mock.patch.object(cmdcov_config, 'get_azdev_config', return_value=self._get_config({})),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.config_dir)
+
+    @staticmethod
+    def _get_config(values):
+        return SimpleNamespace(get=lambda section, option, fallback=None: values.get((section, option), fallback))
+
+    def test_config_ttl(self):
+        self.assertEqual(cmdcov_config._get_config_ttl(),  # pylint: disable=protected-access
+                         cmdcov_config.DEFAULT_CONFIG_TTL * 3600)
+        for value, ttl in [('2', 7200), ('invalid', cmdcov_config.DEFAULT_CONFIG_TTL * 3600)]:
+            with mock.patch.object(cmdcov_config, 'get_azdev_config',
+                                   return_value=self._get_config({('cmdcov', 'config_ttl'): value})):
+                self.assertEqual(cmdcov_config._get_config_ttl(), ttl)  # pylint: disable=protected-access
+
+    def _write_cache(self, fetched, etag='"v1"'):
+        with open(os.path.join(self.config_dir, 'cmdcov.yml'), 'w') as f:
+            f.write(CONFIG_TEXT)
+        with open(os.path.join(self.config_dir, 'cmdcov.json'), 'w') as f:
+            json.dump({'etag': etag, 'fetched': fetched}, f)
+
+    def test_repo_config_is_preferred(self):
+        os.makedirs(os.path.join(self.config_dir, 'scripts', 'ci'))
+        with open(os.path.join(self.config_dir, 'scripts', 'ci', 'cmdcov.yml'), 'w') as f:
+            f.write(CONFIG_TEXT)
+        with mock.patch.object(cmdcov_config, 'get_cli_repo_path', return_value=self.config_dir), \
+                mock.patch('requests.get') as get:
+            config = cmdcov_config.get_cmdcov_config()
+        get.assert_not_called()
+        self.assertEqual(config['ENCODING'], 'latin-1')
+        # keys missing from the file fall back to the bundled copy
+        self.assertEqual(config['CMD_PATTERN'], CMD_PATTERN)
+
+    def test_fresh_cache_is_not_revalidated(self):
+        self._write_cache(time.time())
+        with mock.patch('requests.get') as get:
+            self.assertEqual(cmdcov_config.get_cmdcov_config()['EXCLUDE_MODULES'], ['sample'])
+        get.assert_not_called()
+
+    def test_stale_cache_is_revalidated(self):
+        self._write_cache(0)
+        with mock.patch('requests.get', return_value=_response(304)) as get:
+            self.assertEqual(cmdcov_config.get_cmdcov_config()['ENCODING'], 'latin-1')
+        self.assertEqual(get.call_args[1]['headers'], {'If-None-Match': '"v1"'})
+        with open(os.path.join(self.config_dir, 'cmdcov.json')) as f:
+            self.assertGreater(json.load(f)['fetched'], 0)
+
+    def test_config_is_fetched_and_cached(self):
+        with mock.patch('requests.get', return_value=_response(200, CONFIG_TEXT, '"v2"')) as get:
+            self.assertEqual(cmdcov_config.get_cmdcov_config()['ENCODING'], 'latin-1')
+        self.assertEqual(get.call_args[1]['headers'], {})
+        with open(os.path.join(self.config_dir, 'cmdcov.json')) as f:
+            self.assertEqual(json.load(f)['etag'], '"v2"')
+
+    def test_offline_falls_back_to_bundled_config(self):
+        with mock.patch('requests.get', side_effect=requests.ConnectionError('offline')):
+            config = cmdcov_config.get_cmdcov_config()
+            patterns = cmdcov_config.get_cmdcov_patterns()
+        self.assertEqual(config['ENCODING'], ENCODING)
+        self.assertEqual([pattern.pattern for pattern in patterns.cmd], CMD_PATTERN)
+        self.assertIs(cmdcov_config.get_cmdcov_patterns(), patterns)
+
+    def test_failed_refresh_is_not_retried_until_stale(self):
+        self._write_cache(0)
+        with mock.patch('requests.get', side_effect=requests.ConnectionError('offline')) as get:
+            self.assertEqual(cmdcov_config.get_cmdcov_config()['ENCODING'], 'latin-1')
+            get.assert_called_once()
+
+            cmdcov_config._CONFIG = None  # pylint: disable=protected-access
+            self.assertEqual(cmdcov_config.get_cmdcov_config()['ENCODING'], 'latin-1')
+            get.assert_called_once()
+        with open(os.path.join(self.config_dir, 'cmdcov.json')) as f:
+            meta = json.load(f)
+        self.assertEqual((meta['etag'], meta['fetched']), ('"v1"', 0))
+
+    def test_failed_fetch_is_not_retried_until_stale(self):
+        with mock.patch('requests.get', side_effect=requests.ConnectionError('offline')) as get:
+            self.assertEqual(cmdcov_config.get_cmdcov_config()['ENCODING'], ENCODING)
+            cmdcov_config._CONFIG = None  # pylint: disable=protected-access
+            self.assertEqual(cmdcov_config.get_cmdcov_config()['ENCODING'], ENCODING)
+        get.assert_called_once()
+
+    def test_required_literals(self):
+        literals = [literals for _, literals, _ in cmdcov_config._compile_line_kinds(  # pylint: disable=protected-access
+            NUMBER_SIGN_PATTERN, CMD_PATTERN)]
+        self.assertEqual(literals, [('#',), ('cmd(\n',), ('cmd(',), (' = ',), ('cmd', ' = ')])
+        self.assertEqual(cmdcov_config._get_required_literals('(?i)cmd'), ())  # pylint: disable=protected-access
+
+
+if __name__ == '__main__':
+    unittest.main()
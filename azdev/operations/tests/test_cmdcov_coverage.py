@@ -0,0 +1,73 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+# -----------------------------------------------------------------------------
+
+import random
+import unittest
+
+from azdev.operations.cmdcov.coverage_index import CoverageIndex, SubstringMatcher, parse_coverage_command
+
+TESTED_COMMANDS = [
+    'vm create -n {vm} -g {rg} --image ubuntu 1',
+    'vm list -g {rg} 2',
+    'network vnet create --name {vnet} 3',
+    'postgres flexible-server create -g {rg} 4',
+    'storage account show -n {sa} -g {rg}',
+]
+
+
+def _brute_force(entries, tested_commands):
+    return [any(any(prefix in cmd for prefix in prefixes) and
+                (options is None or any(option in cmd for option in options))
+                for cmd in tested_commands)
+            for prefixes, options in entries]
+
+
+class TestSubstringMatcher(unittest.TestCase):
+
+    def test_matches_substring_search(self):
+        rnd = random.Random(0)
+        patterns = [''.join(rnd.choice('ab -') for _ in range(rnd.randint(0, 4))) for _ in range(60)]
+        matcher = SubstringMatcher(patterns)
+        for _ in range(200):
+            text = ''.join(rnd.choice('ab -c') for _ in range(rnd.randint(0, 20)))
+            expected = {pattern_id for pattern_id, pattern in enumerate(patterns) if pattern in text}
+            self.assertEqual(matcher.search(text), expected)
+
+
+class TestCoverageIndex(unittest.TestCase):
+
+    def test_command_level(self):
+        entries = [(['vm create'], None), (['vm delete'], None), (['network vnet create'], None),
+                   (['postgres flexible-server create', 'flexible-server create'], None),
+                   (['rdbms flexible-server create', 'flexible-server create'], None)]
+        covered = CoverageIndex(entries).covered(TESTED_COMMANDS)
+        self.assertEqual(covered, [True, False, True, True, True])
+        self.assertEqual(covered, _brute_force(entries, TESTED_COMMANDS))
+
+    def test_argument_level(self):
+        commands = ["vm create ['--name', '-n']", "vm create ['--size']", "vm list ['--resource-group', '-g']",
+                    "storage account show []", "network vnet create ['--name']"]
+        entries = [([prefix], options) for prefix, options in
+                   (parse_coverage_command(command, 'argument') for command in commands)]
+        self.assertEqual(entries[0], (['vm create '], ['--name', '-n']))
+        covered = CoverageIndex(entries).covered(TESTED_COMMANDS)
+        self.assertEqual(covered, [True, False, True, False, True])
+        self.assertEqual(covered, _brute_force(entries, TESTED_COMMANDS))
+
+    def test_matches_brute_force(self):
+        rnd = random.Random(1)
+        words = ['vm', 'vmss', 'create', 'show', 'list', 'disk', '-n', '--name', '-g', '--ids']
+        tested_commands = [' '.join(rnd.choice(words) for _ in range(rnd.randint(1, 6))) for _ in range(100)]
+        entries = []
+        for _ in range(100):
+            prefixes = [' '.join(rnd.choice(words[:6]) for _ in range(rnd.randint(1, 3)))]
+            options = rnd.choice([None, [], rnd.sample(words[6:], 2)])
+            entries.append((prefixes, options))
+        self.assertEqual(CoverageIndex(entries).covered(tested_commands), _brute_force(entries, tested_commands))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+# -----------------------------------------------------------------------------
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from azdev.operations import cmdcov_config
+from azdev.operations.cmdcov import scanner
+
+RECORDING = """interactions:
+- request:
+    body: null
+    headers:
+      CommandName:
+      - group create
+      ParameterSetName:
+      - --location --name --tag
+  response:
+    status: {code: 201, message: Created}
+- request:
+    headers: {CommandName: [group delete], ParameterSetName: [-n -y]}
+  response:
+    status: {code: 202, message: Accepted}
+version: 1
+"""
+
+TEST_FILE = """
+class SampleScenarioTest(ScenarioTest):
+
+    def test_sample(self):
+        self.cmd('group create -n {rg} -l westus')
+"""
+
+
+def _spy_scan_file():
+    return mock.patch.object(scanner, '_scan_file', wraps=scanner._scan_file)  # pylint: disable=protected-access
+
+
+class TestScanTestedCommands(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.files = []
+        for name, kind, content in [('test_sample.py', scanner.TEST_FILE, TEST_FILE),
+                                    ('test_sample.yaml', scanner.RECORDING_FILE, RECORDING)]:
+            path = os.path.join(self.root, name)
+            with open(path, 'w') as f:
+                f.write(content)
+            self.files.append((kind, path))
+        patch = mock.patch.object(scanner, 'get_azdev_config_dir', return_value=os.path.join(self.root, 'config'))
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_results_are_cached(self):
+        expected = [['group create -n {rg} -l westus 1'],
+                    ['group create --location --name --tag', 'group delete -n -y']]
+        self.assertEqual(scanner.scan_tested_commands(self.files, jobs=1), expected)
+
+        with mock.patch.object(scanner, '_scan_file', side_effect=AssertionError('file was scanned again')):
+            self.assertEqual(scanner.scan_tested_commands(self.files, jobs=1), expected)
+
+        with open(self.files[0][1], 'a') as f:
+            f.write("        self.cmd('group delete -n {rg}')\n")
+        with _spy_scan_file() as scan_file:
+            results = scanner.scan_tested_commands(self.files, jobs=1)
+        self.assertEqual(scan_file.call_count, 1)
+        self.assertEqual(results[0], ['group create -n {rg} -l westus 1', 'group delete -n {rg} 2'])
+
+    def test_pattern_change_rescans_test_files(self):
+        scanner.scan_tested_commands(self.files, jobs=1)
+
+        config = dict(cmdcov_config.get_cmdcov_config())
+        # a config whose patterns don't match `self.cmd(` any more
+        config['CMD_PATTERN'] = [pattern.replace('cmd', 'kmd') for pattern in config['CMD_PATTERN']]
+        with mock.patch.object(cmdcov_config, '_CONFIG', config), mock.patch.object(cmdcov_config, '_PATTERNS', None):
+            with _spy_scan_file() as scan_file:
+                results = scanner.scan_tested_commands(self.files, jobs=1)
+        scan_file.assert_called_once_with((scanner.TEST_FILE, self.files[0][1], 'utf-8'))
+        self.assertEqual(results[0], [])
+
+        with _spy_scan_file() as scan_file:
+            scanner.scan_tested_commands(self.files, encoding='utf-8-sig', jobs=1)
+        scan_file.assert_called_once_with((scanner.TEST_FILE, self.files[0][1], 'utf-8-sig'))
+
+    def test_parallel_matches_serial(self):
+        files = self.files * scanner._MIN_POOL_FILES  # pylint: disable=protected-access
+        with mock.patch.object(scanner, 'get_azdev_config_dir', return_value=os.path.join(self.root, 'x')):
+            serial = scanner.scan_tested_commands(files, jobs=1)
+        with mock.patch.object(scanner, 'get_azdev_config_dir', return_value=os.path.join(self.root, 'y')):
+            parallel = scanner.scan_tested_commands(files, jobs=2)
+        self.assertEqual(serial, parallel)
+
+
+if __name__ == '__main__':
+    unittest.main()
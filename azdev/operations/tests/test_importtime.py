@@ -0,0 +1,66 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+# -----------------------------------------------------------------------------
+
+import io
+import subprocess
+import sys
+import unittest
+
+from azdev.operations.importtime import (
+    get_command_module_imports, merge_import_trees, parse_import_time, write_collapsed_stacks)
+
+REPORT = """import time: self [us] | cumulative | imported package
+import time:       100 |        100 |   knack
+import time:       200 |        300 | azure.cli.core
+import time:        50 |         50 |         azure.mgmt.network.models
+import time:       400 |        450 |       azure.mgmt.network
+import time:        30 |         30 |       msrestazure
+import time:        20 |        500 |     azure.cli.command_modules.network._params
+import time:        10 |        510 |   azure.cli.command_modules.network
+import time:        90 |         90 |   azext_sample
+import time:         5 |        605 | azure.cli.command_modules
+"""
+
+
+class TestImportTime(unittest.TestCase):
+
+    def test_parse(self):
+        root = parse_import_time(REPORT.splitlines() + ['DEBUG: not part of the report'])
+        self.assertEqual([child.name for child in root.children], ['azure.cli.core', 'azure.cli.command_modules'])
+        self.assertEqual(root.cumulative_us, 905)
+        paths = [path for path, _ in root.walk()]
+        self.assertIn(('azure.cli.command_modules', 'azure.cli.command_modules.network',
+                       'azure.cli.command_modules.network._params', 'azure.mgmt.network',
+                       'azure.mgmt.network.models'), paths)
+
+    def test_command_module_imports(self):
+        root = merge_import_trees([parse_import_time(REPORT.splitlines()),
+                                   parse_import_time(REPORT.replace('400 |        450', '600 |        650')
+                                                     .splitlines())])
+        modules = get_command_module_imports(root)
+        self.assertEqual(sorted(modules), ['azext_sample', 'network'])
+        self.assertEqual(modules['network']['self_ms'], 0.01)
+        # azure.mgmt.network.models is part of azure.mgmt.network
+        self.assertEqual(modules['network']['heavy_imports'], [('azure.mgmt.network', 0.55), ('msrestazure', 0.03)])
+
+        stream = io.StringIO()
+        write_collapsed_stacks(root, stream)
+        self.assertIn('azure.cli.command_modules;azext_sample 90\n', stream.getvalue())
+
+    def test_parse_interpreter_report(self):
+        result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import json'],
+                                stderr=subprocess.PIPE, check=True)
+        root = parse_import_time(result.stderr.decode().splitlines())
+        names = [node.name for _, node in root.walk()]
+        self.assertIn('json', names)
+        for _, node in root.walk():
+            # the interpreter rounds every time to us on its own
+            self.assertAlmostEqual(node.cumulative_us, node.self_us + sum(c.cumulative_us for c in node.children),
+                                   delta=len(node.children) + 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,203 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+# -----------------------------------------------------------------------------
+
+import contextlib
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from azdev.operations.linter.linter import Linter, LinterManager, LinterSeverity, RuleError
+from azdev.operations.linter.rule_decorators import CommandRule, ParameterRule, run_fused_rules
+
+
+def odd_parameter_rule(linter, command_name, parameter_name):  # pylint: disable=unused-argument
+    if int(parameter_name.split('_')[1]) % 2:
+        raise RuleError('odd parameter')
+
+
+def long_command_rule(linter, command_name):  # pylint: disable=unused-argument
+    if len(command_name.split()) > 2:
+        raise RuleError('long command')
+
+
+def first_parameter_rule(linter, command_name, parameter_name):  # pylint: disable=unused-argument
+    if parameter_name == 'param_0':
+        raise RuleError('first parameter')
+
+
+def _argument(*options, **settings):
+    return SimpleNamespace(type=SimpleNamespace(settings=dict(settings, options_list=list(options))))
+
+
+def _create_linter_manager(jobs):
+    command_table = {}
+    for i in range(40):
+        name = 'group{} sub command{}'.format(i, i) if i % 3 else 'group{} command{}'.format(i, i)
+        command_table[name] = SimpleNamespace(arguments={'param_{}'.format(j): _argument('--param-{}'.format(j))
+                                                         for j in range(i % 5 + 1)})
+    command_loader = SimpleNamespace(cli_ctx=None, command_table=command_table, command_group_table={})
+    exclusions = {'group1 sub command1': {'parameters': {'param_1': {'rule_exclusions': ['odd_parameter_rule']}}}}
+    linter_manager = LinterManager(command_loader=command_loader, help_file_entries={}, loaded_help={},
+                                   exclusions=exclusions, jobs=jobs)
+    ParameterRule(LinterSeverity.HIGH)(odd_parameter_rule)(linter_manager)
+    ParameterRule(LinterSeverity.LOW)(first_parameter_rule)(linter_manager)
+    CommandRule(LinterSeverity.MEDIUM)(long_command_rule)(linter_manager)
+    linter_manager.min_severity = LinterSeverity.LOW
+    return linter_manager
+
+
+def _run(linter_manager):
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        shard_results = linter_manager._run_rule_shards(['commands', 'params'])  # pylint: disable=protected-access
+        linter_manager._run_rules('commands', shard_results.get('commands'))  # pylint: disable=protected-access
+        linter_manager._run_rules('params', shard_results.get('params'))  # pylint: disable=protected-access
+    return output.getvalue(), shard_results
+
+
+class TestParallelLinter(unittest.TestCase):
+
+    def test_parallel_matches_serial(self):
+        serial_manager = _create_linter_manager(jobs=1)
+        with contextlib.redirect_stdout(io.StringIO()) as serial_output:
+            serial_manager._run_rules('commands')  # pylint: disable=protected-access
+            serial_manager._run_rules('params')  # pylint: disable=protected-access
+
+        parallel_manager = _create_linter_manager(jobs=3)
+        parallel_output, shard_results = _run(parallel_manager)
+
+        self.assertEqual(set(shard_results), {'commands', 'params'})
+        self.assertEqual(serial_output.getvalue(), parallel_output)
+        self.assertIn('odd parameter', parallel_output)
+        self.assertNotIn('`group1 sub command1`, `param_1`', parallel_output)
+        self.assertEqual(serial_manager._violiations, parallel_manager._violiations)  # pylint: disable=protected-access
+        self.assertEqual(serial_manager.exit_code, 1)
+        self.assertEqual(parallel_manager.exit_code, 1)
+
+
+class TestFusedRules(unittest.TestCase):
+
+    def test_fused_matches_single_rules(self):
+        linter_manager = _create_linter_manager(jobs=1)
+        rules = [(rule_name, rule_func, severity)
+                 for rule_name, (rule_func, _, severity) in linter_manager._rules['params'].items()]  # pylint: disable=protected-access
+        fused = run_fused_rules(linter_manager, 'params', rules)
+
+        self.assertEqual(list(fused), ['odd_parameter_rule', 'first_parameter_rule'])
+        for rule_name, rule_func, _ in rules:
+            self.assertEqual(fused[rule_name], list(rule_func()))
+        self.assertNotIn(('group1 sub command1', 'param_1'),
+                         [entity for _, entity, _ in fused['odd_parameter_rule']])
+        self.assertIn(('group1 sub command1', 'param_0'),
+                      [entity for _, entity, _ in fused['first_parameter_rule']])
+
+    def test_rule_batches(self):
+        linter_manager = _create_linter_manager(jobs=1)
+        linter_manager.min_severity = LinterSeverity.HIGH
+        self.assertEqual(linter_manager._get_rule_batches('params'),  # pylint: disable=protected-access
+                         [('odd_parameter_rule',)])
+        linter_manager.min_severity = LinterSeverity.LOW
+        self.assertEqual(linter_manager._get_rule_batches('params'),  # pylint: disable=protected-access
+                         [('odd_parameter_rule', 'first_parameter_rule')])
+
+
+class TestParameterMetadata(unittest.TestCase):
+
+    def setUp(self):
+        from knack import CLI
+        from knack.deprecation import Deprecated
+
+        cli_ctx = CLI(cli_name='linter-test', config_dir=tempfile.mkdtemp())
+        cli_ctx.get_cli_version = lambda: '2.0.0'
+        expired = Deprecated(cli_ctx, object_type='option', target='--old', redirect='--name', expiration='1.0.0')
+        arguments = {
+            'name': _argument('--name', '-n', expired, help='Settings help.',
+                              deprecate_info=Deprecated(cli_ctx, object_type='argument', target='name',
+                                                        expiration='3.0.0')),
+            'ids': _argument('--ids', help='Ids help.'),
+        }
+        command_help = SimpleNamespace(parameters=[
+            SimpleNamespace(name='--resource-group -g', short_summary='Group.', long_summary=None),
+            SimpleNamespace(name='--name -n', short_summary=None, long_summary='Long name help.'),
+            SimpleNamespace(name='-n', short_summary='Duplicate.', long_summary=None),
+        ])
+        command_loader = SimpleNamespace(cli_ctx=cli_ctx, command_group_table={}, command_table={
+            'sample create': SimpleNamespace(arguments=arguments),
+            'sample list': SimpleNamespace(arguments={'ids': _argument('--ids', help='Ids help.')}),
+        })
+        self.linter = Linter(command_loader=command_loader, help_file_entries={},
+                             loaded_help={'sample create': command_help})
+
+    def test_parameter_help(self):
+        self.assertEqual(self.linter.get_parameter_help('sample create', 'name'), 'Long name help.')
+        # falls back to the argument help when there is no parameter help
+        self.assertEqual(self.linter.get_parameter_help('sample create', 'ids'), 'Ids help.')
+        # commands without loaded help have no parameter help at all
+        self.assertIsNone(self.linter.get_parameter_help('sample list', 'ids'))
+
+    def test_parameter_settings(self):
+        self.assertEqual(self.linter.get_parameter_options('sample create', 'ids'), ['--ids'])
+        self.assertEqual(self.linter.get_parameter_settings('sample create', 'ids')['help'], 'Ids help.')
+        self.assertFalse(self.linter.parameter_expired('sample create', 'name'))
+        self.assertFalse(self.linter.parameter_expired('sample create', 'ids'))
+        self.assertEqual(self.linter.option_expired('sample create', 'name'), ['--old'])
+        self.assertEqual(self.linter.option_expired('sample create', 'ids'), [])
+
+
+COMMANDS_BEFORE = """def load_command_table(self, _):
+    with self.command_group('sample') as g:
+        g.custom_command('list', 'list_sample')
+"""
+COMMANDS_AFTER = COMMANDS_BEFORE + """        g.custom_command('create', 'create_sample')
+        g.custom_command('delete', 'delete_sample')
+"""
+TEST_AFTER = """class SampleScenarioTest(ScenarioTest):
+    def test_sample(self):
+        self.cmd('sample create -n {name}')
+"""
+
+
+def _blob(text, hexsha):
+    return SimpleNamespace(hexsha=hexsha, data_stream=SimpleNamespace(read=lambda: text.encode('utf-8')))
+
+
+class TestCommandTestCoverage(unittest.TestCase):
+
+    def setUp(self):
+        self.repo = tempfile.mkdtemp()
+        self.diff_index = []
+        for path, before, after in [('src/sample/commands.py', COMMANDS_BEFORE, COMMANDS_AFTER),
+                                    ('src/sample/tests/test_sample.py', None, TEST_AFTER)]:
+            os.makedirs(os.path.dirname(os.path.join(self.repo, path)), exist_ok=True)
+            with open(os.path.join(self.repo, path), 'w') as f:
+                f.write(after)
+            self.diff_index.append(SimpleNamespace(a_path=path,
+                                                   a_blob=_blob(before, path + 'a') if before else None,
+                                                   b_blob=_blob(after, path + 'b')))
+        command_loader = SimpleNamespace(cli_ctx=None, command_table={}, command_group_table={})
+        self.linter = Linter(command_loader=command_loader, help_file_entries={}, loaded_help={},
+                             git_source='dev', git_target='main', git_repo=self.repo, exclusions={})
+
+    def tearDown(self):
+        shutil.rmtree(self.repo)
+
+    def test_diff_is_computed_once(self):
+        with mock.patch('azdev.operations.linter.linter.diff_branches_detail', return_value=self.diff_index) as diff, \
+                mock.patch('azdev.operations.linter.linter.get_cli_repo_path', return_value=self.repo):
+            exec_state, violations = self.linter.get_command_test_coverage()
+            self.assertEqual(self.linter.get_parameter_test_coverage(), (True, []))
+        self.assertEqual(diff.call_count, 1)
+        self.assertFalse(exec_state)
+        self.assertIn('Missing command test coverage: `sample delete`', violations)
+        self.assertNotIn('Missing command test coverage: `sample create`', violations)
+
+
+if __name__ == '__main__':
+    unittest.main()
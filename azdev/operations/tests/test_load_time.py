@@ -0,0 +1,108 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+# -----------------------------------------------------------------------------
+
+import itertools
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from knack.util import CLIError
+
+from azdev.operations import performance
+from azdev.operations.perf_store import LoadTimeBaseline
+
+
+class TestMannWhitneyU(unittest.TestCase):
+
+    def test_p_value(self):
+        self.assertAlmostEqual(performance.mann_whitney_u([5, 6, 7], [1, 2, 3, 4, 5]), 0.0256, places=4)
+        self.assertGreater(performance.mann_whitney_u([1, 2, 3], [4, 5, 6]), 0.9)
+        self.assertEqual(performance.mann_whitney_u([1, 1], [1, 1]), 1.0)
+
+
+class TestCheckLoadTime(unittest.TestCase):
+
+    def setUp(self):
+        self.config_dir = tempfile.mkdtemp()
+        self.baseline_path = os.path.join(self.config_dir, 'perf', 'load_times.json')
+        baseline = LoadTimeBaseline(self.baseline_path)
+        baseline.add('network', [5.0, 5.2, 4.8, 5.1, 4.9, 5.0, 5.3, 4.7])
+        baseline.add(performance.TOTAL, [100.0, 101.0, 99.0, 100.5, 99.5, 100.0, 102.0, 98.0])
+        baseline.save()
+        patches = [
+            mock.patch.object(performance, 'require_azure_cli'),
+            mock.patch.object(performance, 'LoadTimeBaseline', lambda: LoadTimeBaseline(self.baseline_path)),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.config_dir)
+
+    def _run(self, network_times, fails=False, **kwargs):
+        times = itertools.cycle(network_times)
+
+        def _measure():
+            val = next(times)
+            return {performance.TOTAL: 95 + val, 'network': val}
+
+        with mock.patch.object(performance, '_measure_load_times', side_effect=_measure) as measure:
+            if fails:
+                with self.assertRaises(CLIError):
+                    performance.check_load_time(**kwargs)
+            else:
+                performance.check_load_time(**kwargs)
+        # the first run is a warm-up
+        return measure.call_count - 1
+
+    def test_unchanged_module_passes(self):
+        thresholds = dict(performance.THRESHOLDS)
+        self.assertEqual(self._run([5.0, 5.1, 4.9]), 3)
+        self.assertEqual(performance.THRESHOLDS, thresholds)
+        self.assertEqual(len(LoadTimeBaseline(self.baseline_path).get('network')), 11)
+
+    def test_regression_fails(self):
+        # not significant yet at the first look after 3 runs
+        self.assertEqual(self._run([9.0, 9.5, 8.8], fails=True), 6)
+        # failed runs do not become part of the baseline
+        self.assertEqual(len(LoadTimeBaseline(self.baseline_path).get('network')), 8)
+
+    def test_update_baseline(self):
+        self._run([9.0, 9.5, 8.8], fails=True, update_baseline=True)
+        # the regressed module starts a new baseline, the others add to theirs
+        self.assertEqual(LoadTimeBaseline(self.baseline_path).get('network'), [9.5, 8.8, 9.0] * 2)
+        self.assertEqual(len(LoadTimeBaseline(self.baseline_path).get(performance.TOTAL)), 14)
+        self.assertEqual(self._run([9.0, 9.5, 8.8]), 3)
+        with self.assertRaises(CLIError):
+            performance.check_load_time(no_baseline=True, update_baseline=True)
+
+    def test_clear_result_stops_early(self):
+        self.assertEqual(self._run([5.0, 5.1, 4.9], runs=10), 3)
+        # without a baseline to compare with, all runs are made
+        self.assertEqual(self._run([5.0, 5.1, 4.9], runs=10, no_baseline=True), 10)
+
+    def test_inconclusive_comparison_adds_runs(self):
+        self.assertEqual(self._run([9.0, 5.0, 9.5, 9.2, 8.8, 9.1], fails=True, max_runs=12), 12)
+        # significant at 0.01 after 12 runs, but not at the level corrected for the 4 looks
+        self.assertEqual(self._run([5.0, 9.0, 9.5], max_runs=12), 12)
+        self.assertEqual(self._run([5.0, 9.0, 9.5], max_runs=5, no_baseline=True), 3)
+
+    def test_look_schedule(self):
+        self.assertEqual(performance.get_look_schedule(3, 12), [3, 6, 9, 12])
+        self.assertEqual(performance.get_look_schedule(10, 35), [3, 10, 20, 30, 35])
+        self.assertEqual(performance.get_look_schedule(2, 2), [2])
+
+    def test_threshold_exceptions(self):
+        self.assertEqual(self._run([35.0, 35.0, 35.0], no_baseline=True), 3)
+        # only the lowest threshold with exceptions left can be claimed
+        self._run([45.0, 45.0, 45.0], fails=True, no_baseline=True)
+
+
+if __name__ == '__main__':
+    unittest.main()
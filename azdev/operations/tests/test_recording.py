@@ -0,0 +1,129 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+# -----------------------------------------------------------------------------
+
+import io
+import os
+import random
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import yaml
+
+from azdev.operations import recording
+
+RECORDING = """interactions:
+- request:
+    body: !!python/unicode '{"location": "westus"}'
+    headers:
+      Accept:
+      - application/json
+      CommandName:
+      - group create
+      ParameterSetName:
+      - --location --name --tag
+    method: PUT
+    uri: https://management.azure.com/subscriptions/00000000/resourcegroups/cli_test?api-version=2022-09-01
+  response:
+    body:
+      string: '{"id": "/subscriptions/00000000/resourceGroups/cli_test",
+        "properties": {"provisioningState": "Succeeded"}}'
+    headers:
+      CommandName:
+      - not a request header
+    status:
+      code: 201
+      message: Created
+- request:
+    body: null
+    headers:
+      Accept:
+      - '*/*'
+    method: GET
+    uri: https://management.azure.com/providers
+  response:
+    body: {string: ''}
+    status: {code: 200, message: OK}
+- request:
+    headers: {CommandName: [group delete], ParameterSetName: [-n -y]}
+    method: DELETE
+    uri: https://management.azure.com/subscriptions/00000000/resourcegroups/cli_test
+  response:
+    status: {code: 202, message: Accepted}
+version: 1
+"""
+
+
+def _load_recording_commands(text):
+    records = yaml.load(text, Loader=yaml.Loader) or {}
+    commands = []
+    for record in records['interactions']:
+        command = record['request']['headers'].get('CommandName', [''])[0]
+        argument = record['request']['headers'].get('ParameterSetName', [''])[0]
+        if command or argument:
+            commands.append(command + ' ' + argument)
+    return commands
+
+
+PLAIN_WORDS = ['vm', 'create', '--name', '-g', '--tags', "it's", 'x' * 70]
+QUOTED_WORDS = ['a: b', '#x', '"q"', '@file']
+
+
+def _random_recording(rnd, words):
+    interactions = []
+    for _ in range(rnd.randint(1, 5)):
+        headers = {'Accept': ['application/json'], 'Content-Length': ['0']}
+        for name in recording.RECORDING_HEADERS:
+            if rnd.random() < 0.8:
+                headers[name] = [' '.join(rnd.choice(words) for _ in range(rnd.randint(1, 12)))]
+        interactions.append({
+            'request': {'body': rnd.choice([None, 'x' * rnd.randint(0, 300)]), 'headers': headers, 'method': 'GET',
+                        'uri': 'https://management.azure.com/subscriptions?api-version=2022-09-01'},
+            'response': {'body': {'string': '{"value": []}' * rnd.randint(0, 50)},
+                         'headers': {'CommandName': ['response header']},
+                         'status': {'code': 200, 'message': 'OK'}}})
+    return yaml.dump({'interactions': interactions, 'version': 1})
+
+
+class TestRecordingCommands(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def _get_commands(self, text):
+        path = os.path.join(self.root, 'test_sample.yaml')
+        with open(path, 'w') as f:
+            f.write(text)
+        return recording.get_recording_commands(path)
+
+    def test_matches_loaded_recording(self):
+        expected = ['group create --location --name --tag', 'group delete -n -y']
+        self.assertEqual(_load_recording_commands(RECORDING), expected)
+        self.assertEqual(recording.parse_recording_commands(io.StringIO(RECORDING)), expected)
+        self.assertEqual(self._get_commands(RECORDING), expected)
+
+    def test_vcr_layout_is_scanned_line_by_line(self):
+        text = _random_recording(random.Random(0), PLAIN_WORDS)
+        with mock.patch.object(recording, 'parse_recording_commands', side_effect=AssertionError('not scanned')):
+            self.assertEqual(self._get_commands(text), _load_recording_commands(text))
+
+    def test_matches_loaded_random_recordings(self):
+        rnd = random.Random(1)
+        for _ in range(40):
+            text = _random_recording(rnd, PLAIN_WORDS + QUOTED_WORDS)
+            self.assertEqual(self._get_commands(text), _load_recording_commands(text))
+            self.assertEqual(recording.parse_recording_commands(io.StringIO(text)), _load_recording_commands(text))
+
+    def test_empty_recording(self):
+        self.assertEqual(self._get_commands(''), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,241 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+# -----------------------------------------------------------------------------
+
+import argparse
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from knack import CLI
+from knack.arguments import CLICommandArgument
+from knack.commands import CLICommand, CLICommandsLoader, CommandGroup
+from knack.deprecation import Deprecated
+
+from azdev.operations import snapshot as snapshot_module
+from azdev.operations.command_change.custom import get_commands_meta
+from azdev.operations.snapshot import (
+    CommandTableSnapshot, SourceHasher, load_command_names, load_command_table_snapshot, _read_snapshot,
+    _write_snapshot)
+
+
+def _sample_handler():
+    pass
+
+
+def _sample_type(value):
+    return value
+
+
+class _SampleAction(argparse.Action):
+    def __call__(self, parser, namespace, values, option_string=None):
+        pass
+
+
+class TestSourceHasher(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.root, 'pkg', 'tests'))
+        with open(os.path.join(self.root, 'pkg', '__init__.py'), 'w') as f:
+            f.write('x = 1\n')
+        with open(os.path.join(self.root, 'pkg', 'tests', 'test_x.py'), 'w') as f:
+            f.write('y = 1\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_hash_tree_ignores_tests(self):
+        hasher = SourceHasher(os.path.join(self.root, 'memo.json'))
+        digest = hasher.hash_tree(self.root)
+        with open(os.path.join(self.root, 'pkg', 'tests', 'test_x.py'), 'w') as f:
+            f.write('y = 2\n')
+        self.assertEqual(digest, hasher.hash_tree(self.root))
+
+        with open(os.path.join(self.root, 'pkg', '__init__.py'), 'w') as f:
+            f.write('x = 22\n')
+        self.assertNotEqual(digest, hasher.hash_tree(self.root))
+
+    def test_distribution_versions(self):
+        for name in ['azure_mgmt_compute-30.0.0.dist-info', 'knack-0.11.0.dist-info', 'requests-2.31.0.dist-info',
+                     'azure_core-1.29.0.egg-info', 'azure']:
+            os.makedirs(os.path.join(self.root, name))
+        self.assertEqual(snapshot_module.get_distribution_versions([self.root, os.path.join(self.root, 'missing')]),
+                         ['azure_core-1.29.0.egg-info', 'azure_mgmt_compute-30.0.0.dist-info',
+                          'knack-0.11.0.dist-info'])
+
+    def test_sdk_upgrade_changes_key(self):
+        cli_ctx = SimpleNamespace(cloud=None, get_cli_version=lambda: '2.50.0')
+        hasher = SourceHasher(os.path.join(self.root, 'memo.json'))
+        os.makedirs(os.path.join(self.root, 'azure_mgmt_compute-30.0.0.dist-info'))
+        with mock.patch.object(snapshot_module, 'get_path_table', return_value={'mod': {'vm': self.root}}), \
+                mock.patch.object(snapshot_module.sys, 'path', [self.root] + snapshot_module.sys.path):
+            key, _ = snapshot_module.compute_snapshot_key(cli_ctx, hasher)
+            self.assertEqual(snapshot_module.compute_snapshot_key(cli_ctx, hasher)[0], key)
+            os.rename(os.path.join(self.root, 'azure_mgmt_compute-30.0.0.dist-info'),
+                      os.path.join(self.root, 'azure_mgmt_compute-31.0.0.dist-info'))
+            self.assertNotEqual(snapshot_module.compute_snapshot_key(cli_ctx, hasher)[0], key)
+
+    def test_memo_is_persisted(self):
+        memo_path = os.path.join(self.root, 'memo.json')
+        hasher = SourceHasher(memo_path)
+        digest = hasher.hash_tree(self.root)
+        hasher.save()
+        self.assertTrue(os.path.isfile(memo_path))
+        self.assertEqual(digest, SourceHasher(memo_path).hash_tree(self.root))
+
+
+class TestCommandTableSnapshot(unittest.TestCase):
+
+    def setUp(self):
+        self.cli_ctx = CLI(cli_name='snapshot-test', config_dir=tempfile.mkdtemp())
+        command = CLICommand(self.cli_ctx, 'sample create', _sample_handler,
+                             deprecate_info=Deprecated(self.cli_ctx, object_type='command',
+                                                       target='sample create', redirect='sample add'))
+        command.command_source = 'sample'
+        command.arguments = {
+            'name': CLICommandArgument('name', options_list=['--name', '-n', Deprecated(
+                self.cli_ctx, object_type='option', target='--old-name', redirect='--name', hide=True)],
+                                       type=_sample_type, required=True, help='The name.'),
+            'kind': CLICommandArgument('kind', options_list=['--kind'], choices=['a', 'b'], default='a',
+                                       action=_SampleAction),
+            'force': CLICommandArgument('force', options_list=['--force'], action='store_true', type=bool),
+        }
+        help_file = SimpleNamespace(command='sample create', type='command', short_summary='Create a sample.',
+                                    long_summary=None, deprecate_info=None, command_source='sample',
+                                    parameters=[SimpleNamespace(name='--name -n', name_source=['--name', '-n'],
+                                                                short_summary='The name.', long_summary=None,
+                                                                required=True)])
+        loader = SimpleNamespace(cli_ctx=self.cli_ctx, command_table={'sample create': command},
+                                 command_group_table={'sample': None})
+        self.snapshot = CommandTableSnapshot(self.cli_ctx, loader, [help_file],
+                                             {'sample create': 'type: command\n'})
+
+    def _restore(self):
+        data = pickle.loads(pickle.dumps(self.snapshot.dump()))
+        return CommandTableSnapshot.from_data(self.cli_ctx, data)
+
+    def test_round_trip_command(self):
+        restored = self._restore()
+        self.assertTrue(restored.restored)
+        command = restored.command_loader.command_table['sample create']
+        self.assertEqual(command.command_source, 'sample')
+        self.assertIsInstance(command.deprecate_info, Deprecated)
+        self.assertEqual(command.deprecate_info.redirect, 'sample add')
+        self.assertIsNone(restored.command_loader.command_group_table['sample'])
+        self.assertEqual(restored.helps, {'sample create': 'type: command\n'})
+
+    def test_round_trip_arguments(self):
+        arguments = self._restore().command_loader.command_table['sample create'].arguments
+        self.assertEqual(sorted(arguments), ['force', 'kind', 'name'])
+
+        name = arguments['name']
+        self.assertEqual(name.options_list[:2], ['--name', '-n'])
+        self.assertIsInstance(name.options_list[2], Deprecated)
+        self.assertTrue(name.options_list[2].hide)
+        self.assertEqual(name.type.settings['type'].__name__, '_sample_type')
+        self.assertTrue(name.type.settings['required'])
+        self.assertEqual(name.type.settings['help'], 'The name.')
+
+        kind = arguments['kind'].type.settings
+        self.assertEqual(kind['choices'], ['a', 'b'])
+        self.assertEqual(kind['default'], 'a')
+        self.assertEqual(kind['action'].__name__, '_SampleAction')
+        self.assertEqual(arguments['force'].type.settings['action'], 'store_true')
+        self.assertIs(arguments['force'].type.settings['type'], bool)
+
+    def test_round_trip_help(self):
+        help_file = self._restore().loaded_help[0]
+        self.assertEqual(help_file.command, 'sample create')
+        self.assertEqual(help_file.short_summary, 'Create a sample.')
+        self.assertEqual(help_file.parameters[0].name_source, ['--name', '-n'])
+        self.assertTrue(help_file.parameters[0].required)
+
+    def test_round_trip_group_help(self):
+        loader = CLICommandsLoader(self.cli_ctx)
+        group = CommandGroup(loader, 'sample', 'sample#{}')
+        helped_group = CommandGroup(loader, 'sample sub', 'sample#{}')
+        helped_group.help = {'short-summary': 'Manage subs.'}
+        self.snapshot.command_loader.command_group_table.update({'sample': group, 'sample sub': helped_group})
+
+        group_table = self._restore().command_loader.command_group_table
+        self.assertFalse(hasattr(group_table['sample'], 'help'))
+        self.assertEqual(group_table['sample sub'].help, {'short-summary': 'Manage subs.'})
+        commands_info = [{
+            'name': name, 'source': {'module': 'sample'}, 'is_aaz': False, 'confirmation': False,
+            'supports_no_wait': False, 'is_preview': False, 'help': {'short-summary': 'A command.'}, 'arguments': {}
+        } for name in ('sample create', 'sample sub create')]
+        commands_meta = get_commands_meta(group_table, commands_info, with_help=True, with_example=False)
+        sample = commands_meta['sample']['sub_groups']['sample']
+        self.assertNotIn('desc', sample)
+        self.assertEqual(sample['sub_groups']['sample sub']['desc'], 'Manage subs.')
+
+    def test_stale_snapshot_is_ignored(self):
+        snapshot_path = os.path.join(self.cli_ctx.config.config_dir, 'command_table.snapshot')
+        _write_snapshot(snapshot_path, 'key1', {}, self.snapshot.dump())
+        self.assertIsNotNone(_read_snapshot(snapshot_path, 'key1'))
+        self.assertIsNone(_read_snapshot(snapshot_path, 'key2'))
+
+
+class TestIncrementalLoading(unittest.TestCase):
+
+    def _load(self, selected_modules):
+        with mock.patch('azdev.operations.snapshot.snapshot_enabled', return_value=False), \
+                mock.patch.object(CommandTableSnapshot, 'from_cli') as from_cli:
+            load_command_table_snapshot(None, selected_modules=selected_modules)
+        return from_cli.call_args[1]['selected_modules']
+
+    def test_only_changed_modules_are_loaded(self):
+        selected_modules = {'core': {}, 'mod': {'network': '/network'}, 'ext': {}}
+        self.assertEqual(self._load(selected_modules), selected_modules)
+
+    def test_core_change_loads_everything(self):
+        selected_modules = {'core': {'azure-cli-core': '/core'}, 'mod': {'network': '/network'}, 'ext': {}}
+        self.assertIsNone(self._load(selected_modules))
+        self.assertIsNone(self._load(None))
+
+
+class TestLoadCommandNames(unittest.TestCase):
+
+    def setUp(self):
+        self.snapshot_dir = tempfile.mkdtemp()
+        self.key = 'key1'
+        patches = [
+            mock.patch.object(snapshot_module, 'snapshot_enabled', return_value=True),
+            mock.patch.object(snapshot_module, 'get_snapshot_dir', return_value=self.snapshot_dir),
+            mock.patch.object(snapshot_module, 'compute_snapshot_key', side_effect=lambda *_: (self.key, {})),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.snapshot_dir)
+
+    def test_command_names_are_cached(self):
+        with mock.patch.object(snapshot_module, '_load_command_names_from_cli',
+                               return_value=['vm create', 'group list']) as load:
+            self.assertEqual(load_command_names(None), ['vm create', 'group list'])
+            self.assertEqual(load_command_names(None), ['vm create', 'group list'])
+        self.assertEqual(load.call_count, 1)
+
+    def test_stale_names_are_taken_from_snapshot(self):
+        with mock.patch.object(snapshot_module, '_load_command_names_from_cli', return_value=['group list']):
+            load_command_names(None)
+
+        self.key = 'key2'
+        _write_snapshot(os.path.join(self.snapshot_dir, 'command_table.snapshot'), self.key, {},
+                        {'command_table': {'group show': None}})
+        with mock.patch.object(snapshot_module, '_load_command_names_from_cli') as load:
+            self.assertEqual(load_command_names(None), ['group show'])
+        load.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -5,25 +5,29 @@
 # -----------------------------------------------------------------------------
 
 import glob
-from importlib import import_module
-import json
 import os
 import re
 from subprocess import CalledProcessError
 import sys
+import time
 
 from knack.log import get_logger
 from knack.util import CLIError
 
 from azdev.utilities import (
     display, output, heading, subheading,
-    cmd as raw_cmd, py_cmd, pip_cmd, find_file, IS_WINDOWS,
+    cmd as raw_cmd, py_cmd, pip_cmd, find_file,
     ENV_VAR_TEST_LIVE,
     COMMAND_MODULE_PREFIX, EXTENSION_PREFIX,
     make_dirs, get_azdev_config_dir,
     get_path_table, require_virtual_env, get_name_index)
+from .daemon import is_daemon_running, start_daemon, stop_daemon
+from .discovery import find_tests
+from .index import LOOKUP_FILE_SUFFIX, TestLookup
 from .pytest_runner import get_test_runner
-from .profile_context import ProfileContext, current_profile
+from .scheduling import (
+    DURATIONS_FILE, RecordedDurations, estimate_durations, expand_test_paths, get_shard, load_durations, parse_shard)
+from .profile_context import ProfileContext, current_profile, get_profile_namespace
 from .incremental_strategy import CLIAzureDevOpsContext
 
 logger = get_logger(__name__)
@@ -34,10 +38,16 @@ def run_tests(tests, xml_path=None, discover=False, in_series=False,
               run_live=False, profile=None, last_failed=False, pytest_args=None,
               no_exit_first=False, mark=None,
               git_source=None, git_target=None, git_repo=None,
-              cli_ci=False):
+              cli_ci=False, shard=None, durations_path=None, daemon=False):
 
     require_virtual_env()
 
+    shard = parse_shard(shard) if shard else None
+    if durations_path and not shard:
+        raise CLIError('usage error: --durations is only used with --shard')
+    # only durations that every CI agent has can split shards, never the ones recorded locally
+    shard_durations = load_durations(durations_path) if durations_path else None
+
     DEFAULT_RESULT_FILE = 'test_results.xml'
     DEFAULT_RESULT_PATH = os.path.join(get_azdev_config_dir(), DEFAULT_RESULT_FILE)
 
@@ -45,7 +55,8 @@ def run_tests(tests, xml_path=None, discover=False, in_series=False,
 
     path_table = get_path_table()
 
-    test_index = _get_test_index(profile or current_profile(), discover)
+    test_profile = profile or current_profile()
+    test_index = _get_test_index(test_profile, discover)
 
     if not tests:
         tests = list(path_table['mod'].keys()) + list(path_table['core'].keys()) + list(path_table['ext'].keys())
@@ -61,7 +72,8 @@ def run_tests(tests, xml_path=None, discover=False, in_series=False,
 
     if cli_ci is True:
         ctx = CLIAzureDevOpsContext(git_repo, git_source, git_target)
-        modified_mods = ctx.filter(test_index)
+        modified_mods = ctx.filter(test_index, test_profile)
+        logger.info('Tests selected by the changes: %s', ', '.join(modified_mods))
 
     # resolve the path at which to dump the XML results
     xml_path = xml_path or DEFAULT_RESULT_PATH
@@ -73,33 +85,32 @@ def run_tests(tests, xml_path=None, discover=False, in_series=False,
         logger.warning('RUNNING TESTS LIVE')
         os.environ[ENV_VAR_TEST_LIVE] = 'True'
 
-    def _find_test(index, name):
-        name_comps = name.split('.')
-        num_comps = len(name_comps)
-        key_error = KeyError()
-
-        for i in range(num_comps):
-            check_name = '.'.join(name_comps[(-1 - i):])
-            try:
-                match = index[check_name]
-                if check_name != name:
-                    logger.info("Test found using just '%s'. The rest of the name was ignored.\n", check_name)
-                return match
-            except KeyError as ex:
-                key_error = ex
-                continue
-        raise key_error
-
     # lookup test paths from index
     test_paths = []
     for t in modified_mods:
+        if t.endswith('.py') and os.path.isfile(t):
+            # a test file selected by `--cli-ci`
+            test_paths.append(os.path.normpath(t))
+            continue
         try:
-            test_path = os.path.normpath(_find_test(test_index, t))
+            test_path = os.path.normpath(test_index.find(t))
             test_paths.append(test_path)
         except KeyError:
             logger.warning("'%s' not found. If newly added, re-run with --discover", t)
             continue
 
+    durations = RecordedDurations(os.path.join(get_azdev_config_dir(), 'test_index', DURATIONS_FILE))
+    # test directories are only split into test files when their order or a part of them is needed
+    if test_paths and (shard or not in_series):
+        test_paths = expand_test_paths(test_paths)
+        if shard:
+            shard_paths = get_shard(test_paths, shard, shard_durations)
+            display('\nShard {} of {}: {} of {} test files\n'.format(
+                shard[0], shard[1], len(shard_paths), len(test_paths)))
+            test_paths = shard_paths
+        # longest first, so that the parallel run does not end waiting for a long test started last
+        test_paths = [test_path for test_path, _ in estimate_durations(test_paths, durations)]
+
     exit_code = 0
 
     # Tests have been collected. Now run them.
@@ -108,17 +119,51 @@ def run_tests(tests, xml_path=None, discover=False, in_series=False,
         sys.exit(exit_code)
 
     exit_code = 0
+    start_time = time.time()
     with ProfileContext(profile):
         runner = get_test_runner(parallel=not in_series,
                                  log_path=xml_path,
                                  last_failed=last_failed,
                                  no_exit_first=no_exit_first,
-                                 mark=mark)
+                                 mark=mark,
+                                 daemon=daemon)
         exit_code = runner(test_paths=test_paths, pytest_args=pytest_args)
 
+    _record_test_durations(durations, xml_path, start_time)
     sys.exit(0 if not exit_code else 1)
 
 
+def start_test_daemon():
+    require_virtual_env()
+    if is_daemon_running():
+        display('The test daemon is already running.')
+        return
+    start_daemon()
+    display('The test daemon is running. Use `azdev test --daemon` to run tests in it.')
+
+
+def stop_test_daemon():
+    if stop_daemon():
+        display('The test daemon was stopped.')
+    else:
+        display('The test daemon is not running.')
+
+
+def _record_test_durations(durations, xml_path, start_time):
+    """ Keeps the test durations of the results the run just wrote, for scheduling later runs. """
+    from xml.etree.ElementTree import ParseError
+
+    try:
+        if os.path.getmtime(xml_path) < start_time:
+            return
+        count = durations.record(xml_path)
+        durations.save()
+    except (OSError, ParseError) as ex:
+        logger.warning('Unable to record test durations from %s: %s', xml_path, ex)
+        return
+    logger.info('Recorded the durations of %d tests in %s', count, durations.path)
+
+
 def _filter_by_git_diff(tests, test_index, git_source, git_target, git_repo):
     from azdev.utilities import diff_branches, extract_module_name
     from azdev.utilities.git_util import summarize_changed_mods
@@ -151,44 +196,25 @@ def _filter_by_git_diff(tests, test_index, git_source, git_target, git_repo):
     return tests
 
 
-def _discover_module_tests(mod_name, mod_data):
-
-    # get the list of test files in each module
-    total_tests = 0
-    total_files = 0
+def _list_module_test_files(mod_name, mod_data):
+    """ Returns the paths of the test files in a module, or None if it has no tests directory. """
     logger.info('Mod: %s', mod_name)
     try:
         contents = os.listdir(mod_data['filepath'])
-        test_files = {
-            x[:-len('.py')]: {} for x in contents if x.startswith('test_') and x.endswith('.py')
-        }
-        total_files = len(test_files)
     except FileNotFoundError:
         logger.info('  No test files found.')
         return None
+    return [os.path.join(mod_data['filepath'], x) for x in contents if x.startswith('test_') and x.endswith('.py')]
 
-    for file_name in test_files:
-        mod_data['files'][file_name] = {}
-        test_file_path = mod_data['base_path'] + '.' + file_name
-        try:
-            module = import_module(test_file_path)
-        except ImportError as ex:
-            logger.info('    %s', ex)
-            continue
-        module_dict = module.__dict__
-        possible_test_classes = {x: y for x, y in module_dict.items() if not x.startswith('_')}
-        for class_name, class_def in possible_test_classes.items():
-            try:
-                class_dict = class_def.__dict__
-            except AttributeError:
-                # skip non-class symbols in files like constants, imported methods, etc.
-                continue
-            if class_dict.get('__module__') == test_file_path:
-                tests = [x for x in class_def.__dict__ if x.startswith('test_')]
-                if tests:
-                    mod_data['files'][file_name][class_name] = tests
-                total_tests += len(tests)
-    logger.info('  %s tests found in %s files.', total_tests, total_files)
+
+def _discover_module_tests(mod_name, mod_data, test_files, file_tests):
+    """ Fills in the test classes and methods found in the test files of a module. """
+    total_tests = 0
+    for test_file in test_files:
+        file_name = os.path.basename(test_file)[:-len('.py')]
+        mod_data['files'][file_name] = file_tests.get(test_file, {})
+        total_tests += sum(len(tests) for tests in mod_data['files'][file_name].values())
+    logger.info('  %s: %s tests found in %s files.', mod_name, total_tests, len(test_files))
     return mod_data
 
 
@@ -197,8 +223,7 @@ def _discover_tests(profile):
     """ Builds an index of tests so that the user can simply supply the name they wish to test instead of the
         full path.
     """
-    profile_split = profile.split('-')
-    profile_namespace = '_'.join([profile_split[-1]] + profile_split[:-1])
+    profile_namespace = get_profile_namespace(profile)
 
     heading('Discovering Tests')
 
@@ -222,9 +247,7 @@ def _discover_tests(profile):
             'base_path': '{}.tests'.format(mod_name).replace('-', '.'),
             'files': {}
         }
-        tests = _discover_module_tests(mod_name, mod_data)
-        if tests:
-            module_data[mod_name] = tests
+        module_data[mod_name] = (mod_name, mod_data)
 
     logger.info('\nCommand Modules: %s', ', '.join([name for name, _ in command_modules]))
     for mod_name, mod_path in command_modules:
@@ -237,9 +260,7 @@ def _discover_tests(profile):
             'base_path': 'azure.cli.command_modules.{}.tests.{}'.format(mod_name, profile_namespace),
             'files': {}
         }
-        tests = _discover_module_tests(mod_name, mod_data)
-        if tests:
-            module_data[mod_name] = tests
+        module_data[mod_name] = (mod_name, mod_data)
 
     logger.info('\nExtensions: %s', ', '.join([name for name, _ in extensions if name]))
     for mod_name, mod_path in extensions:
@@ -256,9 +277,14 @@ def _discover_tests(profile):
             'base_path': '{}.tests.{}'.format(import_name, profile_namespace),
             'files': {}
         }
-        tests = _discover_module_tests(import_name, mod_data)
-        if tests:
-            module_data[mod_name] = tests
+        module_data[mod_name] = (import_name, mod_data)
+
+    # the test files are parsed rather than imported, which would import every SDK as well
+    test_files = {mod_name: _list_module_test_files(name, mod_data)
+                  for mod_name, (name, mod_data) in module_data.items()}
+    file_tests = find_tests([path for paths in test_files.values() if paths for path in paths])
+    module_data = {mod_name: _discover_module_tests(name, mod_data, test_files[mod_name], file_tests)
+                   for mod_name, (name, mod_data) in module_data.items() if test_files[mod_name] is not None}
 
     test_index = {}
     conflicted_keys = []
@@ -314,20 +340,18 @@ def _get_test_index(profile, discover):
     config_dir = get_azdev_config_dir()
     test_index_dir = os.path.join(config_dir, 'test_index')
     make_dirs(test_index_dir)
-    test_index_path = os.path.join(test_index_dir, '{}.json'.format(profile))
-    test_index = {}
+    test_index_path = os.path.join(test_index_dir, '{}{}'.format(profile, LOOKUP_FILE_SUFFIX))
+    test_index = TestLookup(test_index_path)
     if discover:
-        test_index = _discover_tests(profile)
-        with open(test_index_path, 'w') as f:
-            f.write(json.dumps(test_index))
+        test_index = TestLookup(test_index_path, _discover_tests(profile))
+        test_index.save()
         display('\ntest index updated: {}'.format(test_index_path))
-    elif os.path.isfile(test_index_path):
-        with open(test_index_path, 'r') as f:
-            test_index = json.loads(''.join(f.readlines()))
+    elif test_index.exists():
         display('\ntest index found: {}'.format(test_index_path))
     else:
-        test_index = _discover_tests(profile)
-        with open(test_index_path, 'w') as f:
-            f.write(json.dumps(test_index))
+        if os.path.isfile(test_index_path):
+            logger.warning('The test index %s is unreadable or outdated, rebuilding it', test_index_path)
+        test_index = TestLookup(test_index_path, _discover_tests(profile))
+        test_index.save()
         display('\ntest index created: {}'.format(test_index_path))
     return test_index
@@ -0,0 +1,418 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+# -----------------------------------------------------------------------------
+
+"""
+Test daemon which runs pytest in processes forked from a warm parent.
+
+The daemon imports pytest with its plugins, the CLI core, the testsdk and the SDKs imported by the tests it is asked
+to run once, and forks a child for every run submitted over a Unix socket. The child runs pytest with the output
+going straight to the client, so only the test files and the command module code they load are imported per run.
+
+The daemon exits when a file it has imported changes, when it has been idle for `IDLE_TIMEOUT` seconds, or when asked
+to stop. The client starts a new daemon when needed.
+"""
+
+import json
+import os
+import shlex
+import socket
+import stat
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+
+from knack.log import get_logger
+from knack.util import CLIError
+
+from azdev.utilities import get_azdev_config_dir
+
+logger = get_logger(__name__)
+
+PROTOCOL_VERSION = 1
+# seconds without a request after which the daemon exits
+IDLE_TIMEOUT = 3600
+# seconds to wait for a new daemon to accept connections
+START_TIMEOUT = 120
+WARM_MODULES = ('pytest', 'azure.cli.core', 'azure.cli.core.commands', 'azure.cli.testsdk')
+# the code being worked on is imported by every run instead, so that changing it doesn't restart the daemon
+COLD_MODULE_PREFIXES = ('azure.cli.command_modules.', 'azext_')
+
+# file in the azdev config directory recording the private directory the socket is created in
+SOCKET_DIR_FILE = 'test_daemon.dir'
+SOCKET_FILE = 'daemon.sock'
+
+# the output of a run ends with either marker, which is only looked for at the very end of the stream
+_EXIT_MARKER = b'\0azdev-exit:'
+_RESTART_MARKER = b'\0azdev-restart'
+# the exit marker with an exit code and a newline fits in this many bytes
+_TRAILER_SIZE = len(_EXIT_MARKER) + 24
+
+
+def get_daemon_socket_path():
+    """ Returns the path of the daemon's socket, one for every azdev config directory, i.e. virtual environment.
+
+    Since the length of socket paths is limited, the socket is created in a private (0700) directory made in the temp
+    directory, whose path is recorded in the config directory. A new directory is made if the recorded one is gone or
+    is no longer private to the current user.
+    """
+    record_path = os.path.join(get_azdev_config_dir(), SOCKET_DIR_FILE)
+    try:
+        with open(record_path, 'r') as f:
+            socket_dir = f.read().strip()
+    except FileNotFoundError:
+        socket_dir = None
+    if not socket_dir or not _is_private_dir(socket_dir):
+        socket_dir = tempfile.mkdtemp(prefix='azdev-test-')
+        os.makedirs(os.path.dirname(record_path), exist_ok=True)
+        tmp_path = '{}.{}.tmp'.format(record_path, os.getpid())
+        with open(tmp_path, 'w') as f:
+            f.write(socket_dir)
+        os.replace(tmp_path, record_path)
+    return os.path.join(socket_dir, SOCKET_FILE)
+
+
+def _is_private_dir(path):
+    try:
+        st = os.lstat(path)
+    except OSError:
+        return False
+    return stat.S_ISDIR(st.st_mode) and st.st_uid == os.getuid() and not st.st_mode & 0o077
+
+
+def _is_own_peer(sock):
+    """ Returns whether the process at the other end of a connected socket runs as the current user. """
+    if not hasattr(socket, 'SO_PEERCRED'):
+        # the socket's permissions are all there is to rely on
+        return True
+    creds = sock.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize('3i'))
+    _, uid, _ = struct.unpack('3i', creds)
+    return uid == os.getuid()
+
+
+def _check_supported():
+    if not hasattr(socket, 'AF_UNIX') or not hasattr(os, 'fork'):
+        raise CLIError('usage error: the test daemon requires a POSIX system')
+
+
+def _connect(socket_path):
+    """ Connects to the daemon, or returns None if it isn't running.
+
+    The environment is sent to the daemon, so the socket must be one the current user created in a private directory,
+    and be served by a process of the current user.
+    """
+    try:
+        st = os.lstat(socket_path)
+    except OSError:
+        return None
+    if not _is_private_dir(os.path.dirname(socket_path)) or not stat.S_ISSOCK(st.st_mode) or \
+            st.st_uid != os.getuid():
+        raise CLIError('The test daemon socket {} is not private to the current user, remove it and try again'.format(
+            socket_path))
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(socket_path)
+    except OSError:
+        sock.close()
+        return None
+    if not _is_own_peer(sock):
+        sock.close()
+        raise CLIError('The test daemon at {} is run by another user'.format(socket_path))
+    return sock
+
+
+def _send_request(sock, request):
+    sock.sendall(json.dumps(request).encode('utf-8') + b'\n')
+
+
+def is_daemon_running(socket_path=None):
+    sock = _connect(socket_path or get_daemon_socket_path())
+    if sock is None:
+        return False
+    sock.close()
+    return True
+
+
+def start_daemon(socket_path=None):
+    """ Starts the daemon in the background unless it is running. Returns once it accepts connections. """
+    _check_supported()
+    socket_path = socket_path or get_daemon_socket_path()
+    if is_daemon_running(socket_path):
+        return
+    log_path = os.path.join(get_azdev_config_dir(), 'test_daemon.log')
+    os.makedirs(os.path.dirname(log_path), exist_ok=True)
+    logger.warning('Starting the test daemon, see %s', log_path)
+    with open(log_path, 'ab') as log:
+        subprocess.Popen([sys.executable, '-c', 'from {} import main; main()'.format(__name__), socket_path],
+                         stdin=subprocess.DEVNULL, stdout=log, stderr=subprocess.STDOUT, start_new_session=True)
+    deadline = time.time() + START_TIMEOUT
+    while not is_daemon_running(socket_path):
+        if time.time() > deadline:
+            raise CLIError('The test daemon did not start within {}s, see {}'.format(START_TIMEOUT, log_path))
+        time.sleep(0.1)
+
+
+def stop_daemon(socket_path=None):
+    """ Stops the daemon. Returns whether it was running. """
+    sock = _connect(socket_path or get_daemon_socket_path())
+    if sock is None:
+        return False
+    with sock:
+        _send_request(sock, {'version': PROTOCOL_VERSION, 'command': 'stop'})
+        sock.recv(1)
+    return True
+
+
+def run_in_daemon(arguments, test_paths, socket_path=None):
+    """ Runs pytest with the given arguments in the daemon, starting it if needed, and streams its output.
+
+    :param arguments: pytest arguments, including the test paths.
+    :param test_paths: the test paths, whose imports the daemon pre-imports for later runs.
+    :returns: the pytest exit code.
+    """
+    _check_supported()
+    socket_path = socket_path or get_daemon_socket_path()
+    request = {
+        'version': PROTOCOL_VERSION,
+        'command': 'run',
+        'python': sys.executable,
+        'cwd': os.getcwd(),
+        'env': dict(os.environ),
+        'args': arguments,
+        'test_paths': test_paths,
+    }
+    # a daemon which has become stale exits instead of running the tests, so try again with a new one
+    for _ in range(2):
+        start_daemon(socket_path)
+        sock = _connect(socket_path)
+        if sock is None:
+            continue
+        with sock:
+            _send_request(sock, request)
+            exit_code = _receive_output(sock)
+        if exit_code is not None:
+            return exit_code
+        logger.warning('The test daemon is out of date, restarting it')
+        _wait_for_exit(socket_path)
+    raise CLIError('Unable to run the tests in the test daemon')
+
+
+def _receive_output(sock):
+    """ Copies the output of a run to stdout. Returns its exit code, or None if the daemon is going to restart.
+
+    The output may contain any bytes, so the last `_TRAILER_SIZE` bytes are held back until the end of the stream,
+    which is where the trailer with the exit code is.
+    """
+    tail = b''
+    while True:
+        data = sock.recv(65536)
+        if not data:
+            break
+        tail += data
+        if len(tail) > _TRAILER_SIZE:
+            _write_output(tail[:-_TRAILER_SIZE])
+            tail = tail[-_TRAILER_SIZE:]
+    if tail.endswith(_RESTART_MARKER):
+        _write_output(tail[:-len(_RESTART_MARKER)])
+        return None
+    output, marker, exit_code = tail.rpartition(_EXIT_MARKER)
+    if not marker or not exit_code.endswith(b'\n') or not exit_code[:-1].isdigit():
+        _write_output(tail)
+        raise CLIError('The test daemon exited unexpectedly')
+    _write_output(output)
+    return int(exit_code)
+
+
+def _write_output(data):
+    if not data:
+        return
+    if hasattr(sys.stdout, 'buffer'):
+        sys.stdout.buffer.write(data)
+        sys.stdout.buffer.flush()
+    else:
+        sys.stdout.write(data.decode('utf-8', 'replace'))
+
+
+def _wait_for_exit(socket_path):
+    deadline = time.time() + START_TIMEOUT
+    while is_daemon_running(socket_path) and time.time() < deadline:
+        time.sleep(0.1)
+
+
+class TestDaemon:
+    """ Server side of the daemon, see `start_daemon`. """
+
+    __test__ = False
+
+    def __init__(self, socket_path):
+        self.socket_path = socket_path
+        # path -> mtime of every imported file, to find out when the daemon is stale
+        self.stamps = {}
+
+    def warm_up(self, names):
+        for name in names:
+            if name in sys.modules or name.startswith(COLD_MODULE_PREFIXES) or '.tests.' in name:
+                continue
+            try:
+                __import__(name)
+            except Exception:  # pylint: disable=broad-except
+                # names imported from a module aren't always modules themselves
+                continue
+        self._update_stamps()
+
+    def warm_up_plugins(self):
+        try:
+            from importlib.metadata import entry_points
+        except ImportError:
+            return
+        plugins = entry_points()
+        plugins = plugins.select(group='pytest11') if hasattr(plugins, 'select') else plugins.get('pytest11', [])
+        for plugin in plugins:
+            try:
+                plugin.load()
+            except Exception as ex:  # pylint: disable=broad-except
+                logger.warning('Unable to load pytest plugin %s: %s', plugin.name, ex)
+        self._update_stamps()
+
+    def _update_stamps(self):
+        for module in list(sys.modules.values()):
+            path = getattr(module, '__file__', None)
+            if path and path not in self.stamps:
+                try:
+                    self.stamps[path] = os.stat(path).st_mtime_ns
+                except OSError:
+                    continue
+
+    def is_stale(self):
+        for path, mtime in self.stamps.items():
+            try:
+                if os.stat(path).st_mtime_ns != mtime:
+                    logger.warning('%s changed', path)
+                    return True
+            except OSError:
+                return True
+        return False
+
+    def serve(self):
+        if is_daemon_running(self.socket_path):
+            logger.warning('The test daemon is already running at %s', self.socket_path)
+            return
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        # create the socket without permissions for others, rather than changing them once it can be connected to
+        umask = os.umask(0o177)
+        try:
+            server.bind(self.socket_path)
+        finally:
+            os.umask(umask)
+        server.listen(8)
+        server.settimeout(1)
+        logger.warning('Test daemon %i listening at %s', os.getpid(), self.socket_path)
+        last_request = time.time()
+        try:
+            # a socket removed from its directory can't be connected to anymore
+            while time.time() - last_request < IDLE_TIMEOUT and os.path.exists(self.socket_path):
+                self._reap_children()
+                try:
+                    conn, _ = server.accept()
+                except socket.timeout:
+                    continue
+                last_request = time.time()
+                conn.settimeout(None)
+                with conn:
+                    if not _is_own_peer(conn):
+                        logger.warning('Ignoring a connection from another user')
+                        continue
+                    if not self.handle(server, conn):
+                        break
+        finally:
+            server.close()
+            if os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+        logger.warning('Test daemon %i exiting', os.getpid())
+
+    def handle(self, server, conn):
+        """ Handles one request. Returns whether to continue serving. """
+        with conn.makefile('rb') as f:
+            line = f.readline()
+        try:
+            request = json.loads(line.decode('utf-8'))
+        except ValueError:
+            return True
+        if request.get('version') != PROTOCOL_VERSION or request.get('command') == 'stop':
+            conn.sendall(_RESTART_MARKER)
+            return False
+        if request.get('python') != sys.executable or self.is_stale():
+            conn.sendall(_RESTART_MARKER)
+            return False
+        self.warm_up(self._get_test_imports(request['cwd'], request['test_paths']))
+        sys.stdout.flush()
+        sys.stderr.flush()
+        if os.fork() == 0:
+            server.close()
+            self._run_child(conn, request)
+        return True
+
+    @staticmethod
+    def _get_test_imports(cwd, test_paths):
+        from .impact import parse_imports
+        from .scheduling import expand_test_paths
+
+        paths = [os.path.join(cwd, test_path.partition('::')[0]) for test_path in test_paths]
+        names = set()
+        for path in expand_test_paths(paths):
+            if path.endswith('.py'):
+                names.update(parse_imports(path, ''))
+        return sorted(names)
+
+    @staticmethod
+    def _run_child(conn, request):
+        exit_code = 1
+        try:
+            os.chdir(request['cwd'])
+            os.environ.clear()
+            os.environ.update(request['env'])
+            os.dup2(conn.fileno(), 1)
+            os.dup2(conn.fileno(), 2)
+            import pytest
+            exit_code = int(pytest.main(request['args']))
+        except BaseException:  # pylint: disable=broad-except
+            import traceback
+            traceback.print_exc()
+        finally:
+            try:
+                sys.stdout.flush()
+                sys.stderr.flush()
+                os.write(1, _EXIT_MARKER + str(exit_code).encode('ascii') + b'\n')
+            finally:
+                os._exit(exit_code)  # pylint: disable=protected-access
+
+    @staticmethod
+    def _reap_children():
+        try:
+            while os.waitpid(-1, os.WNOHANG)[0]:
+                pass
+        except ChildProcessError:
+            pass
+
+
+def get_daemon_arguments(arguments):
+    """ Returns the arguments of a `python -m pytest` command line as a list for `pytest.main`, without xdist, since
+    its workers would be new processes. """
+    arguments = shlex.split(' '.join(arguments))
+    if '-n' in arguments:
+        idx = arguments.index('-n')
+        del arguments[idx:idx + 2]
+    return arguments
+
+
+def main():
+    daemon = TestDaemon(sys.argv[1])
+    daemon.warm_up(WARM_MODULES)
+    daemon.warm_up_plugins()
+    daemon.serve()
@@ -0,0 +1,111 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+# -----------------------------------------------------------------------------
+
+import ast
+import multiprocessing
+import os
+
+from knack.log import get_logger
+
+from azdev.utilities import FileCache, get_azdev_config_dir, get_file_digest, get_file_stamp
+
+logger = get_logger(__name__)
+
+DISCOVERY_CACHE_VERSION = 2
+DISCOVERY_CACHE_FILE = 'test_files.bin'
+# below this many files to parse a pool costs more than it saves
+_MIN_POOL_FILES = 32
+
+
+def find_tests(paths, jobs=None):
+    """ Returns the test classes and methods of test files without importing them.
+
+    Files are parsed in a process pool and the results are cached per file with the hash of its contents. The hash is
+    only computed when the file's (mtime, size) changed, so rebuilding the test index only parses the files whose
+    contents changed, e.g. not those touched by switching git branches back and forth.
+
+    :param paths: paths of the test files.
+    :param jobs: number of processes to parse with, defaults to the number of CPUs.
+    :returns: dict of path to the dict returned by `parse_test_file`.
+    """
+    cache = FileCache(os.path.join(get_azdev_config_dir(), 'test_index', DISCOVERY_CACHE_FILE),
+                      DISCOVERY_CACHE_VERSION)
+    results = {}
+    tasks = []
+    for path in paths:
+        key = os.path.abspath(path)
+        stamp = get_file_stamp(path)
+        if stamp is None:
+            continue
+        entry = cache.get(key, stamp)
+        if entry is None:
+            digest = get_file_digest(path)
+            entry = cache.get_stale(key)
+            if entry is None or entry[0] != digest:
+                tasks.append((path, stamp, digest))
+                continue
+            cache.set(key, stamp, entry)
+        results[path] = entry[1]
+
+    jobs = jobs or os.cpu_count() or 1
+    if jobs > 1 and len(tasks) >= _MIN_POOL_FILES:
+        logger.info('Parsing %i test files in %i processes', len(tasks), jobs)
+        with multiprocessing.Pool(jobs) as pool:
+            parsed = pool.map(parse_test_file, [path for path, _, _ in tasks], chunksize=8)
+    else:
+        parsed = [parse_test_file(path) for path, _, _ in tasks]
+    for (path, stamp, digest), tests in zip(tasks, parsed):
+        results[path] = tests
+        cache.set(os.path.abspath(path), stamp, (digest, tests))
+    cache.save()
+    return results
+
+
+def parse_test_file(path):
+    """ Returns a dict of the public classes defined in a test file to the names of their own `test_` members.
+
+    Classes without such members are left out, just like when inspecting the imported module.
+    """
+    try:
+        with open(path, 'rb') as f:
+            tree = ast.parse(f.read(), filename=path)
+    except (OSError, SyntaxError, ValueError) as ex:
+        logger.info('    %s', ex)
+        return {}
+
+    test_classes = {}
+    for node in _iter_module_statements(tree.body):
+        if not isinstance(node, ast.ClassDef) or node.name.startswith('_'):
+            continue
+        tests = []
+        for member in node.body:
+            for name in _get_defined_names(member):
+                if name.startswith('test_') and name not in tests:
+                    tests.append(name)
+        # a later definition replaces an earlier one of the same name
+        test_classes[node.name] = tests
+    return {name: tests for name, tests in test_classes.items() if tests}
+
+
+def _iter_module_statements(body):
+    """ Yields the statements that run at module level, including those in if, try and with blocks. """
+    for node in body:
+        yield node
+        if isinstance(node, (ast.If, ast.With, ast.Try)):
+            for block in (node.body, getattr(node, 'orelse', []), getattr(node, 'finalbody', [])):
+                yield from _iter_module_statements(block)
+            for handler in getattr(node, 'handlers', []):
+                yield from _iter_module_statements(handler.body)
+
+
+def _get_defined_names(node):
+    if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+        return [node.name]
+    if isinstance(node, ast.Assign):
+        return [target.id for target in node.targets if isinstance(target, ast.Name)]
+    if isinstance(node, (ast.AnnAssign, ast.AugAssign)) and isinstance(node.target, ast.Name):
+        return [node.target.id]
+    return []
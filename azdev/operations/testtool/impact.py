@@ -0,0 +1,278 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+# -----------------------------------------------------------------------------
+
+"""
+Test impact analysis of Azure CLI changes.
+
+A static import graph of the Python files under `src/` maps changed files to the test files that transitively import
+them. The tests of a command module also depend on all of its code, since the CLI loads it by name while running a
+command. Changes the graph cannot map, e.g. data files or files missing from the working tree, fall back to testing
+the whole module they belong to. Command modules keep the tests of every profile in `tests/<profile namespace>`, and
+only those of the profile the tests run against are selected.
+"""
+
+import ast
+import multiprocessing
+import os
+from collections import deque
+
+from knack.log import get_logger
+from knack.util import CLIError
+
+from azdev.utilities import FileCache, extract_module_name, get_azdev_config_dir, get_file_stamp
+from .discovery import find_tests
+
+logger = get_logger(__name__)
+
+IMPACT_CACHE_VERSION = 1
+IMPACT_CACHE_FILE = 'imports.bin'
+COMMAND_MODULES_PACKAGE = 'azure.cli.command_modules'
+# below this many files to parse a pool costs more than it saves
+_MIN_POOL_FILES = 32
+_SKIPPED_DIRS = ('recordings', '__pycache__')
+
+
+def get_module_name(path):
+    """ Returns the dotted module name of a file given relative to the repo, e.g. `src/azure-cli-core/azure/cli/core/
+    util.py` is `azure.cli.core.util`, or None if it isn't a module of a package. """
+    parts = path.replace('\\', '/').split('/')
+    # src/<distribution>/<package>/.../<module>.py
+    if len(parts) < 4 or parts[0] != 'src' or not parts[-1].endswith('.py'):
+        return None
+    parts = parts[2:]
+    parts[-1] = parts[-1][:-len('.py')]
+    if parts[-1] == '__init__':
+        parts.pop()
+    return '.'.join(parts)
+
+
+def is_test_module(module):
+    return '.tests.' in module or module.endswith('.tests')
+
+
+def is_test_file(module):
+    return '.tests.' in module and module.rsplit('.', 1)[-1].startswith('test_')
+
+
+def is_profile_test_file(path, profile_namespace):
+    """ Returns whether a test file given relative to the repo runs against a profile, i.e. it isn't a command module
+    test file in the directory of another profile. """
+    module = get_module_name(path) or ''
+    package = get_command_module_package(module)
+    if not package:
+        return True
+    parts = module[len(package) + 1:].split('.')
+    return len(parts) < 3 or parts[0] != 'tests' or parts[1] == profile_namespace
+
+
+def get_command_module_package(module):
+    """ Returns the package of the command module a module belongs to, or None. """
+    parts = module.split('.')
+    if module.startswith(COMMAND_MODULES_PACKAGE + '.') and len(parts) > 3:
+        return '.'.join(parts[:4])
+    return None
+
+
+def parse_imports(path, module):
+    """ Returns the absolute names a file imports, anywhere in the file, including those of `from x import y`.
+
+    Names imported from a module may be modules themselves, so both `x` and `x.y` are returned for them.
+    """
+    try:
+        with open(path, 'rb') as f:
+            tree = ast.parse(f.read(), filename=path)
+    except (OSError, SyntaxError, ValueError) as ex:
+        logger.info('    %s', ex)
+        return []
+
+    package = module if os.path.basename(path) == '__init__.py' else module.rpartition('.')[0]
+    imports = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            imports.update(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            base = _resolve_import_from(package, node.level, node.module)
+            if base is None:
+                continue
+            imports.add(base)
+            imports.update('{}.{}'.format(base, alias.name) for alias in node.names if alias.name != '*')
+    return sorted(imports)
+
+
+def _resolve_import_from(package, level, name):
+    if not level:
+        return name
+    parts = package.split('.') if package else []
+    if level - 1 >= len(parts):
+        # beyond the top level package
+        return None
+    parts = parts[:len(parts) - (level - 1)]
+    if name:
+        parts.append(name)
+    return '.'.join(parts)
+
+
+def _parse_imports_task(task):
+    return parse_imports(*task)
+
+
+def find_source_files(repo_path):
+    """ Returns the paths relative to the repo of the Python files of all packages under `src/`. """
+    src_path = os.path.join(repo_path, 'src')
+    paths = []
+    for root, dirs, files in os.walk(src_path):
+        dirs[:] = sorted(d for d in dirs if d not in _SKIPPED_DIRS and not d.startswith('.'))
+        for f in sorted(files):
+            if f.endswith('.py'):
+                path = os.path.relpath(os.path.join(root, f), repo_path).replace(os.sep, '/')
+                if get_module_name(path):
+                    paths.append(path)
+    return paths
+
+
+class ImportGraph:
+    """ Which modules of the CLI import which, from the files it was built with. """
+
+    def __init__(self, files):
+        """
+        :param files: dict of a file path relative to the repo to the names it imports, see `parse_imports`.
+        """
+        # module -> path
+        self.paths = {}
+        for path in files:
+            self.paths[get_module_name(path)] = path
+        # module -> modules that import it, directly or by importing one of its submodules
+        self.importers = {}
+        for path, imports in files.items():
+            module = get_module_name(path)
+            for name in imports:
+                for imported in self._resolve(name):
+                    if imported != module:
+                        self.importers.setdefault(imported, set()).add(module)
+        # command module package -> its test files
+        self.module_tests = {}
+        for module in self.paths:
+            package = get_command_module_package(module)
+            if package and is_test_file(module):
+                self.module_tests.setdefault(package, []).append(module)
+
+    def _resolve(self, name):
+        """ Yields the modules that importing a name runs, i.e. the name and all the packages it is in. """
+        parts = name.split('.')
+        for i in range(1, len(parts) + 1):
+            prefix = '.'.join(parts[:i])
+            if prefix in self.paths:
+                yield prefix
+
+    def get_impacted_tests(self, modules):
+        """ Returns the paths relative to the repo of the test files that depend on any of the given modules. """
+        seen = set(modules)
+        queue = deque(modules)
+        while queue:
+            module = queue.popleft()
+            dependents = set(self.importers.get(module, ()))
+            package = get_command_module_package(module)
+            if package and not is_test_module(module):
+                dependents.update(self.module_tests.get(package, ()))
+            for dependent in dependents - seen:
+                seen.add(dependent)
+                queue.append(dependent)
+        return sorted(self.paths[module] for module in seen if module in self.paths and is_test_file(module))
+
+
+def build_import_graph(repo_path, jobs=None):
+    """ Returns the ImportGraph of the CLI repo's working tree.
+
+    Files are parsed in a process pool and their imports are cached by (path, mtime, size), so only the files that
+    changed since the last build are parsed again.
+    """
+    cache = FileCache(os.path.join(get_azdev_config_dir(), 'test_index', IMPACT_CACHE_FILE), IMPACT_CACHE_VERSION)
+    files = {}
+    tasks = []
+    for path in find_source_files(repo_path):
+        full_path = os.path.join(repo_path, path)
+        stamp = get_file_stamp(full_path)
+        if stamp is None:
+            continue
+        files[path] = cache.get(os.path.abspath(full_path), stamp)
+        if files[path] is None:
+            tasks.append((full_path, get_module_name(path), path, stamp))
+
+    jobs = jobs or os.cpu_count() or 1
+    parse_tasks = [(full_path, module) for full_path, module, _, _ in tasks]
+    if jobs > 1 and len(tasks) >= _MIN_POOL_FILES:
+        logger.info('Parsing the imports of %i files in %i processes', len(tasks), jobs)
+        with multiprocessing.Pool(jobs) as pool:
+            parsed = pool.map(_parse_imports_task, parse_tasks, chunksize=16)
+    else:
+        parsed = [parse_imports(*task) for task in parse_tasks]
+    for (full_path, _, path, stamp), imports in zip(tasks, parsed):
+        files[path] = imports
+        cache.set(os.path.abspath(full_path), stamp, imports)
+    cache.save()
+    return ImportGraph(files)
+
+
+def select_impacted_tests(repo_path, modified_files, profile_namespace='latest', jobs=None):
+    """ Maps the files changed in the CLI repo to the tests to run.
+
+    :param modified_files: paths relative to the repo.
+    :param profile_namespace: the directory of the tests of the profile to run, see `get_profile_namespace`.
+    :returns: (test file paths, names of modules to test in full), or None if all tests need to run.
+    """
+    graph = build_import_graph(repo_path, jobs=jobs)
+    changed_modules = set()
+    test_files = set()
+    fallback_mods = set()
+    for path in modified_files:
+        module = get_module_name(path)
+        if module in graph.paths:
+            changed_modules.add(module)
+            continue
+        recorded_tests = _find_recorded_tests(repo_path, path)
+        if recorded_tests:
+            test_files.update(recorded_tests)
+            continue
+        # the graph can't tell what depends on it
+        try:
+            mod_name = extract_module_name(path)
+        except CLIError:
+            # some files aren't part of a module
+            continue
+        if mod_name in ('core', 'testsdk', 'telemetry'):
+            logger.info('Unable to tell the tests impacted by %s', path)
+            return None
+        logger.info('Unable to tell the tests impacted by %s, testing module %s', path, mod_name)
+        fallback_mods.add(mod_name)
+
+    test_files.update(graph.get_impacted_tests(changed_modules))
+    test_files = [os.path.join(repo_path, path) for path in sorted(test_files)
+                  if _get_mod_name(path) not in fallback_mods and is_profile_test_file(path, profile_namespace)]
+    return test_files, sorted(fallback_mods)
+
+
+def _find_recorded_tests(repo_path, path):
+    """ Returns the test files that define the test a recording under `tests/<profile>/recordings` was made by. """
+    parts = path.replace('\\', '/').split('/')
+    if len(parts) < 3 or parts[-2] != 'recordings' or not parts[-1].endswith('.yaml'):
+        return []
+    test_name = parts[-1][:-len('.yaml')]
+    test_dir = '/'.join(parts[:-2])
+    full_dir = os.path.join(repo_path, test_dir)
+    try:
+        names = sorted(f for f in os.listdir(full_dir) if f.startswith('test_') and f.endswith('.py'))
+    except OSError:
+        return []
+    test_files = find_tests([os.path.join(full_dir, name) for name in names])
+    return ['{}/{}'.format(test_dir, name) for name in names
+            if any(test_name in tests for tests in test_files.get(os.path.join(full_dir, name), {}).values())]
+
+
+def _get_mod_name(path):
+    try:
+        return extract_module_name(path)
+    except CLIError:
+        return None
@@ -8,6 +8,8 @@ import abc
 from knack.util import CLIError
 
 from azdev.utilities import get_path_table, git_util
+from .impact import select_impacted_tests
+from .profile_context import get_profile_namespace
 
 
 # @wrapt.decorator
@@ -33,7 +35,7 @@ class AzureDevOpsContext(abc.ABC):
         self.git_target = git_target
 
     @abc.abstractmethod
-    def filter(self, test_index):
+    def filter(self, test_index, profile):
         pass
 
 
@@ -55,14 +57,24 @@ class CLIAzureDevOpsContext(AzureDevOpsContext):
         modified_files = git_util.diff_branches(self.git_repo, self.git_source, self.git_target)
         return [f for f in modified_files if f.startswith('src/')]
 
-    def filter(self, test_index):
+    def filter(self, test_index, profile):
         """
         Strategy on Azure CLI pull request verification stage.
 
-        :return: a list of modified packages
+        The test files impacted by the changes are selected from the import graph of the CLI. Changes the graph can't
+        map select the whole module they belong to, or all tests when they are in `core`, `testsdk` or `telemetry`.
+        Command module test files are only selected from the directory of the profile the tests run against.
+
+        :return: a list of test file paths and names of modified packages
         """
 
-        modified_packages = git_util.summarize_changed_mods(self.modified_files)
+        modified_files = self.modified_files
+        selection = select_impacted_tests(self.git_repo, modified_files, get_profile_namespace(profile))
+        if selection is not None:
+            test_files, modified_packages = selection
+            return test_files + modified_packages
+
+        modified_packages = git_util.summarize_changed_mods(modified_files)
 
         if any(core_package in modified_packages for core_package in ['core', 'testsdk', 'telemetry']):
             path_table = get_path_table()
@@ -0,0 +1,110 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+# -----------------------------------------------------------------------------
+
+"""
+Storage of the test index, which maps the names of test modules, files, classes and methods to their paths.
+
+The index of a profile is kept in `<profile>.lookup.bin` under the test index directory and loaded on first use. Next
+to the table of names it holds the names by their last dotted component, so that a name given with leading components
+it was not indexed with is resolved with one lookup.
+
+The tests found in every test file are cached by `discovery.find_tests`, so updating the index only parses the test
+files whose contents changed. The table itself is built again from all of them, since names that conflict between
+modules are only told apart once every module is known.
+"""
+
+import os
+import pickle
+from collections.abc import Mapping
+
+from knack.log import get_logger
+
+logger = get_logger(__name__)
+
+INDEX_VERSION = 2
+LOOKUP_FILE_SUFFIX = '.lookup.bin'
+
+
+def _read_index_file(path):
+    try:
+        with open(path, 'rb') as f:
+            version, data = pickle.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as ex:  # pylint: disable=broad-except
+        logger.warning('Ignoring unreadable test index %s: %s', path, ex)
+        return None
+    return data if version == INDEX_VERSION else None
+
+
+def _write_index_file(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = '{}.{}.tmp'.format(path, os.getpid())
+    with open(tmp_path, 'wb') as f:
+        pickle.dump((INDEX_VERSION, data), f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+
+
+def build_suffix_table(table):
+    """ Returns the names of a table of names by their last dotted component, those with the fewest components first.
+    """
+    suffixes = {}
+    for name in sorted(table, key=lambda name: (name.count('.'), name)):
+        suffixes.setdefault(name.rsplit('.', 1)[-1], []).append(name)
+    return suffixes
+
+
+class TestLookup(Mapping):
+    """ Read-only mapping of test names to paths, loaded from its file on first access. """
+
+    __test__ = False
+
+    def __init__(self, path, table=None):
+        self.path = path
+        self._data = None if table is None else {'table': table, 'suffixes': build_suffix_table(table)}
+        self._loaded = table is not None
+
+    def _load(self):
+        if not self._loaded:
+            self._data = _read_index_file(self.path)
+            self._loaded = True
+        return self._data
+
+    @property
+    def table(self):
+        return (self._load() or {}).get('table', {})
+
+    def exists(self):
+        """ Returns whether the index file exists and can be read by this version of azdev. """
+        return self._load() is not None
+
+    def save(self):
+        _write_index_file(self.path, self._load())
+
+    def __getitem__(self, key):
+        return self.table[key]
+
+    def __iter__(self):
+        return iter(self.table)
+
+    def __len__(self):
+        return len(self.table)
+
+    def find(self, name):
+        """ Returns the path of a test by name, ignoring leading dotted components that aren't needed to find it.
+
+        Shorter suffixes of the name are tried first, e.g. `vm.test_vm_create` finds `test_vm_create` unless that
+        name is ambiguous, in which case it is only indexed as `vm.test_vm_create`.
+
+        :raises KeyError: if no suffix of the name is in the index.
+        """
+        data = self._load() or {}
+        for check_name in data.get('suffixes', {}).get(name.rsplit('.', 1)[-1], []):
+            if check_name == name or name.endswith('.' + check_name):
+                if check_name != name:
+                    logger.info("Test found using just '%s'. The rest of the name was ignored.\n", check_name)
+                return data['table'][check_name]
+        raise KeyError(name)
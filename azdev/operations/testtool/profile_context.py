@@ -4,17 +4,24 @@
 # license information.
 # -----------------------------------------------------------------------------
 
+import configparser
+import functools
+import os
 import traceback
 
 from knack.log import get_logger
 from knack.util import CLIError
 
-from azdev.utilities import call, cmd
+from azdev.utilities import cmd, get_azure_config, get_azure_config_dir
 from azdev.utilities import display
 
 
 logger = get_logger(__name__)
 
+CLOUD_CONFIG_FILE = 'clouds.config'
+DEFAULT_CLOUD_NAME = 'AzureCloud'
+DEFAULT_PROFILE = 'latest'
+
 
 class ProfileContext:
     def __init__(self, profile_name=None):
@@ -26,20 +33,82 @@ class ProfileContext:
         if self.target_profile is None or self.target_profile == self.origin_profile:
             display('The tests are set to run against current profile "{}"'.format(self.origin_profile))
         else:
-            result = cmd('az cloud update --profile {}'.format(self.target_profile),
-                         'Switching to target profile "{}"...'.format(self.target_profile))
-            if result.exit_code != 0:
-                raise CLIError(result.error.output.decode('utf-8'))
+            display('Switching to target profile "{}"...'.format(self.target_profile))
+            set_profile(self.target_profile)
 
     def __exit__(self, exc_type, exc_val, exc_tb):
         if self.target_profile is not None and self.target_profile != self.origin_profile:
             display('Switching back to origin profile "{}"...'.format(self.origin_profile))
-            call('az cloud update --profile {}'.format(self.origin_profile))
+            try:
+                set_profile(self.origin_profile)
+            except CLIError as ex:
+                logger.warning('Unable to switch back to profile "%s": %s', self.origin_profile, ex)
 
         if exc_tb:
             display('')
             traceback.print_exception(exc_type, exc_val, exc_tb)
 
 
+@functools.lru_cache(maxsize=None)
 def current_profile():
-    return cmd('az cloud show --query profile -otsv', show_stderr=False).result
+    """ Returns the API profile of the active cloud, the same as `az cloud show --query profile -otsv`.
+
+    The Azure CLI config files are read directly instead of running `az`, which would load the whole CLI.
+    """
+    cloud_config = _read_cloud_config()
+    return cloud_config.get(_get_active_cloud_name(), 'profile', fallback=DEFAULT_PROFILE)
+
+
+def get_profile_namespace(profile):
+    """ Returns the name of the directory under `tests` with the tests of a profile, e.g. `hybrid_2019_03_01` for
+    `2019-03-01-hybrid`. """
+    profile_split = profile.split('-')
+    return '_'.join([profile_split[-1]] + profile_split[:-1])
+
+
+def set_profile(profile):
+    """ Sets the API profile of the active cloud, the same as `az cloud update --profile PROFILE`. """
+    try:
+        from azure.cli.core.profiles import API_PROFILES
+    except ImportError:
+        # without azure-cli-core the profile can't be validated, so leave it to `az`
+        result = cmd('az cloud update --profile {}'.format(profile))
+        if result.exit_code != 0:
+            raise CLIError(result.error.output.decode('utf-8'))
+    else:
+        if profile not in API_PROFILES:
+            raise CLIError('Profile {} does not exist or is not supported. Supported profiles: {}.'.format(
+                profile, ', '.join(API_PROFILES)))
+        cloud_name = _get_active_cloud_name()
+        cloud_config = _read_cloud_config()
+        if not cloud_config.has_section(cloud_name):
+            cloud_config.add_section(cloud_name)
+        cloud_config.set(cloud_name, 'profile', profile)
+        _write_cloud_config(cloud_config)
+    current_profile.cache_clear()
+
+
+def _get_active_cloud_name():
+    return get_azure_config().get('cloud', 'name', DEFAULT_CLOUD_NAME)
+
+
+def _get_cloud_config_path():
+    return os.path.join(get_azure_config_dir(), CLOUD_CONFIG_FILE)
+
+
+def _read_cloud_config():
+    cloud_config = configparser.ConfigParser()
+    try:
+        cloud_config.read(_get_cloud_config_path())
+    except configparser.Error as ex:
+        raise CLIError('Unable to read {}: {}'.format(_get_cloud_config_path(), ex))
+    return cloud_config
+
+
+def _write_cloud_config(cloud_config):
+    path = _get_cloud_config_path()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = '{}.{}.tmp'.format(path, os.getpid())
+    with open(tmp_path, 'w') as f:
+        cloud_config.write(f)
+    os.replace(tmp_path, path)
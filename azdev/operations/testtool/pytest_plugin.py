@@ -0,0 +1,24 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+# -----------------------------------------------------------------------------
+
+"""
+pytest plugin which reads the test paths to run from a file, one per line, in the order to run them.
+
+Loaded with `-p azdev.operations.testtool.pytest_plugin --test-paths-file PATH` when the list of test files is too
+long for a command line.
+"""
+
+
+def pytest_addoption(parser):
+    parser.addoption('--test-paths-file', help='File with the test paths to run, one per line.')
+
+
+def pytest_load_initial_conftests(early_config, parser, args):  # pylint: disable=unused-argument
+    path = getattr(early_config.known_args_namespace, 'test_paths_file', None)
+    if not path:
+        return
+    with open(path, 'r') as f:
+        args.extend(line.strip() for line in f if line.strip())
@@ -5,13 +5,18 @@
 # -----------------------------------------------------------------------------
 
 import os
+import tempfile
 
 from knack.log import get_logger
 
 from azdev.utilities import call
 
+# longer lists of test paths are passed in a file, since a command line is limited to 32767 characters on Windows and
+# the one argument of `sh -c` to 128 KiB on Linux
+MAX_TEST_PATHS_LENGTH = 16384
 
-def get_test_runner(parallel, log_path, last_failed, no_exit_first, mark):
+
+def get_test_runner(parallel, log_path, last_failed, no_exit_first, mark, daemon=False):
     """Create a pytest execution method"""
     def _run(test_paths, pytest_args):
 
@@ -28,15 +33,36 @@ def get_test_runner(parallel, log_path, last_failed, no_exit_first, mark):
         if mark:
             arguments.append('-m "{}"'.format(mark))
 
-        arguments.extend(test_paths)
+        paths_file = None
+        if daemon or len(' '.join(test_paths)) <= MAX_TEST_PATHS_LENGTH:
+            arguments.extend(test_paths)
+        else:
+            paths_file = _write_test_paths(test_paths)
+            arguments += ['-p', 'azdev.operations.testtool.pytest_plugin',
+                          '--test-paths-file', '"{}"'.format(paths_file)]
         if parallel:
             arguments += ['-n', 'auto']
         if last_failed:
             arguments.append('--lf')
         if pytest_args:
             arguments += pytest_args
+        if daemon:
+            from .daemon import get_daemon_arguments, run_in_daemon
+            arguments = get_daemon_arguments(arguments)
+            logger.info('Running in the test daemon: pytest %s', ' '.join(arguments))
+            return run_in_daemon(arguments, test_paths)
         cmd = 'python -m pytest {}'.format(' '.join(arguments))
         logger.info('Running: %s', cmd)
-        return call(cmd)
+        try:
+            return call(cmd)
+        finally:
+            if paths_file:
+                os.remove(paths_file)
 
     return _run
+
+
+def _write_test_paths(test_paths):
+    with tempfile.NamedTemporaryFile('w', prefix='azdev-test-paths-', suffix='.txt', delete=False) as f:
+        f.write('\n'.join(test_paths) + '\n')
+    return f.name
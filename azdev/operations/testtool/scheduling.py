@@ -0,0 +1,176 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+# -----------------------------------------------------------------------------
+
+"""
+Duration based scheduling of test runs.
+
+The durations of every test are taken from the JUnit XML written by pytest and kept in the test index directory. They
+are used to start the longest tests first when running in parallel, i.e. longest processing time first scheduling.
+
+Shards are split with durations every CI agent has, given with `--durations`, or by name otherwise: the local
+durations differ between agents and change with every run, so agents splitting with them would run some test files
+twice and others not at all.
+"""
+
+import heapq
+import json
+import os
+import re
+from xml.etree import ElementTree
+
+from knack.log import get_logger
+from knack.util import CLIError
+
+logger = get_logger(__name__)
+
+DURATIONS_FILE = 'durations.json'
+DURATIONS_VERSION = 1
+# estimate for test files without any recorded duration, unless other files have one
+DEFAULT_FILE_DURATION = 10.0
+
+_SHARD_PATTERN = re.compile(r'^(\d+)/(\d+)$')
+
+
+def parse_shard(shard):
+    """ Returns (index, count) of a `--shard i/N` value, with 1 <= i <= N. """
+    match = _SHARD_PATTERN.match(shard.strip())
+    if not match or not 1 <= int(match.group(1)) <= int(match.group(2)):
+        raise CLIError('usage error: --shard must be INDEX/COUNT with 1 <= INDEX <= COUNT, e.g. 1/4: {}'.format(shard))
+    return int(match.group(1)), int(match.group(2))
+
+
+class RecordedDurations:
+    """ Durations in seconds of the tests of earlier runs, by the dotted name of their test file, class and name. """
+
+    def __init__(self, path=None):
+        self.path = path
+        # test file module -> {'Class::test': seconds}
+        self.modules = {}
+        self._by_file_name = None
+        if not path:
+            return
+        try:
+            with open(path, 'r') as f:
+                data = json.load(f)
+            if data.get('version') == DURATIONS_VERSION:
+                self.modules = data['modules']
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError, AttributeError) as ex:
+            logger.warning('Ignoring unreadable test durations %s: %s', path, ex)
+
+    def record(self, xml_path):
+        """ Adds the durations in a JUnit XML result file, replacing earlier ones of the same tests. """
+        count = 0
+        for _, element in ElementTree.iterparse(xml_path):
+            if element.tag != 'testcase':
+                continue
+            classname, name, time = element.get('classname'), element.get('name'), element.get('time')
+            skipped = element.find('skipped') is not None
+            element.clear()
+            if not classname or '.' not in classname or not name or time is None or skipped:
+                continue
+            module, class_name = classname.rsplit('.', 1)
+            self.modules.setdefault(module, {})['{}::{}'.format(class_name, name)] = float(time)
+            count += 1
+        self._by_file_name = None
+        return count
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = '{}.{}.tmp'.format(self.path, os.getpid())
+        with open(tmp_path, 'w') as f:
+            json.dump({'version': DURATIONS_VERSION, 'modules': self.modules}, f)
+        os.replace(tmp_path, self.path)
+
+    def estimate(self, test_path):
+        """ Returns the recorded duration of a test file, class or method given as a pytest path, or None. """
+        file_path, _, node = test_path.partition('::')
+        module = self._find_module(file_path)
+        if module is None:
+            return None
+        tests = self.modules[module]
+        if not node:
+            return sum(tests.values())
+        prefix = node + '::'
+        matches = [duration for name, duration in tests.items() if name == node or name.startswith(prefix)]
+        return sum(matches) if matches else None
+
+    def _find_module(self, file_path):
+        if self._by_file_name is None:
+            self._by_file_name = {}
+            for module in self.modules:
+                self._by_file_name.setdefault(module.rsplit('.', 1)[-1], []).append(module)
+        dotted = '.' + os.path.splitext(os.path.normpath(file_path))[0].replace(os.sep, '.')
+        for module in self._by_file_name.get(dotted.rsplit('.', 1)[-1], []):
+            if dotted.endswith('.' + module):
+                return module
+        return None
+
+
+def load_durations(path):
+    """ Returns the durations of a durations file written by azdev, or of the JUnit XML results of a run. """
+    if not os.path.isfile(path):
+        raise CLIError('usage error: --durations file not found: {}'.format(path))
+    if not path.lower().endswith('.xml'):
+        return RecordedDurations(path)
+    durations = RecordedDurations()
+    try:
+        durations.record(path)
+    except ElementTree.ParseError as ex:
+        raise CLIError('Unable to read the test durations in {}: {}'.format(path, ex))
+    return durations
+
+
+def expand_test_paths(test_paths):
+    """ Splits test directories into their test files, so that they can be scheduled one by one. """
+    expanded = []
+    for test_path in test_paths:
+        if '::' in test_path or not os.path.isdir(test_path):
+            expanded.append(test_path)
+            continue
+        for root, dirs, files in os.walk(test_path):
+            dirs.sort()
+            expanded.extend(os.path.join(root, f) for f in sorted(files) if f.startswith('test_') and f.endswith('.py'))
+    # a test given twice would run twice
+    return list(dict.fromkeys(expanded))
+
+
+def estimate_durations(test_paths, durations):
+    """ Returns (test_path, seconds) for every test path, longest first.
+
+    Test paths without a recorded duration are assumed to take as long as the median one that has.
+    """
+    estimates = [(test_path, durations.estimate(test_path)) for test_path in test_paths]
+    known = sorted(estimate for _, estimate in estimates if estimate is not None)
+    default = known[len(known) // 2] if known else DEFAULT_FILE_DURATION
+    estimates = [(test_path, default if estimate is None else estimate) for test_path, estimate in estimates]
+    return sorted(estimates, key=lambda item: (-item[1], item[0]))
+
+
+def partition_tests(estimates, count):
+    """ Splits (test_path, seconds) into `count` lists of similar total duration, longest processing time first.
+
+    The result only depends on the estimates, so every CI agent computes the same split as long as they all estimate
+    with the same durations. Equal estimates split the test paths round robin by name.
+    """
+    shards = [[] for _ in range(count)]
+    heap = [(0.0, idx) for idx in range(count)]
+    for test_path, estimate in sorted(estimates, key=lambda item: (-item[1], item[0])):
+        total, idx = heapq.heappop(heap)
+        shards[idx].append(test_path)
+        heapq.heappush(heap, (total + estimate, idx))
+    return shards
+
+
+def get_shard(test_paths, shard, durations=None):
+    """ Returns the test paths of shard `(index, count)`, split by the given durations or else by name. """
+    shard_index, shard_count = shard
+    if durations is None:
+        estimates = [(test_path, DEFAULT_FILE_DURATION) for test_path in test_paths]
+    else:
+        estimates = estimate_durations(test_paths, durations)
+    return partition_tests(estimates, shard_count)[shard_index - 1]
@@ -0,0 +1,170 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+# -----------------------------------------------------------------------------
+
+import io
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from knack.util import CLIError
+
+import azdev
+from azdev.operations.testtool import daemon
+
+TEST_FILE = """
+import os
+
+import sample_helper
+
+
+def test_environment():
+    assert os.environ.get('SAMPLE_VALUE') == '1'
+
+
+def test_helper():
+    assert sample_helper.VALUE == 1
+
+
+def test_output():
+    print('before\\0after\\0azdev-exit:3\\n')
+"""
+
+AZDEV_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(azdev.__file__)))
+
+
+class TestDaemonArguments(unittest.TestCase):
+
+    def test_get_daemon_arguments(self):
+        arguments = ['-x', '-v', '--forked', '-p no:warnings', '--junit-xml', 'results.xml', '-m "not serial"',
+                     'test_a.py', '-n', 'auto', '--lf']
+        self.assertEqual(daemon.get_daemon_arguments(arguments), [
+            '-x', '-v', '--forked', '-p', 'no:warnings', '--junit-xml', 'results.xml', '-m', 'not serial',
+            'test_a.py', '--lf'])
+
+
+@unittest.skipUnless(hasattr(os, 'fork'), 'the test daemon requires a POSIX system')
+class TestDaemonSocketPath(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        patch = mock.patch.object(daemon, 'get_azdev_config_dir', return_value=self.root)
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def _get_socket_path(self):
+        socket_path = daemon.get_daemon_socket_path()
+        self.addCleanup(shutil.rmtree, os.path.dirname(socket_path), ignore_errors=True)
+        return socket_path
+
+    def test_socket_in_private_directory(self):
+        socket_path = self._get_socket_path()
+        self.assertEqual(os.stat(os.path.dirname(socket_path)).st_mode & 0o777, 0o700)
+        self.assertEqual(self._get_socket_path(), socket_path)
+
+        # a directory that others can write to is replaced
+        os.chmod(os.path.dirname(socket_path), 0o777)
+        new_socket_path = self._get_socket_path()
+        self.assertNotEqual(new_socket_path, socket_path)
+        self.assertEqual(os.stat(os.path.dirname(new_socket_path)).st_mode & 0o777, 0o700)
+
+
+@unittest.skipUnless(hasattr(os, 'fork'), 'the test daemon requires a POSIX system')
+class TestDaemonRuns(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.socket_path = os.path.join(self.root, 'daemon.sock')
+        with open(os.path.join(self.root, 'test_sample.py'), 'w') as f:
+            f.write(TEST_FILE)
+        self._write_helper(1)
+
+        cwd = os.getcwd()
+        os.chdir(self.root)
+        self.addCleanup(os.chdir, cwd)
+        python_path = os.pathsep.join(p for p in [AZDEV_ROOT, os.environ.get('PYTHONPATH')] if p)
+        for patch in [mock.patch.dict(os.environ, {'SAMPLE_VALUE': '1', 'PYTHONPATH': python_path}),
+                      mock.patch.object(daemon, 'get_azdev_config_dir', return_value=self.root)]:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def tearDown(self):
+        daemon.stop_daemon(self.socket_path)
+        self._wait_for_exit()
+        shutil.rmtree(self.root)
+
+    def _wait_for_exit(self):
+        # the daemon removes its socket when exiting
+        for _ in range(50):
+            if not os.path.exists(self.socket_path):
+                break
+            time.sleep(0.1)
+
+    def _write_helper(self, value):
+        path = os.path.join(self.root, 'sample_helper.py')
+        with open(path, 'w') as f:
+            f.write('VALUE = {}\n'.format(value))
+        # make sure the change is seen even within the resolution of the file system's timestamps
+        os.utime(path, ns=(time.time_ns(), time.time_ns() + value * 10 ** 9))
+
+    def _run(self, *test_paths, arguments=()):
+        stdout = io.TextIOWrapper(io.BytesIO())
+        arguments = ['-q', '-p', 'no:cacheprovider'] + list(arguments) + list(test_paths)
+        with mock.patch.object(sys, 'stdout', stdout):
+            exit_code = daemon.run_in_daemon(arguments, list(test_paths), socket_path=self.socket_path)
+        return exit_code, stdout.buffer.getvalue().decode('utf-8')
+
+    def test_run_and_stop(self):
+        exit_code, output = self._run('test_sample.py')
+        self.assertEqual(exit_code, 0, output)
+        self.assertIn('3 passed', output)
+        self.assertTrue(daemon.is_daemon_running(self.socket_path))
+        self.assertEqual(os.stat(self.socket_path).st_mode & 0o777, 0o600)
+
+        with mock.patch.dict(os.environ, {'SAMPLE_VALUE': '2'}):
+            exit_code, output = self._run('test_sample.py::test_environment')
+        self.assertEqual(exit_code, 1, output)
+        self.assertIn('1 failed', output)
+
+        self.assertTrue(daemon.stop_daemon(self.socket_path))
+        self._wait_for_exit()
+        self.assertFalse(daemon.is_daemon_running(self.socket_path))
+        self.assertFalse(daemon.stop_daemon(self.socket_path))
+
+    def test_output_with_markers(self):
+        exit_code, output = self._run('test_sample.py::test_output', arguments=['-s'])
+        self.assertEqual(exit_code, 0, output)
+        self.assertIn('before\0after\0azdev-exit:3\n', output)
+        self.assertIn('1 passed', output)
+
+    def test_refuses_socket_not_private(self):
+        self.assertEqual(self._run('test_sample.py::test_helper')[0], 0)
+        os.chmod(self.root, 0o755)
+        try:
+            with self.assertRaises(CLIError):
+                daemon.run_in_daemon(['test_sample.py'], ['test_sample.py'], socket_path=self.socket_path)
+        finally:
+            os.chmod(self.root, 0o700)
+
+    def test_restart_when_imported_file_changes(self):
+        self.assertEqual(self._run('test_sample.py::test_helper')[0], 0)
+        # the helper imported by the test file is imported by the daemon itself now
+        self._write_helper(2)
+        with mock.patch.object(daemon.logger, 'warning') as warning:
+            exit_code, output = self._run('test_sample.py::test_helper')
+        warning.assert_any_call('The test daemon is out of date, restarting it')
+        self.assertEqual(exit_code, 1, output)
+        self.assertIn('assert 2 == 1', output)
+
+
+if __name__ == '__main__':
+    unittest.main()
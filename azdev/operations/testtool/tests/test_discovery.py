@@ -0,0 +1,141 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+# -----------------------------------------------------------------------------
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+from azdev.operations.testtool import discovery
+
+TEST_FILE = """
+import unittest
+from unittest import TestCase as ImportedTestCase
+
+
+class SampleScenarioTest(unittest.TestCase):
+
+    test_attribute = None
+
+    def setUp(self):
+        pass
+
+    def test_create(self):
+        pass
+
+    async def test_delete(self):
+        pass
+
+    class test_nested:
+        pass
+
+
+class SampleHelper:
+
+    def helper(self):
+        pass
+
+
+class _PrivateTest(unittest.TestCase):
+
+    def test_hidden(self):
+        pass
+
+
+if True:
+    class ConditionalTest(unittest.TestCase):
+
+        def test_conditional(self):
+            pass
+
+
+class RedefinedTest(unittest.TestCase):
+
+    def test_old(self):
+        pass
+
+
+class RedefinedTest(unittest.TestCase):
+
+    def test_new(self):
+        pass
+"""
+
+
+class TestDiscovery(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.path = os.path.join(self.root, 'test_discovery_sample.py')
+        with open(self.path, 'w') as f:
+            f.write(TEST_FILE)
+        patch = mock.patch.object(discovery, 'get_azdev_config_dir', return_value=os.path.join(self.root, 'config'))
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_parse_matches_import(self):
+        sys.path.insert(0, self.root)
+        try:
+            import test_discovery_sample  # pylint: disable=import-error
+        finally:
+            sys.path.remove(self.root)
+            sys.modules.pop('test_discovery_sample', None)
+
+        # what the index was built from when the test files were imported
+        imported = {}
+        for class_name, class_def in test_discovery_sample.__dict__.items():
+            if not class_name.startswith('_') and isinstance(class_def, type) and \
+                    class_def.__module__ == 'test_discovery_sample':
+                tests = [x for x in class_def.__dict__ if x.startswith('test_')]
+                if tests:
+                    imported[class_name] = tests
+
+        self.assertEqual(discovery.parse_test_file(self.path), imported)
+        self.assertEqual(imported['SampleScenarioTest'], ['test_attribute', 'test_create', 'test_delete',
+                                                          'test_nested'])
+
+    def test_syntax_error(self):
+        with open(self.path, 'a') as f:
+            f.write('def broken(:\n')
+        self.assertEqual(discovery.parse_test_file(self.path), {})
+
+    def test_results_are_cached(self):
+        expected = {self.path: discovery.parse_test_file(self.path)}
+        self.assertEqual(discovery.find_tests([self.path], jobs=1), expected)
+        with mock.patch.object(discovery, 'parse_test_file', side_effect=AssertionError('file was parsed again')):
+            self.assertEqual(discovery.find_tests([self.path], jobs=1), expected)
+
+        with open(self.path, 'a') as f:
+            f.write('\n\nclass AddedTest(unittest.TestCase):\n\n    def test_added(self):\n        pass\n')
+        self.assertEqual(discovery.find_tests([self.path], jobs=1)[self.path]['AddedTest'], ['test_added'])
+
+    def test_unchanged_contents_are_not_parsed_again(self):
+        expected = {self.path: discovery.parse_test_file(self.path)}
+        discovery.find_tests([self.path], jobs=1)
+        # a new modification time alone, e.g. from switching git branches, doesn't make a file change
+        os.utime(self.path, (0, 0))
+        with mock.patch.object(discovery, 'parse_test_file', side_effect=AssertionError('file was parsed again')):
+            self.assertEqual(discovery.find_tests([self.path], jobs=1), expected)
+            with mock.patch.object(discovery, 'get_file_digest', side_effect=AssertionError('file was hashed')):
+                self.assertEqual(discovery.find_tests([self.path], jobs=1), expected)
+
+    def test_parallel_matches_serial(self):
+        paths = []
+        for i in range(discovery._MIN_POOL_FILES):  # pylint: disable=protected-access
+            path = os.path.join(self.root, 'test_{}.py'.format(i))
+            shutil.copy(self.path, path)
+            paths.append(path)
+        parallel = discovery.find_tests(paths, jobs=2)
+        self.assertEqual(parallel, {path: discovery.parse_test_file(path) for path in paths})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,155 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+# -----------------------------------------------------------------------------
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from azdev.operations.testtool import discovery, impact
+
+CORE = 'src/azure-cli-core/azure/cli/core'
+TESTSDK = 'src/azure-cli-testsdk/azure/cli/testsdk'
+MODULES = 'src/azure-cli/azure/cli/command_modules'
+
+FILES = {
+    CORE + '/__init__.py': '',
+    CORE + '/util.py': 'import json\n',
+    CORE + '/extension/__init__.py': 'from ..util import get_file_json\n',
+    CORE + '/tests/__init__.py': '',
+    CORE + '/tests/test_util.py': 'from azure.cli.core.util import get_file_json\n',
+    CORE + '/tests/test_extension.py': 'from azure.cli.core.extension import get_extensions\n',
+    TESTSDK + '/__init__.py': 'from .base import ScenarioTest\n',
+    TESTSDK + '/base.py': 'import unittest\n',
+    MODULES + '/vm/__init__.py': '',
+    MODULES + '/vm/custom.py': 'def f():\n    from azure.cli.core.extension import get_extensions\n',
+    MODULES + '/vm/tests/__init__.py': '',
+    MODULES + '/vm/tests/latest/__init__.py': '',
+    MODULES + '/vm/tests/latest/_helpers.py': '',
+    MODULES + '/vm/tests/latest/test_vm.py':
+        'from azure.cli.testsdk import ScenarioTest\nfrom ._helpers import *\n\n\n'
+        'class VMTest(ScenarioTest):\n\n    def test_vm_create(self):\n        pass\n',
+    MODULES + '/vm/tests/latest/test_disk.py':
+        'from azure.cli.testsdk import ScenarioTest\n\n\n'
+        'class DiskTest(ScenarioTest):\n\n    def test_disk_create(self):\n        pass\n',
+    MODULES + '/vm/tests/hybrid_2019_03_01/__init__.py': '',
+    MODULES + '/vm/tests/hybrid_2019_03_01/test_vm_commands.py':
+        'from azure.cli.testsdk import ScenarioTest\n\n\n'
+        'class VMTest(ScenarioTest):\n\n    def test_vm_create(self):\n        pass\n',
+    MODULES + '/network/__init__.py': '',
+    MODULES + '/network/custom.py': 'from azure.cli.command_modules.vm.custom import f\n',
+    MODULES + '/network/tests/__init__.py': '',
+    MODULES + '/network/tests/latest/__init__.py': '',
+    MODULES + '/network/tests/latest/test_network.py': 'from azure.cli.testsdk import ScenarioTest\n',
+    MODULES + '/storage/__init__.py': '',
+    MODULES + '/storage/tests/__init__.py': '',
+    MODULES + '/storage/tests/latest/__init__.py': '',
+    MODULES + '/storage/tests/latest/test_storage.py': 'import unittest\n',
+}
+
+
+class TestImpact(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        for path, content in FILES.items():
+            full_path = os.path.join(self.root, path)
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            with open(full_path, 'w') as f:
+                f.write(content)
+        for module in (impact, discovery):
+            patch = mock.patch.object(module, 'get_azdev_config_dir', return_value=os.path.join(self.root, 'config'))
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def _select(self, *modified_files, profile_namespace='latest'):
+        selection = impact.select_impacted_tests(self.root, list(modified_files), profile_namespace, jobs=1)
+        if selection is None:
+            return None
+        test_files, fallback_mods = selection
+        return [os.path.relpath(path, self.root).replace(os.sep, '/') for path in test_files], fallback_mods
+
+    def test_get_module_name(self):
+        self.assertEqual(impact.get_module_name(CORE + '/util.py'), 'azure.cli.core.util')
+        self.assertEqual(impact.get_module_name(CORE + '/extension/__init__.py'), 'azure.cli.core.extension')
+        self.assertIsNone(impact.get_module_name('src/azure-cli/setup.py'))
+        self.assertIsNone(impact.get_module_name(CORE + '/commands/parameters.json'))
+
+    def test_parse_imports(self):
+        path = os.path.join(self.root, MODULES, 'vm', 'tests', 'latest', 'test_vm.py')
+        module = 'azure.cli.command_modules.vm.tests.latest.test_vm'
+        self.assertEqual(impact.parse_imports(path, module), ['azure.cli.command_modules.vm.tests.latest._helpers',
+                                                              'azure.cli.testsdk', 'azure.cli.testsdk.ScenarioTest'])
+        path = os.path.join(self.root, CORE, 'extension', '__init__.py')
+        self.assertEqual(impact.parse_imports(path, 'azure.cli.core.extension'),
+                         ['azure.cli.core.util', 'azure.cli.core.util.get_file_json'])
+
+    def test_core_change_selects_importing_tests(self):
+        # test_util imports util directly, test_extension and vm through extension
+        self.assertEqual(self._select(CORE + '/util.py'), ([
+            CORE + '/tests/test_extension.py',
+            CORE + '/tests/test_util.py',
+            MODULES + '/network/tests/latest/test_network.py',
+            MODULES + '/vm/tests/latest/test_disk.py',
+            MODULES + '/vm/tests/latest/test_vm.py',
+        ], []))
+
+    def test_module_change_selects_its_tests_and_dependents(self):
+        self.assertEqual(self._select(MODULES + '/vm/custom.py'), ([
+            MODULES + '/network/tests/latest/test_network.py',
+            MODULES + '/vm/tests/latest/test_disk.py',
+            MODULES + '/vm/tests/latest/test_vm.py',
+        ], []))
+
+    def test_test_change_selects_test_files(self):
+        self.assertEqual(self._select(MODULES + '/vm/tests/latest/test_disk.py'),
+                         ([MODULES + '/vm/tests/latest/test_disk.py'], []))
+        self.assertEqual(self._select(MODULES + '/vm/tests/latest/_helpers.py'),
+                         ([MODULES + '/vm/tests/latest/test_vm.py'], []))
+
+    def test_recording_selects_its_test_file(self):
+        self.assertEqual(self._select(MODULES + '/vm/tests/latest/recordings/test_vm_create.yaml'),
+                         ([MODULES + '/vm/tests/latest/test_vm.py'], []))
+
+    def test_only_tests_of_the_profile_are_selected(self):
+        hybrid_vm = MODULES + '/vm/tests/hybrid_2019_03_01/test_vm_commands.py'
+        self.assertEqual(self._select(MODULES + '/vm/custom.py', profile_namespace='hybrid_2019_03_01'),
+                         ([hybrid_vm], []))
+        self.assertEqual(self._select(CORE + '/util.py', profile_namespace='hybrid_2019_03_01'), ([
+            CORE + '/tests/test_extension.py',
+            CORE + '/tests/test_util.py',
+            hybrid_vm,
+        ], []))
+        # the recordings of another profile can't be played back against this one
+        self.assertEqual(self._select(MODULES + '/vm/tests/hybrid_2019_03_01/recordings/test_vm_create.yaml'),
+                         ([], []))
+        self.assertEqual(self._select(MODULES + '/vm/tests/latest/recordings/test_vm_create.yaml',
+                                      profile_namespace='hybrid_2019_03_01'), ([], []))
+
+    def test_unmapped_changes_fall_back(self):
+        # data files and files missing from the working tree select the whole module
+        self.assertEqual(self._select(MODULES + '/storage/linter_exclusions.yml',
+                                      MODULES + '/storage/tests/latest/test_storage.py',
+                                      MODULES + '/vm/tests/latest/recordings/test_removed.yaml',
+                                      MODULES + '/network/tests/latest/test_network.py'),
+                         ([MODULES + '/network/tests/latest/test_network.py'], ['storage', 'vm']))
+        self.assertIsNone(self._select(CORE + '/removed.py'))
+        self.assertIsNone(self._select(TESTSDK + '/recording_processors.json'))
+        # files outside of any module have no tests
+        self.assertEqual(self._select('src/azure-cli/HISTORY.rst'), ([], []))
+
+    def test_imports_are_cached(self):
+        expected = impact.build_import_graph(self.root, jobs=1).importers
+        with mock.patch.object(impact, 'parse_imports', side_effect=AssertionError('file was parsed again')):
+            self.assertEqual(impact.build_import_graph(self.root, jobs=1).importers, expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
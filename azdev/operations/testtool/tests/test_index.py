@@ -0,0 +1,85 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+# -----------------------------------------------------------------------------
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from azdev.operations import testtool
+from azdev.operations.testtool import index
+
+
+class TestTestLookup(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.path = os.path.join(self.root, 'latest.lookup.bin')
+        index.TestLookup(self.path, {
+            'test_vm_create': '/vm/test_vm.py::VMTest::test_vm_create',
+            'vm.test_create': '/vm/test_vm.py::VMTest::test_create',
+            'disk.test_create': '/disk/test_disk.py::DiskTest::test_create',
+            'vm': '/vm',
+        }).save()
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_loaded_on_first_access(self):
+        lookup = index.TestLookup(self.path)
+        self.assertIsNone(lookup._data)  # pylint: disable=protected-access
+        self.assertEqual(lookup['vm'], '/vm')
+        self.assertTrue(lookup.exists())
+        self.assertEqual(len(lookup), 4)
+        self.assertIsNone(lookup.get('missing'))
+        self.assertFalse(index.TestLookup(os.path.join(self.root, 'missing.lookup.bin')).exists())
+
+    def test_suffix_table(self):
+        self.assertEqual(index.build_suffix_table(index.TestLookup(self.path).table), {
+            'test_vm_create': ['test_vm_create'],
+            'test_create': ['disk.test_create', 'vm.test_create'],
+            'vm': ['vm'],
+        })
+
+    def test_unreadable_or_outdated(self):
+        with open(self.path, 'wb') as f:
+            f.write(b'corrupt')
+        lookup = index.TestLookup(self.path)
+        self.assertFalse(lookup.exists())
+        self.assertEqual(len(lookup), 0)
+
+        with mock.patch.object(index, 'INDEX_VERSION', index.INDEX_VERSION + 1):
+            index.TestLookup(self.path, {'vm': '/vm'}).save()
+        self.assertFalse(index.TestLookup(self.path).exists())
+
+    def test_unreadable_index_is_rebuilt(self):
+        path = os.path.join(self.root, 'test_index', 'latest.lookup.bin')
+        os.makedirs(os.path.dirname(path))
+        with open(path, 'wb') as f:
+            f.write(b'corrupt')
+        with mock.patch.object(testtool, 'get_azdev_config_dir', return_value=self.root), \
+                mock.patch.object(testtool, 'make_dirs'), \
+                mock.patch.object(testtool, 'display'), \
+                mock.patch.object(testtool, '_discover_tests', return_value={'vm': '/vm'}) as discover:
+            test_index = testtool._get_test_index('latest', discover=False)  # pylint: disable=protected-access
+        discover.assert_called_once_with('latest')
+        self.assertEqual(test_index.find('vm'), '/vm')
+        self.assertEqual(index.TestLookup(path).find('vm'), '/vm')
+
+    def test_find(self):
+        lookup = index.TestLookup(self.path)
+        self.assertEqual(lookup.find('vm'), '/vm')
+        # leading components are ignored unless needed to tell tests apart
+        self.assertEqual(lookup.find('azure.cli.vm.test_vm_create'), '/vm/test_vm.py::VMTest::test_vm_create')
+        self.assertEqual(lookup.find('disk.test_create'), '/disk/test_disk.py::DiskTest::test_create')
+        self.assertEqual(lookup.find('cli.vm.test_create'), '/vm/test_vm.py::VMTest::test_create')
+        with self.assertRaises(KeyError):
+            lookup.find('test_create')
+
+
+if __name__ == '__main__':
+    unittest.main()
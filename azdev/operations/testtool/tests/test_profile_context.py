@@ -4,11 +4,23 @@
 # license information.
 # -----------------------------------------------------------------------------
 
+import os
+import shutil
+import tempfile
 import unittest
+from unittest import mock
 
 from knack.util import CLIError
 
-from azdev.operations.testtool.profile_context import ProfileContext
+from azdev.operations.testtool import profile_context
+from azdev.operations.testtool.profile_context import (
+    ProfileContext, current_profile, get_profile_namespace, set_profile)
+
+try:
+    import azure.cli.core  # pylint: disable=unused-import
+    HAS_CLI_CORE = True
+except ImportError:
+    HAS_CLI_CORE = False
 
 
 class TestProfileContext(unittest.TestCase):
@@ -31,3 +43,64 @@ class TestProfileContext(unittest.TestCase):
         with self.assertRaises(Exception):
             with ProfileContext('latest'):
                 raise Exception('inner Exception')
+
+    def test_profile_namespace(self):
+        self.assertEqual(get_profile_namespace('latest'), 'latest')
+        self.assertEqual(get_profile_namespace('2019-03-01-hybrid'), 'hybrid_2019_03_01')
+
+
+class TestCurrentProfile(unittest.TestCase):
+
+    def setUp(self):
+        self.config_dir = tempfile.mkdtemp()
+        patch = mock.patch.dict(os.environ, {'AZURE_CONFIG_DIR': self.config_dir})
+        patch.start()
+        self.addCleanup(patch.stop)
+        os.environ.pop('AZURE_CLOUD_NAME', None)
+        current_profile.cache_clear()
+        self.addCleanup(current_profile.cache_clear)
+
+    def tearDown(self):
+        shutil.rmtree(self.config_dir)
+
+    def _write(self, file_name, content):
+        with open(os.path.join(self.config_dir, file_name), 'w') as f:
+            f.write(content)
+
+    def test_defaults(self):
+        self.assertEqual(current_profile(), 'latest')
+
+    def test_profile_of_active_cloud(self):
+        self._write('clouds.config', '[AzureCloud]\nprofile = 2019-03-01-hybrid\n\n'
+                                     '[AzureStack]\nprofile = 2018-03-01-hybrid\n')
+        self.assertEqual(current_profile(), '2019-03-01-hybrid')
+
+        current_profile.cache_clear()
+        self._write('config', '[cloud]\nname = AzureStack\n')
+        self.assertEqual(current_profile(), '2018-03-01-hybrid')
+
+        current_profile.cache_clear()
+        with mock.patch.dict(os.environ, {'AZURE_CLOUD_NAME': 'AzureChinaCloud'}):
+            self.assertEqual(current_profile(), 'latest')
+
+    def test_memoised(self):
+        self.assertEqual(current_profile(), 'latest')
+        self._write('clouds.config', '[AzureCloud]\nprofile = 2019-03-01-hybrid\n')
+        with mock.patch.object(profile_context, '_read_cloud_config', side_effect=AssertionError('read again')):
+            self.assertEqual(current_profile(), 'latest')
+
+    @unittest.skipUnless(HAS_CLI_CORE, 'azure-cli-core is not installed')
+    def test_set_profile(self):
+        self._write('clouds.config', '[AzureCloud]\nmanagement = https://example.com/\n')
+        self.assertEqual(current_profile(), 'latest')
+        set_profile('2019-03-01-hybrid')
+        self.assertEqual(current_profile(), '2019-03-01-hybrid')
+        with open(os.path.join(self.config_dir, 'clouds.config')) as f:
+            self.assertIn('management = https://example.com/', f.read())
+        with self.assertRaises(CLIError):
+            set_profile('unknown-profile')
+        self.assertEqual(current_profile(), '2019-03-01-hybrid')
+
+
+if __name__ == '__main__':
+    unittest.main()
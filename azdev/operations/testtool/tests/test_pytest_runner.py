@@ -0,0 +1,82 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+# -----------------------------------------------------------------------------
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+import azdev
+from azdev.operations.testtool import pytest_runner
+
+AZDEV_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(azdev.__file__)))
+
+
+class TestPytestRunner(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.test_paths = []
+        for name in ['test_b.py', 'test_a.py']:
+            path = os.path.join(self.root, name)
+            with open(path, 'w') as f:
+                f.write('def {}():\n    pass\n'.format(os.path.splitext(name)[0]))
+            self.test_paths.append(path)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def _run(self, max_length):
+        commands = []
+
+        def _call(command):
+            commands.append(command)
+            paths_file = command.partition('--test-paths-file "')[2].partition('"')[0]
+            if paths_file:
+                with open(paths_file, 'r') as f:
+                    commands.append((paths_file, f.read().split()))
+            return 0
+
+        runner = pytest_runner.get_test_runner(parallel=True, log_path='results.xml', last_failed=False,
+                                               no_exit_first=False, mark=None)
+        with mock.patch.object(pytest_runner, 'MAX_TEST_PATHS_LENGTH', max_length), \
+                mock.patch.object(pytest_runner, 'call', side_effect=_call):
+            self.assertEqual(runner(test_paths=self.test_paths, pytest_args=None), 0)
+        return commands
+
+    def test_short_test_paths_on_command_line(self):
+        commands = self._run(max_length=16384)
+        self.assertEqual(len(commands), 1)
+        self.assertIn(' '.join(self.test_paths) + ' -n auto', commands[0])
+        self.assertNotIn('--test-paths-file', commands[0])
+
+    def test_long_test_paths_in_file(self):
+        commands = self._run(max_length=10)
+        self.assertNotIn(self.test_paths[0], commands[0])
+        self.assertIn('-p azdev.operations.testtool.pytest_plugin --test-paths-file', commands[0])
+        paths_file, test_paths = commands[1]
+        self.assertEqual(test_paths, self.test_paths)
+        # the file is removed once the run is over
+        self.assertFalse(os.path.exists(paths_file))
+
+    def test_plugin_runs_test_paths_in_order(self):
+        paths_file = os.path.join(self.root, 'paths.txt')
+        with open(paths_file, 'w') as f:
+            f.write('\n'.join(self.test_paths) + '\n')
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(p for p in [AZDEV_ROOT, os.environ.get('PYTHONPATH')] if p))
+        result = subprocess.run([sys.executable, '-m', 'pytest', '-v', '-p', 'no:cacheprovider',
+                                 '-p', 'azdev.operations.testtool.pytest_plugin', '--test-paths-file', paths_file],
+                                cwd=self.root, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, check=False)
+        output = result.stdout.decode('utf-8')
+        self.assertEqual(result.returncode, 0, output)
+        self.assertLess(output.index('test_b.py::test_b PASSED'), output.index('test_a.py::test_a PASSED'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+# -----------------------------------------------------------------------------
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from knack.util import CLIError
+
+from azdev.operations.testtool.scheduling import (
+    RecordedDurations, estimate_durations, expand_test_paths, get_shard, load_durations, parse_shard, partition_tests)
+
+JUNIT_XML = """<?xml version="1.0" encoding="utf-8"?>
+<testsuites><testsuite name="pytest" tests="4">
+<testcase classname="azure.cli.command_modules.vm.tests.latest.test_vm.VMTest" name="test_create" time="30.5" />
+<testcase classname="azure.cli.command_modules.vm.tests.latest.test_vm.VMTest" name="test_delete" time="10" />
+<testcase classname="azure.cli.command_modules.vm.tests.latest.test_vm.DiskTest" name="test_disk" time="5" />
+<testcase classname="azure.cli.command_modules.vm.tests.latest.test_vm.DiskTest" name="test_skip" time="0">
+<skipped message="skipped" /></testcase>
+<testcase classname="azure.cli.command_modules.network.tests.latest.test_nic.NicTest" name="test_nic" time="2" />
+</testsuite></testsuites>
+"""
+
+
+class TestScheduling(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.vm_tests = os.path.join(self.root, 'azure', 'cli', 'command_modules', 'vm', 'tests', 'latest')
+        os.makedirs(self.vm_tests)
+        for name in ['test_vm.py', 'test_image.py', 'helper.py']:
+            with open(os.path.join(self.vm_tests, name), 'w') as f:
+                f.write('\n')
+        self.xml_path = os.path.join(self.root, 'test_results.xml')
+        with open(self.xml_path, 'w') as f:
+            f.write(JUNIT_XML)
+        self.durations = RecordedDurations(os.path.join(self.root, 'index', 'durations.json'))
+        self.assertEqual(self.durations.record(self.xml_path), 4)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_durations_are_saved(self):
+        self.durations.save()
+        durations = RecordedDurations(self.durations.path)
+        vm_file = os.path.join(self.vm_tests, 'test_vm.py')
+        self.assertEqual(durations.estimate(vm_file), 45.5)
+        self.assertEqual(durations.estimate(vm_file + '::VMTest'), 40.5)
+        self.assertEqual(durations.estimate(vm_file + '::DiskTest::test_disk'), 5)
+        self.assertIsNone(durations.estimate(vm_file + '::DiskTest::test_skip'))
+        self.assertIsNone(durations.estimate(os.path.join(self.vm_tests, 'test_image.py')))
+        self.assertIsNone(durations.estimate(os.path.join(self.root, 'other', 'test_vm.py')))
+
+    def test_estimates(self):
+        test_paths = expand_test_paths([self.vm_tests, os.path.join(self.vm_tests, 'test_vm.py::VMTest')])
+        self.assertEqual([os.path.basename(path) for path in test_paths],
+                         ['test_image.py', 'test_vm.py', 'test_vm.py::VMTest'])
+        estimates = estimate_durations(test_paths, self.durations)
+        self.assertEqual([(os.path.basename(path), estimate) for path, estimate in estimates],
+                         [('test_image.py', 45.5), ('test_vm.py', 45.5), ('test_vm.py::VMTest', 40.5)])
+
+    def test_partition(self):
+        estimates = [('a', 8), ('b', 7), ('c', 6), ('d', 5), ('e', 4), ('f', 1)]
+        self.assertEqual(partition_tests(estimates, 2), [['a', 'd', 'e'], ['b', 'c', 'f']])
+        self.assertEqual(partition_tests(estimates, 4), [['a'], ['b'], ['c', 'f'], ['d', 'e']])
+        self.assertEqual(partition_tests(estimates[:1], 2), [['a'], []])
+
+    def test_shards(self):
+        modules_dir = os.path.join(self.root, 'azure', 'cli', 'command_modules')
+        nic_file = os.path.join(modules_dir, 'network', 'tests', 'latest', 'test_nic.py')
+        vm_file, image_file = [os.path.join(self.vm_tests, name) for name in ['test_vm.py', 'test_image.py']]
+        test_paths = [vm_file, image_file, nic_file]
+        # without durations every agent splits by name, whatever durations it recorded
+        self.assertEqual([get_shard(test_paths, (idx, 2)) for idx in (1, 2)], [[nic_file, vm_file], [image_file]])
+
+        self.durations.save()
+        for path in [self.xml_path, self.durations.path]:
+            durations = load_durations(path)
+            self.assertEqual(durations.estimate(vm_file), 45.5)
+            self.assertEqual([get_shard(test_paths, (idx, 2), durations) for idx in (1, 2)],
+                             [[image_file, nic_file], [vm_file]])
+        with self.assertRaises(CLIError):
+            load_durations(os.path.join(self.root, 'missing.xml'))
+
+    def test_parse_shard(self):
+        self.assertEqual(parse_shard('2/4'), (2, 4))
+        for shard in ['0/4', '5/4', '1', 'a/b']:
+            with self.assertRaises(CLIError):
+                parse_shard(shard)
+
+
+if __name__ == '__main__':
+    unittest.main()
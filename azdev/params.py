@@ -55,6 +55,12 @@ def load_arguments(self, _):
         c.argument('last_failed', options_list='--lf', action='store_true', help='Re-run the last tests that failed.')
         c.argument('no_exit_first', options_list='--no-exitfirst', action='store_true', help='Do not exit on first error or failed test')
         c.argument('mark', help='Select tests with this mark. You can add @pytest.mark.custom_mark to a test')
+        c.argument('daemon', action='store_true', help='Run the tests in a background process with pytest, the CLI core, the testsdk and SDKs imported already, started if needed. '
+                                                       'Tests run in series. Stop it with `azdev test-daemon stop`. Not supported on Windows.')
+        c.argument('shard', help='Run only part INDEX/COUNT of the selected tests, e.g. 2/4. The test files are split into '
+                                 'COUNT parts of similar duration with --durations, or by name without it.')
+        c.argument('durations_path', options_list='--durations', help='With --shard, path of the test durations to split the test files by, the same on every CI agent: '
+                                                                      'the JUnit XML results of an earlier run or the `test_index/durations.json` file of your `.azdev` directory.')
 
         # CI parameters
         c.argument('cli_ci',
@@ -98,6 +104,8 @@ def load_arguments(self, _):
                         'For example, specifying "medium" runs linter rules that have "high" or "medium" severity. '
                         'However, specifying "low" runs the linter on every rule, regardless of severity. '
                         'Defaults to "high".')
+        c.argument('jobs', options_list=['--jobs', '-j'], type=int,
+                   help='Number of processes to run the linter rules in. Use 0 for one process per CPU. Defaults to 1.')
     # endregion
 
     # region statistics
@@ -138,9 +146,46 @@ def load_arguments(self, _):
     with ArgumentsContext(self, 'perf') as c:
         c.argument('runs', type=int, help='Number of runs to average performance over.')
 
+    with ArgumentsContext(self, 'perf load-times') as c:
+        c.argument('import_time', action='store_true',
+                   help='Profile the imports of `az -h` with `python -X importtime` instead of the module load times '
+                        'logged by the CLI.')
+        c.argument('output_dir', help='Directory to write the import tree (import_time.json) and the flame graph '
+                                      'input (import_time.collapsed) to with --import-time. Defaults to the current '
+                                      'directory.')
+        c.argument('max_runs', type=int,
+                   help='Number of runs to stop at while the comparison with the baseline of earlier runs is '
+                        'inconclusive. Defaults to 4 times --runs. The load times are compared after 3 runs, after '
+                        '--runs and after every further --runs, and the check stops at the first conclusive one.')
+        c.argument('no_baseline', action='store_true',
+                   help='Neither compare with nor add to the baseline of earlier runs.')
+        c.argument('update_baseline', action='store_true',
+                   help='Add the load times to the baseline even if the check fails, e.g. to accept a deliberate '
+                        'slowdown. Modules slower than their baseline start a new baseline with these load times.')
+
     with ArgumentsContext(self, 'perf benchmark') as c:
         c.positional('commands', nargs="*", help="Command prefix to run benchmark. Omit to check all commands with --help.")
         c.argument('top', type=int, help='Show N slowest commands. 0 for all.')
+        c.argument('jobs', options_list=['--jobs', '-j'], type=int,
+                   help='Number of commands to run at the same time, each pinned to a CPU of its own. '
+                        'Use 0 for half of the CPUs, which is the default.')
+        c.argument('profile', action='store_true',
+                   help='Run the commands under cProfile and show their hot functions, split into CLI core, command '
+                        'module and other code. The profiles of all runs of a command are merged into '
+                        '<command>.pstats. Timings include the profiler overhead.')
+        c.argument('hotspots', type=int,
+                   help='Number of hot functions to show per command and category with --profile.')
+        c.argument('output_dir', help='Directory to write the .pstats files to with --profile. '
+                                      'Defaults to the current directory.')
+        c.argument('save', help='Name to save the results under for `azdev perf compare`.')
+
+    with ArgumentsContext(self, 'perf compare') as c:
+        c.positional('benchmarks', nargs=2, metavar='BENCHMARK',
+                     help='Baseline and candidate benchmark, each the name it was saved under or the path of a '
+                          'benchmark JSON file.')
+        c.argument('threshold', type=float,
+                   help='Percentage by which the median of a command may grow before it counts as a regression, if '
+                        'significant.')
 
     with ArgumentsContext(self, 'extension') as c:
         c.argument('dist_dir', help='Name of a directory in which to save the resulting WHL files.')
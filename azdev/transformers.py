@@ -11,6 +11,19 @@ def performance_benchmark_data_transformer(result):
     output = []
 
     for r in result:
+        if "Hotspots" in r:
+            # profiled commands are shown as their hot functions
+            for hotspot in r["Hotspots"]:
+                item = OrderedDict()
+                item["Command"] = r["Command"]
+                item["Category"] = hotspot["Category"]
+                item["Function"] = hotspot["Function"]
+                item["Calls"] = hotspot["Calls"]
+                item["Self"] = hotspot["Self"]
+                item["Cumulative"] = hotspot["Cumulative"]
+                output.append(item)
+            continue
+
         item = OrderedDict()
         item["Command"] = r["Command"]
         item["Min"] = r["Min"]
@@ -18,6 +31,27 @@ def performance_benchmark_data_transformer(result):
         item["Max"] = r["Max"]
         item["Media"] = r["Media"]
         item["Std"] = r["Std"]
+        item["P50"] = r["P50"]
+        item["P90"] = r["P90"]
+        item["P99"] = r["P99"]
+        output.append(item)
+
+    return output
+
+
+def performance_compare_data_transformer(result):
+    from collections import OrderedDict
+
+    output = []
+
+    for r in result:
+        item = OrderedDict()
+        item["Command"] = r["Command"]
+        item["Baseline"] = r["Baseline"]
+        item["Candidate"] = r["Candidate"]
+        item["Delta"] = r["Delta"]
+        item["PValue"] = r["PValue"]
+        item["Regression"] = r["Regression"]
         output.append(item)
 
     return output
@@ -35,7 +35,20 @@ from .display import (
 from .git_util import (
     diff_branches,
     filter_by_git_diff,
-    diff_branches_detail
+    diff_branches_detail,
+    parse_unified_diff,
+    DiffHunk
+)
+from .file_cache import (
+    FileCache,
+    get_file_digest,
+    get_file_stamp
+)
+from .help_cache import (
+    cached_help_loading,
+    get_help_cache,
+    load_help_entries,
+    parse_help_yaml
 )
 from .path import (
     extract_module_name,
@@ -93,4 +106,13 @@ __all__ = [
     'require_virtual_env',
     'require_azure_cli',
     'diff_branches_detail',
+    'parse_unified_diff',
+    'DiffHunk',
+    'FileCache',
+    'get_file_digest',
+    'get_file_stamp',
+    'cached_help_loading',
+    'get_help_cache',
+    'load_help_entries',
+    'parse_help_yaml',
 ]
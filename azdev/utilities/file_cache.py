@@ -0,0 +1,90 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+# -----------------------------------------------------------------------------
+
+import hashlib
+import os
+import pickle
+import zlib
+
+from knack.log import get_logger
+
+logger = get_logger(__name__)
+
+# entries not used by the last run are dropped once the cache grows beyond this
+_MAX_ENTRIES = 100000
+
+
+def get_file_stamp(path):
+    """ Returns the (mtime, size) of a file that FileCache entries are validated with, or None if it is missing. """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def get_file_digest(path):
+    """ Returns the SHA-1 hex digest of a file's contents, or None if it can't be read. """
+    try:
+        with open(path, 'rb') as f:
+            return hashlib.sha1(f.read()).hexdigest()
+    except OSError:
+        return None
+
+
+class FileCache:
+    """ Results computed per file, valid while the file's stamp (see `get_file_stamp`) is unchanged.
+
+    The cache is persisted as one zlib compressed pickle, which is ignored when written by another `version`.
+    """
+
+    def __init__(self, path, version):
+        self.path = path
+        self.version = version
+        self._entries = {}
+        self._used = set()
+        self._dirty = False
+        try:
+            with open(path, 'rb') as f:
+                version, entries = pickle.loads(zlib.decompress(f.read()))
+            if version == self.version:
+                self._entries = entries
+        except FileNotFoundError:
+            pass
+        except Exception as ex:  # pylint: disable=broad-except
+            logger.warning('Ignoring unreadable cache %s: %s', path, ex)
+
+    def get(self, key, stamp):
+        self._used.add(key)
+        entry = self._entries.get(key)
+        if entry is None or entry[0] != stamp:
+            return None
+        return entry[1]
+
+    def get_stale(self, key):
+        """ Returns the value of an entry whatever its stamp, e.g. to compare contents when only the stamp changed. """
+        self._used.add(key)
+        entry = self._entries.get(key)
+        return None if entry is None else entry[1]
+
+    def set(self, key, stamp, value):
+        self._used.add(key)
+        self._entries[key] = (stamp, value)
+        self._dirty = True
+
+    def save(self):
+        if not self._dirty:
+            return
+        entries = self._entries
+        if len(entries) > _MAX_ENTRIES:
+            entries = {key: value for key, value in entries.items() if key in self._used}
+        payload = zlib.compress(pickle.dumps((self.version, entries), protocol=pickle.HIGHEST_PROTOCOL), 1)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = '{}.{}.tmp'.format(self.path, os.getpid())
+        with open(tmp_path, 'wb') as f:
+            f.write(payload)
+        os.replace(tmp_path, self.path)
+        self._dirty = False
@@ -5,6 +5,7 @@
 # -----------------------------------------------------------------------------
 
 import os
+import re
 
 from knack.log import get_logger
 from knack.util import CLIError
@@ -127,3 +128,80 @@ def diff_branches_detail(repo, target, source):
 
     diff_index = target_commit.diff(source_commit)
     return diff_index
+
+
+class DiffHunk:
+    """ A hunk of a unified diff.
+
+    `lines` holds a (tag, new_line, text) tuple for every line of the hunk, where tag is ' ', '-' or '+' and new_line
+    is the 1-based line number in the new file, or None for removed lines.
+    """
+
+    __slots__ = ('old_start', 'old_count', 'new_start', 'new_count', 'lines')
+
+    def __init__(self, old_start, old_count, new_start, new_count):
+        self.old_start = old_start
+        self.old_count = old_count
+        self.new_start = new_start
+        self.new_count = new_count
+        self.lines = []
+
+    def added_lines(self, replaced=True):
+        """ Returns (new_line, text) of the lines the hunk adds.
+
+        :param replaced: Whether to include added lines that replace removed ones, i.e. changed lines.
+        """
+        added = []
+        after_removal = False
+        for tag, new_line, text in self.lines:
+            if tag == '-':
+                after_removal = True
+            elif tag == ' ':
+                after_removal = False
+            elif replaced or not after_removal:
+                added.append((new_line, text))
+        return added
+
+
+_HUNK_HEADER = re.compile(r'^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@')
+
+
+def parse_unified_diff(diff_lines):
+    """ Parses unified diff output, e.g. from `difflib.unified_diff`, into hunks in a single forward pass.
+
+    :param diff_lines: iterable of diff lines.
+    :returns: list of DiffHunk.
+    """
+    hunks = []
+    hunk = None
+    old_left = new_left = 0
+    new_line = 0
+    for line in diff_lines:
+        if old_left <= 0 and new_left <= 0:
+            # between hunks, only a hunk header is of interest
+            match = _HUNK_HEADER.match(line)
+            if match:
+                old_start, old_count, new_start, new_count = match.groups()
+                old_left = 1 if old_count is None else int(old_count)
+                new_left = 1 if new_count is None else int(new_count)
+                hunk = DiffHunk(int(old_start), old_left, int(new_start), new_left)
+                hunks.append(hunk)
+                new_line = hunk.new_start
+            continue
+        tag = line[:1]
+        if tag == '\\':
+            # "\ No newline at end of file"
+            continue
+        if tag == '-':
+            hunk.lines.append((tag, None, line[1:]))
+            old_left -= 1
+        elif tag == '+':
+            hunk.lines.append((tag, new_line, line[1:]))
+            new_line += 1
+            new_left -= 1
+        else:
+            hunk.lines.append((' ', new_line, line[1:]))
+            new_line += 1
+            old_left -= 1
+            new_left -= 1
+    return hunks
@@ -0,0 +1,137 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+# -----------------------------------------------------------------------------
+
+from contextlib import contextmanager
+import hashlib
+import os
+import pickle
+import zlib
+
+import yaml
+from knack.log import get_logger
+
+from .config import get_azdev_config_dir
+
+logger = get_logger(__name__)
+
+HELP_CACHE_VERSION = 1
+HELP_CACHE_FILE = 'parsed_help.bin'
+# entries not used by the last run are dropped once the cache grows beyond this
+_MAX_ENTRIES = 50000
+
+# prefer the libyaml based loader, which parses several times faster
+_YAML_LOADER = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+
+class HelpCache:
+    """ Parsed help YAML keyed by the hash of the help text.
+
+    Entries are kept as pickles, so every lookup returns a fresh object that the caller is free to modify, just like
+    `yaml.safe_load` would. The cache is persisted as one zlib compressed pickle.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self._entries = {}
+        self._used = set()
+        self._dirty = False
+        if path:
+            self._read()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def parse(self, text):
+        """ Returns the parsed help YAML, like `yaml.safe_load(text)`. """
+        if not isinstance(text, str):
+            return yaml.load(text, Loader=_YAML_LOADER)
+        key = hashlib.sha1(text.encode('utf-8')).digest()
+        self._used.add(key)
+        entry = self._entries.get(key)
+        if entry is None:
+            data = yaml.load(text, Loader=_YAML_LOADER)
+            entry = pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)
+            self._entries[key] = entry
+            self._dirty = True
+            return data
+        return pickle.loads(entry)
+
+    def save(self):
+        if not self.path or not self._dirty:
+            return
+        entries = self._entries
+        if len(entries) > _MAX_ENTRIES:
+            entries = {key: entry for key, entry in entries.items() if key in self._used}
+        payload = zlib.compress(pickle.dumps((HELP_CACHE_VERSION, entries), protocol=pickle.HIGHEST_PROTOCOL), 1)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = '{}.{}.tmp'.format(self.path, os.getpid())
+        with open(tmp_path, 'wb') as f:
+            f.write(payload)
+        os.replace(tmp_path, self.path)
+        self._dirty = False
+
+    def _read(self):
+        try:
+            with open(self.path, 'rb') as f:
+                version, entries = pickle.loads(zlib.decompress(f.read()))
+        except FileNotFoundError:
+            return
+        except Exception as ex:  # pylint: disable=broad-except
+            logger.warning('Ignoring unreadable help cache %s: %s', self.path, ex)
+            return
+        if version == HELP_CACHE_VERSION:
+            self._entries = entries
+
+
+_HELP_CACHE = None
+
+
+def get_help_cache():
+    """ Returns the help cache shared by everything running in this process. """
+    global _HELP_CACHE  # pylint: disable=global-statement
+    if _HELP_CACHE is None:
+        _HELP_CACHE = HelpCache(os.path.join(get_azdev_config_dir(), HELP_CACHE_FILE))
+    return _HELP_CACHE
+
+
+def parse_help_yaml(text):
+    """ Drop-in replacement for `yaml.safe_load` on help YAML, backed by the shared help cache. """
+    return get_help_cache().parse(text)
+
+
+def load_help_entries(helps, names=None):
+    """ Returns {name: parsed help} for the given help YAML entries (`knack.help_files.helps`) and saves the cache.
+
+    :param helps: dict of help entry name to help YAML text.
+    :param names: Optional iterable of entry names to restrict to.
+    """
+    help_cache = get_help_cache()
+    names = helps.keys() if names is None else names
+    entries = {name: help_cache.parse(helps[name]) for name in names}
+    help_cache.save()
+    return entries
+
+
+@contextmanager
+def cached_help_loading():
+    """ Makes knack, and therefore `get_all_help`, parse help YAML through the shared help cache. """
+    import knack.help
+    import knack.help_files
+
+    def _load_help_file(delimiters):
+        if delimiters in knack.help_files.helps:
+            return parse_help_yaml(knack.help_files.helps[delimiters])
+        return None
+
+    originals = [(module, module._load_help_file) for module in [knack.help, knack.help_files]]  # pylint: disable=protected-access
+    try:
+        for module, _ in originals:
+            module._load_help_file = _load_help_file  # pylint: disable=protected-access
+        yield get_help_cache()
+    finally:
+        for module, original in originals:
+            module._load_help_file = original  # pylint: disable=protected-access
+        get_help_cache().save()
@@ -0,0 +1,38 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+# -----------------------------------------------------------------------------
+
+from difflib import unified_diff
+import unittest
+
+from azdev.utilities import parse_unified_diff
+
+
+class TestParseUnifiedDiff(unittest.TestCase):
+
+    def test_added_lines(self):
+        before = ['a\n', 'b\n', 'c\n', 'd\n', 'e\n', 'f\n', 'g\n', 'h\n', 'i\n', 'j\n']
+        after = ['a\n', 'new\n', 'b\n', 'c\n', 'd\n', 'e\n', 'f\n', 'g\n', 'h\n', 'changed\n', 'j\n', 'k\n']
+        hunks = parse_unified_diff(unified_diff(before, after, 'Original', 'Current', n=1))
+        self.assertEqual(len(hunks), 2)
+        self.assertEqual((hunks[0].new_start, hunks[0].new_count), (1, 3))
+        added = [line for hunk in hunks for line in hunk.added_lines()]
+        self.assertEqual(added, [(2, 'new\n'), (10, 'changed\n'), (12, 'k\n')])
+        inserted = [line for hunk in hunks for line in hunk.added_lines(replaced=False)]
+        self.assertEqual(inserted, [(2, 'new\n'), (12, 'k\n')])
+        for line_no, text in added:
+            self.assertEqual(after[line_no - 1], text)
+
+    def test_single_line_hunks(self):
+        diff = ['--- a/file\n', '+++ b/file\n', '@@ -3 +3 @@\n', '-old\n', '+new\n',
+                '\\ No newline at end of file\n', '@@ -0,0 +10,2 @@\n', '+x\n', '+y\n']
+        hunks = parse_unified_diff(diff)
+        self.assertEqual([(h.old_start, h.old_count, h.new_start, h.new_count) for h in hunks],
+                         [(3, 1, 3, 1), (0, 0, 10, 2)])
+        self.assertEqual(hunks[1].added_lines(), [(10, 'x\n'), (11, 'y\n')])
+
+
+if __name__ == '__main__':
+    unittest.main()
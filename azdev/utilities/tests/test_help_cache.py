@@ -0,0 +1,81 @@
+# -----------------------------------------------------------------------------
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License. See License.txt in the project root for
+# license information.
+# -----------------------------------------------------------------------------
+
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import yaml
+
+from azdev.utilities.help_cache import HelpCache, cached_help_loading
+
+HELP_YAML = """
+type: command
+short-summary: Create a sample.
+parameters:
+  - name: --name -n
+    short-summary: The name.
+examples:
+  - name: Create a sample.
+    text: az sample create -n foo
+"""
+
+
+class TestHelpCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.cache_path = os.path.join(self.cache_dir, 'parsed_help.bin')
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def test_parse_matches_safe_load(self):
+        help_cache = HelpCache()
+        self.assertEqual(help_cache.parse(HELP_YAML), yaml.safe_load(HELP_YAML))
+        # cached entries are returned as fresh objects
+        first = help_cache.parse(HELP_YAML)
+        first['short-summary'] = 'changed'
+        self.assertEqual(help_cache.parse(HELP_YAML)['short-summary'], 'Create a sample.')
+        self.assertEqual(len(help_cache), 1)
+
+    def test_cache_is_persisted(self):
+        help_cache = HelpCache(self.cache_path)
+        help_cache.parse(HELP_YAML)
+        help_cache.save()
+
+        expected = yaml.safe_load(HELP_YAML)
+        reloaded = HelpCache(self.cache_path)
+        self.assertEqual(len(reloaded), 1)
+        with mock.patch('yaml.load', side_effect=AssertionError('help was parsed again')):
+            self.assertEqual(reloaded.parse(HELP_YAML), expected)
+
+    def test_unreadable_cache_is_ignored(self):
+        with open(self.cache_path, 'wb') as f:
+            f.write(b'not a cache')
+        self.assertEqual(len(HelpCache(self.cache_path)), 0)
+
+    def test_cached_help_loading(self):
+        import knack.help
+        from knack.help_files import helps
+
+        original = knack.help._load_help_file  # pylint: disable=protected-access
+        help_cache = HelpCache()
+        with mock.patch.dict(helps, {'sample create': HELP_YAML}), \
+                mock.patch('azdev.utilities.help_cache.get_help_cache', return_value=help_cache):
+            with cached_help_loading():
+                data = knack.help._load_help_file('sample create')  # pylint: disable=protected-access
+                self.assertIsNone(knack.help._load_help_file('sample missing'))  # pylint: disable=protected-access
+        self.assertEqual(data['short-summary'], 'Create a sample.')
+        self.assertEqual(len(help_cache), 1)
+        self.assertIs(knack.help._load_help_file, original)  # pylint: disable=protected-access
+
+
+if __name__ == '__main__':
+    unittest.main()